@@ -1,10 +1,19 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+# Момент начала загрузки приложения - для замера времени холодного старта
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pathlib import Path
+from starlette.background import BackgroundTask
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 import sqlite3
-from typing import List
+import sys
+from typing import List, Optional
 import json
 
 # АБСОЛЮТНЫЙ ПУТЬ к файлу frontend/index.html
@@ -14,13 +23,37 @@ FRONTEND_PATH = BASE_DIR / "frontend" / "index.html"
 print(f"🔍 Путь к фронтенду: {FRONTEND_PATH}")
 print(f"🔍 Файл существует: {FRONTEND_PATH.exists()}")
 
-from database import db
+from backup import BACKUP_LOCK, BackupScheduler, backup_filename, create_backup_file
+from database import db, MAX_PAGE_SIZE, MAX_SEARCH_LIMIT
+from exporters import (
+    EXPORT_FORMATS, ExportFormatUnavailable, stream_csv, write_export_file
+)
+from http_cache import CompressionMiddleware, ConditionalGetMiddleware
+from importers import (
+    ImportAborted, ImportFormatError, import_products, iter_order_lines, iter_records, validate_bulk_operations,
+    validate_product
+)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from models import (
+    MaterialCalculationRequest, MaterialCalculationBatchRequest,
+    ProductBulkRequest, ProductRoutesUpdate, ProductWorkshopsUpdate, ScheduleRequest
+)
+from serialization import (
+    RESPONSE_FORMATS, FastJSONResponse, records_to_columnar, stream_columnar
+)
+from scheduling import BEST_RULE, SCHEDULING_RULES, schedule_orders
 
-# Путь к базе данных
-DB_PATH = BASE_DIR / "database" / "furniture_company.db"
+# Калькулятор сырья лежит в корне проекта, рядом с backend/
+sys.path.insert(0, str(BASE_DIR))
+from materials_calculator.calculator import MaterialCalculator
+
+calculator = MaterialCalculator(db.db_path, database=db)
 
 app = FastAPI(title="Мебельная компания API", version="1.0.0")
 
+# Становится True, когда база данных инициализирована (см. /health/ready)
+app.state.ready = False
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,28 +63,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETag по ревизии данных и 304 Not Modified для списков, отчетов и выгрузок
+app.add_middleware(ConditionalGetMiddleware, revision=lambda: db.run(db.data_revision))
+
+# Сжатие gzip/brotli ответов больше FURNITURE_COMPRESSION_MIN_SIZE байт
+app.add_middleware(CompressionMiddleware)
+
+# Метрики задержек и ошибок по маршрутам (отдаются на /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Плановое резервное копирование (включается FURNITURE_BACKUP_INTERVAL)
+backup_scheduler = BackupScheduler(db.db_path)
+
+# Копии по запросу /backup снимаются в своем потоке: долгое копирование
+# большой БД не занимает потоки, которые обслуживают запросы к БД
+backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при запуске"""
     print("🚀 Запуск системы управления мебельной компанией...")
-    db.init_database()
+    if not await db.run(db.init_database):
+        print("❌ База данных не инициализирована, /health/ready вернет 503")
+        return
     print("✅ База данных готова")
+    if backup_scheduler.start():
+        print(f"💾 Плановое резервное копирование: каждые {backup_scheduler.interval:g} с "
+              f"в {backup_scheduler.directory}")
+    app.state.ready = True
+    print(f"⏱️ Сервер готов за {time.perf_counter() - STARTED_AT:.2f} с")
     print(f"🌐 Интерфейс доступен по адресу: http://localhost:8000")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Закрытие соединений с базой данных при остановке"""
+    backup_scheduler.stop()
+    backup_executor.shutdown(wait=True)
+    db.close()
+
 # ГЛАВНАЯ СТРАНИЦА - КЛЮЧЕВОЙ МОМЕНТ!
 @app.get("/")
 async def read_root():
     """Главная страница системы"""
-    print(f"📄 Запрос главной страницы, проверяю файл: {FRONTEND_PATH}")
-    
     if FRONTEND_PATH.exists():
-        print("✅ Файл frontend/index.html найден, отдаю...")
         return FileResponse(FRONTEND_PATH)
     else:
-        print("❌ Файл frontend/index.html НЕ НАЙДЕН!")
-        print(f"   Искал по пути: {FRONTEND_PATH}")
-        print(f"   Текущая директория: {os.getcwd()}")
-        
         # Возвращаем JSON с инструкцией
         return JSONResponse({
             "message": "Добро пожаловать в систему управления мебельной компанией!",
@@ -59,33 +115,124 @@ async def read_root():
             "frontend_status": "not_found",
             "instruction": "Создайте файл frontend/index.html в папке frontend/",
             "api_endpoints": {
-                "products": "GET /products",
+                "products": "GET /products?search=&type_id=&material_id=&price_min=&price_max=&sort=&order=&cursor=&limit=&include_workshops=",
+                "search": "GET /products/search?q=&limit=",
                 "workshops": "GET /workshops",
                 "product_types": "GET /product-types",
                 "materials": "GET /materials",
                 "create_product": "POST /products",
                 "delete_product": "DELETE /products/{id}",
+                "product_workshops": "GET|PUT /products/{id}/workshops",
+                "products_workshops": "PUT /products/workshops",
                 "batch_delete": "DELETE /products/batch",
-                "statistics": "GET /reports/statistics"
+                "bulk": "POST /products/bulk",
+                "statistics": "GET /reports/statistics",
+                "import": "POST /import",
+                "backup": "GET /backup?compress=",
+                "metrics": "GET /metrics",
+                "schedule": "POST /schedule",
+                "health_live": "GET /health/live",
+                "health_ready": "GET /health/ready",
+                "calculate_materials": "POST /calculate-materials",
+                "calculate_materials_batch": "POST /calculate-materials/batch",
+                "calculate_materials_orders": "POST /calculate-materials/orders"
             },
             "quick_test": "Откройте /products для проверки API"
         })
 
+# Проверки состояния для run.py и оркестраторов
+@app.get("/health/live")
+async def health_live():
+    """Процесс запущен и отвечает"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Сервер готов принимать запросы: инициализация завершена, БД доступна"""
+    if not app.state.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        state = await db.run(db.check_ready)
+    except Exception as e:
+        return JSONResponse({"status": "error", "detail": str(e)}, status_code=503)
+    if not state["schema_current"]:
+        return JSONResponse({"status": "migrating", **state}, status_code=503)
+    return {"status": "ready", **state}
+
 # API эндпоинты
 @app.get("/products")
-async def get_products():
-    """Получить все продукты"""
+async def get_products(
+    search: Optional[str] = None,
+    type_id: Optional[int] = None,
+    material_id: Optional[int] = None,
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    sort: str = "created_at",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    include_workshops: bool = False,
+    format: str = "json"
+):
+    """
+    Получить страницу продуктов с фильтрами, сортировкой и курсором.
+    
+    С include_workshops=true у каждого продукта есть workshops (маршрут по
+    цехам) и total_production_time. С format=columnar вместо data
+    возвращаются columns (имена столбцов) и rows (массивы значений).
+    """
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}")
+    
     try:
-        products = db.get_all_products()
-        return {"success": True, "data": products, "count": len(products)}
+        page = await db.run(
+            db.get_products_page,
+            search=search,
+            product_type_id=type_id,
+            material_id=material_id,
+            price_min=price_min,
+            price_max=price_max,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            include_workshops=include_workshops,
+            columnar=format == "columnar"
+        )
+        if format == "columnar":
+            return FastJSONResponse({
+                "success": True,
+                "columns": page["columns"],
+                "rows": page["rows"],
+                "count": len(page["rows"]),
+                "next_cursor": page["next_cursor"]
+            })
+        
+        products = page["items"]
+        return FastJSONResponse({
+            "success": True,
+            "data": products,
+            "count": len(products),
+            "next_cursor": page["next_cursor"]
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/workshops")
-async def get_workshops():
-    """Получить все цехи"""
+async def get_workshops(format: str = "json"):
+    """Получить все цехи (format=columnar - столбцы и массивы значений)"""
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}")
+    
     try:
-        workshops = db.get_all_workshops()
+        # Справочники берутся из кэша в памяти, но проверка версии БД и
+        # перечитывание кэша - блокирующие запросы, поэтому через пул потоков
+        workshops = await db.run(db.get_all_workshops)
+        if format == "columnar":
+            return FastJSONResponse({"success": True, **records_to_columnar(workshops), 
+                                     "count": len(workshops)})
         return {"success": True, "data": workshops, "count": len(workshops)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -94,7 +241,7 @@ async def get_workshops():
 async def get_product_types():
     """Получить все типы продукции"""
     try:
-        types = db.get_product_types()
+        types = await db.run(db.get_product_types)
         return {"success": True, "data": types, "count": len(types)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -103,7 +250,7 @@ async def get_product_types():
 async def get_materials():
     """Получить все материалы"""
     try:
-        materials = db.get_materials()
+        materials = await db.run(db.get_materials)
         return {"success": True, "data": materials, "count": len(materials)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -112,68 +259,28 @@ async def get_materials():
 async def create_product(data: dict):
     """Создать новый продукт"""
     try:
-        required_fields = ['article', 'product_type_id', 'product_name', 
-                          'min_partner_price', 'main_material_id', 'param1', 'param2']
-        
-        for field in required_fields:
-            if field not in data:
-                raise HTTPException(status_code=400, detail=f"Отсутствует поле: {field}")
-        
-        product_id = db.add_product(
-            article=data['article'],
-            product_type_id=data['product_type_id'],
-            product_name=data['product_name'],
-            min_partner_price=data['min_partner_price'],
-            main_material_id=data['main_material_id'],
-            param1=data['param1'],
-            param2=data['param2']
-        )
+        # Те же проверки полей и справочников, что при импорте
+        fields, workshop_ids = await db.run(validate_product, db, data)
+        product_id = await db.run(db.add_product, **fields, workshop_ids=workshop_ids)
         
         return {"success": True, "id": product_id, "message": "Продукт создан"}
+    except HTTPException:
+        raise
+    except (ValueError, sqlite3.IntegrityError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/products/{product_id}")
-async def delete_product(product_id: int):
-    """Удалить продукт по ID"""
-    try:
-        # Проверяем существование продукта
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Продукт не найден")
-        
-        # Удаляем продукт (каскадное удаление через внешние ключи)
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        conn.commit()
-        conn.close()
-        
-        return {"success": True, "message": f"Продукт {product_id} удален"}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
+# Пакетные операции (объявлены до /products/{product_id}, иначе "batch" и
+# "bulk" были бы приняты за ID продукта)
 @app.delete("/products/batch")
 async def delete_products_batch(product_ids: List[int]):
-    """Массовое удаление продуктов"""
+    """Массовое удаление продуктов (порциями в одной транзакции)"""
     try:
         if not product_ids:
             raise HTTPException(status_code=400, detail="Не указаны ID продуктов")
         
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Преобразуем список в строку для SQL запроса
-        placeholders = ','.join('?' for _ in product_ids)
-        query = f"DELETE FROM products WHERE id IN ({placeholders})"
-        
-        cursor.execute(query, product_ids)
-        deleted_count = cursor.rowcount
-        
-        conn.commit()
-        conn.close()
+        deleted_count = await db.run(db.delete_products, product_ids)
         
         return {
             "success": True,
@@ -181,6 +288,51 @@ async def delete_products_batch(product_ids: List[int]):
             "deleted_count": deleted_count
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/products/bulk")
+async def bulk_update_products(request: ProductBulkRequest):
+    """
+    Создать, изменить и удалить продукты одним запросом в одной транзакции.
+    
+    Если хотя бы одна операция неверна, ничего не применяется и
+    возвращается 400 со списком ошибок по номерам операций.
+    """
+    try:
+        operations, errors = await db.run(
+            validate_bulk_operations, db, [operation.model_dump() for operation in request.operations]
+        )
+        if errors:
+            raise HTTPException(status_code=400, detail={
+                "message": "Пакет не применен: есть ошибки в операциях",
+                "errors": errors
+            })
+        
+        result = await db.run(db.apply_product_operations, operations)
+        return {"success": True, **result}
+        
+    except HTTPException:
+        raise
+    except (ValueError, sqlite3.IntegrityError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/products/{product_id}")
+async def delete_product(product_id: int):
+    """Удалить продукт по ID"""
+    try:
+        # Удаляем продукт (каскадное удаление через внешние ключи)
+        if not await db.run(db.delete_product, product_id):
+            raise HTTPException(status_code=404, detail="Продукт не найден")
+        
+        return {"success": True, "message": f"Продукт {product_id} удален"}
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -189,231 +341,347 @@ async def delete_products_batch(product_ids: List[int]):
 async def get_statistics():
     """Получить статистику для отчетов"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Общая статистика
-        cursor.execute("SELECT COUNT(*) FROM products")
-        total_products = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM workshops")
-        total_workshops = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM product_types")
-        total_types = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM materials")
-        total_materials = cursor.fetchone()[0]
-        
-        # Статистика по ценам
-        cursor.execute("SELECT AVG(min_partner_price), MIN(min_partner_price), MAX(min_partner_price) FROM products")
-        price_stats = cursor.fetchone()
-        
-        # Распределение по типам
-        cursor.execute("""
-            SELECT pt.type_name, COUNT(p.id) as count
-            FROM products p
-            JOIN product_types pt ON p.product_type_id = pt.id
-            GROUP BY p.product_type_id
-            ORDER BY count DESC
-        """)
-        type_distribution = cursor.fetchall()
-        
-        # Распределение по материалам
-        cursor.execute("""
-            SELECT m.material_name, COUNT(p.id) as count
-            FROM products p
-            JOIN materials m ON p.main_material_id = m.id
-            GROUP BY p.main_material_id
-            ORDER BY count DESC
-        """)
-        material_distribution = cursor.fetchall()
-        
-        # Последние добавленные товары
-        cursor.execute("""
-            SELECT article, product_name, min_partner_price, created_at
-            FROM products
-            ORDER BY created_at DESC
-            LIMIT 10
-        """)
-        recent_products = cursor.fetchall()
-        
-        # Статистика по цехам (производительность)
-        cursor.execute("""
-            SELECT workshop_name, worker_count, processing_time, 
-                   ROUND(worker_count * 100.0 / processing_time, 2) as productivity
-            FROM workshops
-            ORDER BY productivity DESC
-        """)
-        workshop_stats = cursor.fetchall()
-        
-        conn.close()
-        
-        return {
-            "success": True,
-            "statistics": {
-                "total_products": total_products,
-                "total_workshops": total_workshops,
-                "total_types": total_types,
-                "total_materials": total_materials,
-                "price_avg": float(price_stats[0]) if price_stats[0] else 0,
-                "price_min": float(price_stats[1]) if price_stats[1] else 0,
-                "price_max": float(price_stats[2]) if price_stats[2] else 0,
-                "type_distribution": [
-                    {"type": row[0], "count": row[1]} 
-                    for row in type_distribution
-                ],
-                "material_distribution": [
-                    {"material": row[0], "count": row[1]} 
-                    for row in material_distribution
-                ],
-                "recent_products": [
-                    {
-                        "article": row[0],
-                        "name": row[1],
-                        "price": float(row[2]) if row[2] else 0,
-                        "date": row[3]
-                    } 
-                    for row in recent_products
-                ],
-                "workshop_stats": [
-                    {
-                        "name": row[0],
-                        "workers": row[1],
-                        "processing_time": row[2],
-                        "productivity": row[3]
-                    }
-                    for row in workshop_stats
-                ]
-            }
-        }
-        
+        return {"success": True, "statistics": await db.run(db.get_statistics)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Полнотекстовый поиск продукции (объявлен до /products/{product_id})
+@app.get("/products/search")
+async def search_products(
+    q: str = Query(..., min_length=1, description="Строка поиска: артикул или название"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT)
+):
+    """Поиск продукции по артикулу и названию с ранжированием по релевантности"""
+    try:
+        products = await db.run(db.search_products, q, limit)
+        return {"success": True, "data": products, "count": len(products)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Маршруты нескольких продуктов одним запросом (объявлен до /products/{product_id})
+@app.put("/products/workshops")
+async def update_products_workshops(request: ProductRoutesUpdate):
+    """Заменить маршруты по цехам сразу у многих продуктов в одной транзакции"""
+    routes = {}
+    for route in request.routes:
+        if route.product_id in routes:
+            raise HTTPException(status_code=400, 
+                                detail=f"Продукт {route.product_id} указан дважды")
+        routes[route.product_id] = route.workshop_ids
+    
+    try:
+        result = await db.run(db.replace_product_routes, routes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if result["missing"]:
+        raise HTTPException(status_code=404, 
+                            detail=f"Продукты не найдены: {result['missing']}")
+    
+    return {"success": True, "products": result["products"], 
+            "schedule_rows": result["schedule_rows"]}
+
 # Дополнительный эндпоинт для получения продукта по ID
 @app.get("/products/{product_id}")
-async def get_product(product_id: int):
-    """Получить продукт по ID"""
+async def get_product(product_id: int, include_workshops: bool = False):
+    """Получить продукт по ID (с include_workshops=true - вместе с маршрутом)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT p.*, pt.type_name, m.material_name
-            FROM products p
-            LEFT JOIN product_types pt ON p.product_type_id = pt.id
-            LEFT JOIN materials m ON p.main_material_id = m.id
-            WHERE p.id = ?
-        """, (product_id,))
-        
-        product = cursor.fetchone()
-        conn.close()
+        product = await db.run(db.get_product, product_id, include_workshops)
         
         if not product:
             raise HTTPException(status_code=404, detail="Продукт не найден")
         
-        # Преобразуем в словарь
-        columns = [description[0] for description in cursor.description]
-        product_dict = dict(zip(columns, product))
-        
-        return {"success": True, "data": product_dict}
+        return {"success": True, "data": product}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Эндпоинт для обновления продукта
 @app.put("/products/{product_id}")
 async def update_product(product_id: int, data: dict):
-    """Обновить продукт по ID"""
+    """Обновить продукт по ID (поле workshops заменяет маршрут по цехам)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Проверяем существование продукта
-        cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        if not cursor.fetchone():
+        fields, workshop_ids = await db.run(validate_product, db, data, partial=True)
+        if not await db.run(db.update_product, product_id, fields, workshop_ids):
             raise HTTPException(status_code=404, detail="Продукт не найден")
         
-        # Формируем запрос на обновление
-        update_fields = []
-        values = []
-        
-        allowed_fields = ['article', 'product_name', 'product_type_id', 
-                         'main_material_id', 'min_partner_price', 'param1', 'param2']
-        
-        for field in allowed_fields:
-            if field in data:
-                update_fields.append(f"{field} = ?")
-                values.append(data[field])
+        return {"success": True, "message": f"Продукт {product_id} обновлен"}
         
-        if not update_fields:
-            raise HTTPException(status_code=400, detail="Нет полей для обновления")
+    except HTTPException:
+        raise
+    except (ValueError, sqlite3.IntegrityError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Маршрут продукта по цехам
+@app.get("/products/{product_id}/workshops")
+async def get_product_workshops(product_id: int):
+    """Цехи продукта в порядке обработки"""
+    try:
+        workshops = await db.run(db.get_product_workshops, product_id)
+        if workshops is None:
+            raise HTTPException(status_code=404, detail="Продукт не найден")
         
-        # Добавляем ID в конец значений
-        values.append(product_id)
+        return {"success": True, "data": workshops, "count": len(workshops)}
         
-        # Выполняем обновление
-        query = f"UPDATE products SET {', '.join(update_fields)} WHERE id = ?"
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/products/{product_id}/workshops")
+async def update_product_workshops(product_id: int, request: ProductWorkshopsUpdate):
+    """Заменить маршрут продукта целиком (одна транзакция)"""
+    try:
+        result = await db.run(db.replace_product_routes, {product_id: request.workshop_ids})
+        if result["missing"]:
+            raise HTTPException(status_code=404, detail="Продукт не найден")
         
-        return {"success": True, "message": f"Продукт {product_id} обновлен"}
+        return {"success": True, "schedule_rows": result["schedule_rows"]}
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Эндпоинт для экспорта данных
 @app.get("/export/{data_type}")
-async def export_data(data_type: str):
-    """Экспорт данных в CSV формате"""
+async def export_data(data_type: str, format: str = "csv"):
+    """
+    Экспорт данных в файл: csv и columnar (JSON со столбцами и массивами
+    значений) выгружаются потоком, parquet, arrow и xlsx - через файл
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}")
+    
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        if data_type == "products":
-            cursor.execute("""
-                SELECT p.article, p.product_name, pt.type_name, m.material_name, 
-                       p.min_partner_price, p.param1, p.param2, p.created_at
-                FROM products p
-                LEFT JOIN product_types pt ON p.product_type_id = pt.id
-                LEFT JOIN materials m ON p.main_material_id = m.id
-            """)
-            data = cursor.fetchall()
-            headers = ["Артикул", "Наименование", "Тип", "Материал", 
-                      "Цена", "Параметр1", "Параметр2", "Дата создания"]
-            
-        elif data_type == "workshops":
-            cursor.execute("SELECT workshop_name, worker_count, processing_time FROM workshops")
-            data = cursor.fetchall()
-            headers = ["Название цеха", "Количество работников", "Время обработки (ч)"]
-            
-        elif data_type == "materials":
-            cursor.execute("SELECT material_name, description FROM materials")
-            data = cursor.fetchall()
-            headers = ["Материал", "Описание"]
-            
+        headers = db.get_export_headers(data_type)
+        fields = db.get_export_fields(data_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    extension, media_type = EXPORT_FORMATS[format]
+    filename = f"{data_type}.{extension}"
+    
+    if format == "csv":
+        # Строки читаются порциями и сразу отправляются клиенту
+        return StreamingResponse(
+            stream_csv(headers, db.iter_export_chunks(data_type)),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    if format == "columnar":
+        columns = [name for name, _ in fields]
+        return StreamingResponse(
+            stream_columnar(columns, db.iter_export_chunks(data_type)),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    # Колоночные форматы и Excel собираются во временный файл порциями
+    try:
+        path = await db.run(
+            write_export_file, format, headers, fields, db.iter_export_chunks(data_type)
+        )
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        background=BackgroundTask(os.remove, path)
+    )
+
+# Метрики в формате Prometheus
+@app.get("/metrics")
+async def get_metrics():
+    """Задержки HTTP-запросов и SQL-запросов, запросы в обработке и ошибки"""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Резервная копия базы данных
+@app.get("/backup")
+async def backup_database(compress: bool = False):
+    """
+    Скачать согласованную копию БД, снятую через SQLite Online Backup API.
+    
+    Копирование идет небольшими шагами и не блокирует запись; при
+    compress=true файл сжимается gzip. Одновременно снимается одна копия:
+    пока она идет, следующий запрос получает 409.
+    """
+    if not BACKUP_LOCK.acquire(blocking=False):
+        raise HTTPException(status_code=409, 
+                            detail="Резервная копия уже создается, повторите позже")
+    try:
+        loop = asyncio.get_running_loop()
+        path = await loop.run_in_executor(
+            backup_executor, create_backup_file, db.db_path, compress
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        BACKUP_LOCK.release()
+    
+    return FileResponse(
+        path,
+        media_type="application/gzip" if compress else "application/vnd.sqlite3",
+        filename=backup_filename(compress),
+        background=BackgroundTask(os.remove, path)
+    )
+
+# Массовый импорт продукции
+@app.post("/import")
+async def import_data(file: UploadFile = File(...)):
+    """
+    Импорт продуктов из CSV, JSON-массива или JSON Lines.
+    
+    Поля записи: article, product_type_id, product_name, min_partner_price,
+    main_material_id, param1, param2 и необязательное workshops - ID цехов
+    в порядке обработки (список или строка "1;2;3").
+    
+    Порции записываются по мере чтения. Если импорт прерван посреди файла,
+    ответ с ошибкой содержит отчет о уже записанных строках ("imported")
+    и номер строки "failed_at_row", с которой ничего не записано.
+    """
+    try:
+        records = iter_records(file.file, file.filename)
+        result = await db.run(import_products, db, records)
+        return {"success": True, **result}
+    except ImportAborted as e:
+        cause = e.__cause__
+        if isinstance(cause, ImportFormatError):
+            status_code, message = 400, str(cause)
+        elif isinstance(cause, UnicodeDecodeError):
+            status_code, message = 400, "Файл должен быть в кодировке UTF-8"
         else:
-            raise HTTPException(status_code=400, detail="Неверный тип данных")
+            status_code, message = 500, str(cause)
+        raise HTTPException(status_code=status_code, detail={
+            "message": f"Импорт прерван: {message}",
+            **e.report
+        })
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Планирование производства по цехам
+@app.post("/schedule")
+async def schedule_production(request: ScheduleRequest):
+    """
+    График выполнения заказов (product_id, quantity) по цехам.
+    
+    Правила очередности: johnson, spt, lpt, edd (по полю due), fifo или
+    best (выбирается график с наименьшим makespan). Возвращает makespan,
+    загрузку и узкие места цехов, сроки по заказам и (include_steps)
+    время каждой стадии.
+    """
+    if request.rule not in SCHEDULING_RULES + (BEST_RULE,):
+        raise HTTPException(status_code=400, 
+                            detail=f"Неизвестное правило планирования: {request.rule}")
+    
+    orders = [order.model_dump() for order in request.orders]
+    try:
+        routes, workshops = await db.run(
+            db.get_schedule_data, [order["product_id"] for order in orders]
+        )
+        result = await db.run(
+            schedule_orders, orders, routes, workshops, request.rule, request.include_steps
+        )
+        return {"success": True, **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Калькулятор сырья
+@app.post("/calculate-materials")
+async def calculate_materials(request: MaterialCalculationRequest):
+    """Рассчитать количество сырья для одной позиции"""
+    try:
+        result = await db.run(
+            calculator.calculate_raw_material_needed,
+            request.product_type_id,
+            request.material_type_id,
+            request.quantity,
+            request.param1,
+            request.param2
+        )
         
-        conn.close()
+        if result == -1:
+            raise HTTPException(status_code=400, 
+                                detail="Неверные параметры: тип продукции или материал не найден")
         
-        # Преобразуем в CSV формат
-        csv_content = ",".join(headers) + "\n"
-        for row in data:
-            csv_content += ",".join(str(value) for value in row) + "\n"
+        return {
+            "success": True,
+            "raw_material_needed": result,
+            "calculation_details": request.model_dump()
+        }
         
-        return JSONResponse({
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/calculate-materials/batch")
+async def calculate_materials_batch(request: MaterialCalculationBatchRequest):
+    """Пакетный расчет сырья: -1 в результате означает ошибку в строке"""
+    try:
+        rows = [
+            (item.product_type_id, item.material_type_id, item.quantity, 
+             item.param1, item.param2)
+            for item in request.items
+        ]
+        results = await db.run(calculator.calculate_raw_material_batch, rows)
+        
+        return {
             "success": True,
-            "data_type": data_type,
-            "csv_content": csv_content,
-            "row_count": len(data)
-        })
+            "results": results,
+            "count": len(results),
+            "failed": sum(1 for value in results if value == -1)
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/calculate-materials/orders")
+async def calculate_order_book(file: UploadFile = File(...)):
+    """
+    Суммарная потребность в сырье по книге заказов (MRP).
+    
+    Файл CSV, JSON-массив или JSON Lines со строками product_id, quantity
+    читается потоком. Параметры, коэффициент типа и основной материал
+    берутся из самих продуктов; итог по каждому материалу - с потерями.
+    """
+    report = {"failed": 0, "errors": []}
+    try:
+        orders = iter_order_lines(iter_records(file.file, file.filename), report)
+        result = await db.run(calculator.calculate_order_book, orders)
+        return {
+            "success": True,
+            **result,
+            "failed": report["failed"],
+            "errors": report["errors"],
+            "errors_truncated": report["failed"] > len(report["errors"])
+        }
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Отдача статических файлов
 @app.get("/{filename:path}")
 async def serve_static(filename: str):
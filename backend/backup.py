@@ -0,0 +1,232 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Каталог плановых резервных копий (можно переопределить через FURNITURE_BACKUP_DIR)
+DEFAULT_BACKUP_DIR = Path(
+    os.environ.get(
+        "FURNITURE_BACKUP_DIR",
+        Path(__file__).parent.parent / "database" / "backups"
+    )
+)
+
+# Период плановых копий в секундах; 0 - расписание выключено
+DEFAULT_BACKUP_INTERVAL = float(os.environ.get("FURNITURE_BACKUP_INTERVAL", "0"))
+
+# Сколько последних плановых копий хранить
+DEFAULT_BACKUP_KEEP = int(os.environ.get("FURNITURE_BACKUP_KEEP", "7"))
+
+# Сжимать ли плановые копии gzip
+DEFAULT_BACKUP_COMPRESS = os.environ.get("FURNITURE_BACKUP_COMPRESS", "1") != "0"
+
+# Сколько страниц копировать за один шаг и сколько спать между шагами
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+# Префикс имен файлов резервных копий
+BACKUP_PREFIX = "furniture_backup_"
+
+# Одновременно снимается только одна копия: по запросу /backup или по расписанию
+BACKUP_LOCK = threading.Lock()
+
+
+class BackupError(Exception):
+    """Резервная копия не создана или не прошла проверку"""
+
+
+def backup_filename(compress: bool) -> str:
+    """Имя файла копии с отметкой времени"""
+    now = datetime.now()
+    stamp = f"{now:%Y%m%d_%H%M%S}_{now.microsecond // 1000:03d}"
+    return f"{BACKUP_PREFIX}{stamp}.db" + (".gz" if compress else "")
+
+
+def create_backup(db_path: Path, destination: Path,
+                  pages: int = BACKUP_PAGES_PER_STEP,
+                  sleep: float = BACKUP_STEP_SLEEP) -> Path:
+    """
+    Снять согласованную копию работающей БД через SQLite Online Backup API.
+
+    Копирование идет шагами по pages страниц с паузой sleep между ними.
+    На исходном соединении открыта читающая транзакция, поэтому в режиме
+    WAL все шаги видят один снимок данных: запись из других соединений не
+    блокируется и не заставляет копирование начинаться заново. Готовая
+    копия переводится в обычный журнал (один самодостаточный файл) и
+    проверяется PRAGMA quick_check.
+    """
+    source = sqlite3.connect(str(db_path))
+    target = sqlite3.connect(str(destination))
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        source.backup(target, pages=pages, sleep=sleep)
+
+        target.execute("PRAGMA journal_mode = DELETE")
+        result = target.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            raise BackupError(f"Копия не прошла проверку целостности: {result}")
+    finally:
+        source.close()
+        target.close()
+
+    return destination
+
+
+def compress_file(path: Path) -> Path:
+    """Сжать файл gzip рядом с исходным и удалить исходный"""
+    compressed = path.with_name(path.name + ".gz")
+    with open(path, "rb") as src, gzip.open(compressed, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.remove(path)
+    return compressed
+
+
+def create_backup_file(db_path: Path, compress: bool = False) -> str:
+    """
+    Снять копию во временный файл (для выдачи клиенту).
+
+    Возвращает путь к файлу - удалить его должен вызывающий код.
+    """
+    fd, path = tempfile.mkstemp(prefix=BACKUP_PREFIX, suffix=".db")
+    os.close(fd)
+    path = Path(path)
+
+    try:
+        create_backup(db_path, path)
+        if compress:
+            path = compress_file(path)
+    except BaseException:
+        for leftover in (path, path.with_name(path.name + ".gz")):
+            if leftover.exists():
+                os.remove(leftover)
+        raise
+
+    return str(path)
+
+
+def list_backups(directory: Path) -> List[Path]:
+    """Плановые копии в каталоге, от старых к новым"""
+    if not directory.exists():
+        return []
+    return sorted(
+        path for path in directory.iterdir()
+        if path.name.startswith(BACKUP_PREFIX) and path.name.endswith((".db", ".db.gz"))
+    )
+
+
+class BackupScheduler:
+    """
+    Плановое резервное копирование в фоновом потоке.
+
+    Каждые interval секунд в directory появляется новая копия, а лишние
+    (старше последних keep) удаляются. Копия пишется во временный файл и
+    переименовывается только после проверки, поэтому в каталоге не бывает
+    недописанных копий. Если сервер запущен в нескольких процессах,
+    расписание выполняет только тот, кто захватил файл блокировки.
+    """
+
+    def __init__(self, db_path: Path, directory: Path = DEFAULT_BACKUP_DIR,
+                 interval: float = DEFAULT_BACKUP_INTERVAL,
+                 keep: int = DEFAULT_BACKUP_KEEP,
+                 compress: bool = DEFAULT_BACKUP_COMPRESS):
+        self.db_path = Path(db_path)
+        self.directory = Path(directory)
+        self.interval = interval
+        self.keep = max(keep, 1)
+        self.compress = compress
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+
+    def _acquire_lock(self) -> bool:
+        """Захватить файл блокировки расписания (без ожидания)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.directory / ".scheduler.lock", "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        return True
+
+    def start(self) -> bool:
+        """Запустить расписание; False - выключено или уже работает в другом процессе"""
+        if self.interval <= 0 or self._thread is not None:
+            return False
+        if not self._acquire_lock():
+            return False
+
+        self._thread = threading.Thread(
+            target=self._run, name="backup-scheduler", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Остановить расписание и освободить блокировку"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                path = self.run_once()
+                print(f"💾 Резервная копия создана: {path.name}")
+            except Exception as e:
+                print(f"❌ Ошибка резервного копирования: {e}")
+
+    def run_once(self) -> Path:
+        """Снять одну плановую копию и применить политику хранения"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        final = self.directory / backup_filename(self.compress)
+        partial = self.directory / (final.name + ".part")
+
+        # Копия по запросу уже идет - ждем ее окончания
+        with BACKUP_LOCK:
+            try:
+                create_backup(self.db_path, partial)
+                if self.compress:
+                    compressed = compress_file(partial)
+                    os.replace(compressed, final)
+                else:
+                    os.replace(partial, final)
+            finally:
+                for leftover in (partial, partial.with_name(partial.name + ".gz")):
+                    if leftover.exists():
+                        os.remove(leftover)
+
+        self.prune()
+        return final
+
+    def prune(self) -> List[Path]:
+        """Удалить копии сверх последних keep"""
+        backups = list_backups(self.directory)
+        removed = backups[:-self.keep]
+        for path in removed:
+            os.remove(path)
+        return removed
@@ -0,0 +1,171 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+from metrics import TimedConnection
+
+# Путь к базе данных по умолчанию (можно переопределить через FURNITURE_DB_PATH)
+DEFAULT_DB_PATH = Path(
+    os.environ.get(
+        "FURNITURE_DB_PATH",
+        Path(__file__).parent.parent / "database" / "furniture.db"
+    )
+)
+
+# Максимальное число одновременно открытых соединений
+DEFAULT_POOL_SIZE = int(os.environ.get("FURNITURE_DB_POOL_SIZE", "8"))
+
+# Сколько миллисекунд ждать освобождения блокировки записи
+DEFAULT_BUSY_TIMEOUT_MS = int(os.environ.get("FURNITURE_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Сколько секунд ждать свободное соединение, если пул исчерпан
+DEFAULT_ACQUIRE_TIMEOUT = float(os.environ.get("FURNITURE_DB_ACQUIRE_TIMEOUT", "30"))
+
+# PRAGMA, которые применяются один раз при открытии соединения
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+class ConnectionPool:
+    """
+    Пул соединений SQLite.
+
+    Соединения открываются лениво (не больше size штук), настраиваются
+    один раз при создании и затем переиспользуются. Внутри одного потока
+    вложенные вызовы connection() получают то же самое соединение, а
+    транзакция фиксируется только при выходе из внешнего блока.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, size: int = DEFAULT_POOL_SIZE,
+                 busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+
+        self.db_path = Path(db_path) if db_path is not None else DEFAULT_DB_PATH
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Открыть и настроить новое соединение"""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            factory=TimedConnection
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Взять соединение из пула.
+
+        Сначала используется свободное соединение, затем открывается новое
+        (пока не достигнут size), иначе ожидаем освобождения.
+        """
+        if self._closed:
+            raise RuntimeError("Пул соединений закрыт")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = len(self._connections) < self.size
+            if can_create:
+                conn = self._create_connection()
+                self._connections.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"Нет свободных соединений (размер пула: {self.size})"
+            )
+
+    def release(self, conn: sqlite3.Connection):
+        """Вернуть соединение в пул, откатив незавершенную транзакцию"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Контекстный менеджер соединения с транзакцией.
+
+        Коммит выполняется при выходе из внешнего блока, откат - при ошибке.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            # Вложенный вызов в том же потоке - переиспользуем соединение
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    def close(self):
+        """Закрыть все соединения пула"""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Соединение используется в другом потоке - закроется при release
+                pass
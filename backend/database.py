@@ -1,113 +1,375 @@
+import asyncio
+import base64
+import functools
+import json
+import os
 import sqlite3
-import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from connection_pool import (
+    ConnectionPool, DEFAULT_DB_PATH, DEFAULT_POOL_SIZE, DEFAULT_BUSY_TIMEOUT_MS,
+    PoolTimeoutError
+)
+from importers import PRODUCT_COLUMNS
+from migrations import (
+    LATEST_VERSION, PRICE_RANGE_BOUNDS, migrate, rebuild_search_index, rebuild_statistics,
+    schema_version
+)
+from reference_cache import ChangeWatcher, ReferenceCache
+
+# Допустимые ключи сортировки списка продукции -> столбец SQL
+PRODUCT_SORT_KEYS = {
+    "created_at": "p.created_at",
+    "price": "p.min_partner_price",
+    "name": "p.product_name",
+    "article": "p.article",
+    "id": "p.id",
+}
+
+# Число потоков, в которых выполняются запросы из асинхронных обработчиков
+DEFAULT_DB_WORKERS = int(os.environ.get("FURNITURE_DB_WORKERS", str(DEFAULT_POOL_SIZE)))
+
+# Максимальный размер страницы для GET /products
+MAX_PAGE_SIZE = 500
+
+# Поля продукта, которые можно менять через PUT /products/{id}
+PRODUCT_UPDATABLE_FIELDS = ('article', 'product_name', 'product_type_id', 
+                            'main_material_id', 'min_partner_price', 'param1', 'param2')
+
+# Максимальное число результатов /products/search
+MAX_SEARCH_LIMIT = 100
+
+# Под этими именами в статистике считаются продукты, тип или материал
+# которых не найден в справочнике (внешние ключи проверяются не всеми
+# писателями, например базами, созданными до включения foreign_keys)
+UNKNOWN_TYPE_NAME = "Неизвестный тип"
+UNKNOWN_MATERIAL_NAME = "Неизвестный материал"
+
+# Триграммный токенизатор FTS5 не ищет по фрагментам короче трех символов
+FTS_MIN_TERM_LENGTH = 3
+
+# Сколько ID подставлять в один запрос IN (...) (лимит параметров SQLite)
+SQL_IN_CHUNK_SIZE = 500
+
+# Маршруты продуктов по цехам для порции ID (по индексу idx_schedule_product)
+ROUTES_SQL = """
+    SELECT product_id, workshop_id, processing_order
+    FROM production_schedule
+    WHERE product_id IN ({placeholders})
+    ORDER BY product_id, processing_order
+"""
+
+# Сколько строк читать из курсора за один раз при экспорте
+EXPORT_CHUNK_SIZE = 1000
+
+# Сколько выгрузок одновременно держат соединение пула: потоковая выгрузка
+# занимает соединение и транзакцию чтения на все время скачивания
+MAX_CONCURRENT_EXPORTS = int(os.environ.get("FURNITURE_MAX_CONCURRENT_EXPORTS", "2"))
+
+# Наборы данных для экспорта: тип -> (запрос, заголовки столбцов для CSV/XLSX,
+# имена и типы столбцов для колоночных форматов Parquet/Arrow)
+EXPORT_QUERIES = {
+    "products": (
+        """
+        SELECT p.article, p.product_name, pt.type_name, m.material_name, 
+               p.min_partner_price, p.param1, p.param2, p.created_at
+        FROM products p
+        LEFT JOIN product_types pt ON p.product_type_id = pt.id
+        LEFT JOIN materials m ON p.main_material_id = m.id
+        """,
+        ["Артикул", "Наименование", "Тип", "Материал", 
+         "Цена", "Параметр1", "Параметр2", "Дата создания"],
+        [("article", "string"), ("product_name", "string"), ("type_name", "string"),
+         ("material_name", "string"), ("min_partner_price", "float64"),
+         ("param1", "float64"), ("param2", "float64"), ("created_at", "string")]
+    ),
+    "workshops": (
+        "SELECT workshop_name, worker_count, processing_time FROM workshops",
+        ["Название цеха", "Количество работников", "Время обработки (ч)"],
+        [("workshop_name", "string"), ("worker_count", "int64"),
+         ("processing_time", "int64")]
+    ),
+    "materials": (
+        # В схеме нет столбца description - выгружаем процент потерь
+        "SELECT material_name, loss_percentage FROM materials",
+        ["Материал", "Процент потерь"],
+        [("material_name", "string"), ("loss_percentage", "float64")]
+    ),
+}
+
+
+def build_fts_query(search: str) -> Optional[str]:
+    """
+    Запрос FTS5 MATCH из строки поиска.
+    
+    Каждое слово ищется как подстрока (в кавычках, поэтому спецсимволы FTS5
+    не интерпретируются), все слова должны встретиться. Слова короче трех
+    символов триграммный индекс не находит - они пропускаются; если длинных
+    слов нет совсем, возвращается None.
+    """
+    terms = [term for term in search.split() if len(term) >= FTS_MIN_TERM_LENGTH]
+    if not terms:
+        return None
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def like_pattern(search: str) -> str:
+    """Шаблон LIKE для поиска подстроки с экранированием % и _"""
+    return "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def named_distribution(rows, names: Dict[int, Dict], name_field: str,
+                       unknown_name: str) -> List[tuple]:
+    """
+    Пары (название, количество) по строкам (id справочника, количество).
+    
+    Строки с id, которого нет в справочнике, суммируются в unknown_name,
+    а не отбрасываются - иначе сумма распределения меньше числа продуктов.
+    """
+    distribution = []
+    unknown = 0
+    for reference_id, count in rows:
+        if reference_id in names:
+            distribution.append((names[reference_id][name_field], count))
+        else:
+            unknown += count
+    if unknown:
+        distribution.append((unknown_name, unknown))
+    distribution.sort(key=lambda item: item[1], reverse=True)
+    return distribution
+
+
+def encode_cursor(sort: str, order: str, value: Any, last_id: int) -> str:
+    """Упаковать позицию последней строки страницы в непрозрачный курсор"""
+    raw = json.dumps([sort, order, value, last_id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    """Распаковать курсор и проверить, что он выдан для той же сортировки"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        cursor_sort, cursor_order, value, last_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Некорректный курсор")
+
+    if cursor_sort != sort or cursor_order != order:
+        raise ValueError("Курсор выдан для другой сортировки")
+
+    return value, int(last_id)
+
+
+def build_products_page_query(search: Optional[str] = None,
+                              product_type_id: Optional[int] = None,
+                              material_id: Optional[int] = None,
+                              price_min: Optional[float] = None,
+                              price_max: Optional[float] = None,
+                              sort: str = "created_at", order: str = "desc",
+                              cursor: Optional[str] = None) -> Tuple[str, tuple]:
+    """
+    Запрос страницы продукции и его параметры (без значения LIMIT).
+
+    Используется в Database.get_products_page и в проверке планов
+    запросов (query_plans.py).
+    """
+    if sort not in PRODUCT_SORT_KEYS:
+        raise ValueError(f"Неизвестный ключ сортировки: {sort}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Неизвестное направление сортировки: {order}")
+
+    sort_column = PRODUCT_SORT_KEYS[sort]
+    conditions = []
+    params: List[Any] = []
+
+    search = search.strip() if search else None
+    if search:
+        match = build_fts_query(search)
+        if match is not None and all(len(term) >= FTS_MIN_TERM_LENGTH for term in search.split()):
+            # Подстроки ищутся по триграммному индексу, без сканирования таблицы
+            conditions.append("p.id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)")
+            params.append(match)
+        else:
+            pattern = like_pattern(search)
+            conditions.append("(p.product_name LIKE ? ESCAPE '\\' OR p.article LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+    if product_type_id is not None:
+        conditions.append("p.product_type_id = ?")
+        params.append(product_type_id)
+    if material_id is not None:
+        conditions.append("p.main_material_id = ?")
+        params.append(material_id)
+    if price_min is not None:
+        conditions.append("p.min_partner_price >= ?")
+        params.append(price_min)
+    if price_max is not None:
+        conditions.append("p.min_partner_price <= ?")
+        params.append(price_max)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, order)
+        comparison = "<" if order == "desc" else ">"
+        if sort == "id":
+            conditions.append(f"p.id {comparison} ?")
+            params.append(last_id)
+        else:
+            conditions.append(f"({sort_column}, p.id) {comparison} (?, ?)")
+            params.extend([value, last_id])
+
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = order.upper()
+    order_sql = (f"p.id {direction}" if sort == "id"
+                 else f"{sort_column} {direction}, p.id {direction}")
+
+    # Названия типа и материала берутся из кэша справочников, без JOIN
+    query = f"""
+    SELECT p.*
+    FROM products p
+    {where_sql}
+    ORDER BY {order_sql}
+    LIMIT ?
+    """
+    return query, tuple(params)
+
+
+def build_search_query(search: str, limit: int = 20) -> Tuple[str, tuple]:
+    """
+    Запрос /products/search и его параметры.
+
+    Обычно поиск идет по триграммному индексу products_fts. Слишком
+    короткий для триграмм запрос ищется по началу артикула или названия
+    диапазоном по индексам (как есть, с заглавной буквы и прописными).
+    Пустая (или из одних пробелов) строка дает ValueError.
+    """
+    search = search.strip()
+    if not search:
+        raise ValueError("Пустая строка поиска")
+    limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+    first_term = search.split()[0]
+    match = build_fts_query(search)
+
+    if match is None:
+        conditions = []
+        params: List[Any] = []
+        for prefix in dict.fromkeys([first_term, first_term.capitalize(), first_term.upper()]):
+            if not prefix:
+                continue
+            upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            for column in ("p.article", "p.product_name"):
+                conditions.append(f"({column} >= ? AND {column} < ?)")
+                params.extend([prefix, upper_bound])
+        query = f"""
+        SELECT p.*, NULL AS score
+        FROM products p
+        WHERE {' OR '.join(conditions)}
+        ORDER BY p.product_name, p.id
+        LIMIT ?
+        """
+        return query, tuple(params) + (limit,)
+
+    query = """
+    SELECT p.*, bm25(products_fts, 2.0, 1.0) AS score
+    FROM products_fts
+    JOIN products p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH ?
+    ORDER BY (instr(p.article, ?) = 1 OR instr(p.product_name, ?) = 1) DESC,
+             score, p.id
+    LIMIT ?
+    """
+    return query, (match, first_term.upper(), first_term[:1].upper() + first_term[1:], limit)
+
 
 class Database:
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE,
+                 busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 workers: int = DEFAULT_DB_WORKERS):
         """Инициализация подключения к базе данных SQLite"""
         if db_path is None:
-            self.db_path = Path(__file__).parent.parent / "database" / "furniture.db"
+            self.db_path = DEFAULT_DB_PATH
         else:
             self.db_path = Path(db_path)
         
         self.db_path.parent.mkdir(exist_ok=True)
+        
+        # Все запросы идут через общий пул настроенных соединений
+        self.pool = ConnectionPool(self.db_path, size=pool_size,
+                                   busy_timeout_ms=busy_timeout_ms)
+        
+        # Ограниченный пул потоков для запросов из async-обработчиков.
+        # Больше потоков, чем соединений, не имеет смысла - они будут ждать пул.
+        self.workers = max(1, min(workers, pool_size))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
+        # Справочники (типы, материалы, цехи) кэшируются в памяти и
+        # перечитываются только после изменения БД
+        self.watcher = ChangeWatcher(self.db_path)
+        self.reference = ReferenceCache(self, self.watcher)
+        
+        # Выгрузки не должны занять весь пул и оставить API без соединений
+        self._export_slots = threading.BoundedSemaphore(
+            max(1, min(MAX_CONCURRENT_EXPORTS, pool_size - 1))
+        )
+
     
     @contextmanager
     def get_connection(self):
-        """Контекстный менеджер для работы с подключением к БД"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        try:
+        """Контекстный менеджер для работы с подключением к БД (из пула)"""
+        with self.pool.connection() as conn:
+            changes_before = conn.total_changes
             yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+            changed = conn.total_changes != changes_before
+        
+        # Данные изменены - кэши должны перепроверить версию БД
+        if changed:
+            self.watcher.mark_dirty()
+    
+    async def run(self, func, *args, **kwargs) -> Any:
+        """
+        Выполнить блокирующий метод работы с БД в пуле потоков.
+        
+        Используется из async-обработчиков FastAPI, чтобы запросы к SQLite
+        не останавливали цикл событий:
+            products = await db.run(db.get_all_workshops)
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="db-worker")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+    
+    def close(self):
+        """Остановить пул потоков и закрыть все соединения с базой данных"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.watcher.close()
+        self.pool.close()
     
     def init_database(self) -> bool:
-        """Инициализация базы данных: создает таблицы и заполняет тестовыми данными"""
+        """
+        Инициализация базы данных: применяет миграции схемы (migrations.py)
+        и заполняет новую базу тестовыми данными.
+        
+        Если PRAGMA user_version уже равна последней миграции, схема
+        актуальна и ничего не выполняется, кроме чтения версии.
+        """
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Создаем все таблицы
-                tables_sql = [
-                    # Таблица типов продукции
-                    """
-                    CREATE TABLE IF NOT EXISTS product_types (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        type_name VARCHAR(50) NOT NULL UNIQUE,
-                        production_coefficient REAL NOT NULL CHECK(production_coefficient > 0)
-                    )
-                    """,
-                    
-                    # Таблица материалов
-                    """
-                    CREATE TABLE IF NOT EXISTS materials (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        material_name VARCHAR(100) NOT NULL UNIQUE,
-                        loss_percentage REAL NOT NULL CHECK(loss_percentage >= 0 AND loss_percentage <= 100)
-                    )
-                    """,
-                    
-                    # Таблица цехов
-                    """
-                    CREATE TABLE IF NOT EXISTS workshops (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        workshop_name VARCHAR(100) NOT NULL UNIQUE,
-                        worker_count INTEGER NOT NULL CHECK(worker_count > 0),
-                        processing_time INTEGER NOT NULL CHECK(processing_time > 0)
-                    )
-                    """,
-                    
-                    # Таблица продукции
-                    """
-                    CREATE TABLE IF NOT EXISTS products (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        article VARCHAR(50) NOT NULL,
-                        product_type_id INTEGER NOT NULL,
-                        product_name VARCHAR(200) NOT NULL,
-                        min_partner_price DECIMAL(10,2) NOT NULL CHECK(min_partner_price >= 0),
-                        main_material_id INTEGER NOT NULL,
-                        param1 REAL NOT NULL CHECK(param1 > 0),
-                        param2 REAL NOT NULL CHECK(param2 > 0),
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (product_type_id) REFERENCES product_types(id),
-                        FOREIGN KEY (main_material_id) REFERENCES materials(id)
-                    )
-                    """,
-                    
-                    # Таблица производственного графика
-                    """
-                    CREATE TABLE IF NOT EXISTS production_schedule (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        product_id INTEGER NOT NULL,
-                        workshop_id INTEGER NOT NULL,
-                        processing_order INTEGER NOT NULL CHECK(processing_order > 0),
-                        FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
-                        FOREIGN KEY (workshop_id) REFERENCES workshops(id),
-                        UNIQUE(product_id, workshop_id, processing_order)
-                    )
-                    """,
-                    
-                    # Триггер для обновления времени
-                    """
-                    CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
-                    AFTER UPDATE ON products
-                    BEGIN
-                        UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-                    END
-                    """
-                ]
+                version = schema_version(conn)
+                if version >= LATEST_VERSION:
+                    print(f"✅ Схема базы данных актуальна (версия {version})")
+                    return True
                 
-                # Выполняем все SQL команды
-                for sql in tables_sql:
-                    cursor.execute(sql)
+                migrate(conn)
+                if version > 0:
+                    print(f"✅ Схема базы данных обновлена до версии {LATEST_VERSION}")
+                    return True
                 
                 # Заполняем тестовыми данными
                 # Типы продукции
@@ -168,6 +430,27 @@ class Database:
             print(f"❌ Ошибка инициализации базы данных: {e}")
             return False
     
+    def check_ready(self) -> Dict[str, Any]:
+        """
+        Проверка готовности для /health/ready: БД отвечает на запрос,
+        все миграции схемы применены
+        """
+        with self.get_connection() as conn:
+            version = schema_version(conn)
+            conn.execute("SELECT 1 FROM products LIMIT 1").fetchall()
+        return {"schema_version": version, "schema_current": version >= LATEST_VERSION}
+    
+    def data_revision(self) -> int:
+        """
+        Номер ревизии данных (таблица data_revision).
+        
+        Читается при каждом вызове (одна строка по первичному ключу): кэш
+        по поколению ChangeWatcher отставал бы от записей других процессов
+        на интервал опроса, и клиент получал бы 304 с устаревшими данными.
+        """
+        row = self.execute_query("SELECT revision FROM data_revision WHERE id = 1", fetch_one=True)
+        return row["revision"] if row else 0
+    
     def execute_query(self, query: str, params: tuple = None, 
                      fetch_one: bool = False, fetch_all: bool = False) -> Any:
         """Универсальный метод для выполнения SQL запросов"""
@@ -187,47 +470,675 @@ class Database:
             print(f"❌ Ошибка выполнения запроса: {e}")
             raise
     
+    def query_rows(self, query: str, params: tuple = None) -> tuple:
+        """
+        Выполнить запрос и вернуть (имена столбцов, список кортежей).
+        
+        Строки берутся из курсора как есть, без sqlite3.Row и dict, - для
+        больших списков и колоночного формата ответа.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(query, params or ())
+            columns = [column[0] for column in cursor.description]
+            return columns, cursor.fetchall()
+    
     def get_all_products(self) -> List[Dict]:
         """Получить все продукты"""
-        query = """
-        SELECT 
-            p.*,
-            pt.type_name as product_type_name,
-            m.material_name
-        FROM products p
-        LEFT JOIN product_types pt ON p.product_type_id = pt.id
-        LEFT JOIN materials m ON p.main_material_id = m.id
-        ORDER BY p.created_at DESC
+        query = "SELECT p.* FROM products p ORDER BY p.created_at DESC"
+        return self._attach_reference_names(self.execute_query(query, fetch_all=True))
+    
+    def _attach_reference_names(self, products: List[Dict]) -> List[Dict]:
+        """Добавить к продуктам названия типа и материала из кэша справочников"""
+        types = self.reference.product_types_by_id()
+        materials = self.reference.materials_by_id()
+        for product in products:
+            product_type = types.get(product["product_type_id"])
+            material = materials.get(product["main_material_id"])
+            product["product_type_name"] = product_type["type_name"] if product_type else None
+            product["material_name"] = material["material_name"] if material else None
+        return products
+    
+    def _load_routes(self, conn, product_ids: List[int],
+                     workshops: Optional[Dict[int, Dict]] = None) -> Dict[int, List[Dict]]:
         """
-        return self.execute_query(query, fetch_all=True)
+        Маршруты по цехам для набора продуктов одним запросом на порцию ID.
+        
+        Строки графика читаются по индексу idx_schedule_product уже в порядке
+        обработки, сведения о цехах берутся из workshops или, если их не
+        передали, из кэша справочников.
+        """
+        if workshops is None:
+            workshops = self.reference.workshops_by_id()
+        routes: Dict[int, List[Dict]] = {product_id: [] for product_id in product_ids}
+        
+        for start in range(0, len(product_ids), SQL_IN_CHUNK_SIZE):
+            chunk = product_ids[start:start + SQL_IN_CHUNK_SIZE]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = conn.execute(ROUTES_SQL.format(placeholders=placeholders), chunk)
+            for product_id, workshop_id, processing_order in rows:
+                workshop = workshops.get(workshop_id, {"id": workshop_id})
+                routes[product_id].append(dict(workshop, processing_order=processing_order))
+        
+        return routes
+    
+    def _attach_workshops(self, products: List[Dict]) -> List[Dict]:
+        """Добавить к продуктам маршрут по цехам и суммарное время обработки"""
+        if not products:
+            return products
+        
+        with self.get_connection() as conn:
+            routes = self._load_routes(conn, [product["id"] for product in products])
+        
+        for product in products:
+            route = routes[product["id"]]
+            product["workshops"] = route
+            product["total_production_time"] = sum(
+                workshop.get("processing_time") or 0 for workshop in route
+            )
+        return products
+    
+    def _columnar_products(self, columns: List[str], rows: List[tuple],
+                           include_workshops: bool = False) -> Dict[str, Any]:
+        """
+        Продукты в колоночном виде: к кортежам строк курсора дописываются
+        названия типа и материала (и маршрут по цехам) без создания словарей
+        """
+        types = self.reference.product_types_by_id()
+        materials = self.reference.materials_by_id()
+        id_index = columns.index("id")
+        type_index = columns.index("product_type_id")
+        material_index = columns.index("main_material_id")
+        
+        extra_columns = ["product_type_name", "material_name"]
+        routes: Dict[int, List[Dict]] = {}
+        if include_workshops and rows:
+            with self.get_connection() as conn:
+                routes = self._load_routes(conn, [row[id_index] for row in rows])
+        if include_workshops:
+            extra_columns += ["workshops", "total_production_time"]
+        
+        result = []
+        for row in rows:
+            product_type = types.get(row[type_index])
+            material = materials.get(row[material_index])
+            extra = (product_type["type_name"] if product_type else None,
+                     material["material_name"] if material else None)
+            if include_workshops:
+                route = routes[row[id_index]]
+                extra += (route, sum(workshop.get("processing_time") or 0 for workshop in route))
+            result.append(row + extra)
+        
+        return {"columns": columns + extra_columns, "rows": result}
+    
+    def get_products_page(self, search: Optional[str] = None,
+                          product_type_id: Optional[int] = None,
+                          material_id: Optional[int] = None,
+                          price_min: Optional[float] = None,
+                          price_max: Optional[float] = None,
+                          sort: str = "created_at", order: str = "desc",
+                          cursor: Optional[str] = None, limit: int = 50,
+                          include_workshops: bool = False,
+                          columnar: bool = False) -> Dict[str, Any]:
+        """
+        Получить страницу продукции с фильтрами и сортировкой.
+        
+        Используется keyset-пагинация: вместо OFFSET курсор хранит значение
+        ключа сортировки и id последней строки, поэтому стоимость запроса
+        зависит от размера страницы, а не от размера каталога.
+        
+        С include_workshops к каждому продукту добавляются маршрут по цехам
+        и total_production_time - одним запросом на всю страницу.
+        
+        Возвращает:
+            {"items": [...], "next_cursor": str или None}
+            при columnar=True вместо items - "columns" и "rows" (кортежи)
+        """
+        query, params = build_products_page_query(
+            search=search, product_type_id=product_type_id, material_id=material_id,
+            price_min=price_min, price_max=price_max, sort=sort, order=order,
+            cursor=cursor
+        )
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sort_column = PRODUCT_SORT_KEYS[sort]
+        
+        # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+        columns, rows = self.query_rows(query, params + (limit + 1,))
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            sort_value = last[columns.index(sort_column.split(".", 1)[1])]
+            next_cursor = encode_cursor(sort, order, sort_value, last[columns.index("id")])
+        
+        if columnar:
+            return {**self._columnar_products(columns, rows, include_workshops),
+                    "next_cursor": next_cursor}
+        
+        items = self._attach_reference_names([dict(zip(columns, row)) for row in rows])
+        if include_workshops:
+            self._attach_workshops(items)
+        return {"items": items, "next_cursor": next_cursor}
+    
+    def search_products(self, search: str, limit: int = 20) -> List[Dict]:
+        """
+        Полнотекстовый поиск продукции по артикулу и названию.
+        
+        Совпадения ищутся по триграммному индексу products_fts (подстроки,
+        без учета регистра, в том числе по-русски). Сначала идут продукты,
+        артикул или название которых начинается с первого слова запроса,
+        затем - по релевантности bm25 (совпадение в артикуле весит больше).
+        """
+        query, params = build_search_query(search, limit)
+        rows = self.execute_query(query, params, fetch_all=True)
+        return self._attach_reference_names(rows)
     
     def get_all_workshops(self) -> List[Dict]:
-        """Получить все цехи"""
-        return self.execute_query("SELECT * FROM workshops ORDER BY workshop_name", fetch_all=True)
+        """Получить все цехи (из кэша справочников)"""
+        return self.reference.workshops()
     
     def get_product_types(self) -> List[Dict]:
-        """Получить все типы продукции"""
-        return self.execute_query("SELECT * FROM product_types ORDER BY type_name", fetch_all=True)
+        """Получить все типы продукции (из кэша справочников)"""
+        return self.reference.product_types()
     
     def get_materials(self) -> List[Dict]:
-        """Получить все материалы"""
-        return self.execute_query("SELECT * FROM materials ORDER BY material_name", fetch_all=True)
+        """Получить все материалы (из кэша справочников)"""
+        return self.reference.materials()
     
     def add_product(self, article: str, product_type_id: int, product_name: str,
                    min_partner_price: float, main_material_id: int,
-                   param1: float, param2: float) -> Optional[int]:
-        """Добавить новый продукт"""
-        query = """
-        INSERT INTO products 
-        (article, product_type_id, product_name, min_partner_price, 
-         main_material_id, param1, param2)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        return self.execute_query(
-            query, 
+                   param1: float, param2: float,
+                   workshop_ids: Optional[List[int]] = None) -> Optional[int]:
+        """Добавить новый продукт и его маршрут по цехам одной транзакцией"""
+        row = (article, product_type_id, product_name, min_partner_price,
+               main_material_id, param1, param2)
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._insert_products(conn, [row], [workshop_ids or []])[0]
+
+    
+    def insert_products_batch(self, rows: List[tuple], 
+                              routes: Optional[List[List[int]]] = None) -> int:
+        """
+        Вставить порцию продуктов одной транзакцией через executemany.
+        
+        rows - кортежи (article, product_type_id, product_name, min_partner_price,
+        main_material_id, param1, param2); routes - для каждой строки список ID
+        цехов в порядке обработки. Возвращает число добавленных строк графика.
+        """
+        if not rows:
+            return 0
+        
+        with self.get_connection() as conn:
+            # Блокировка записи берется сразу: id новых строк идут подряд
+            conn.execute("BEGIN IMMEDIATE")
+            return self._insert_products(conn, rows, routes)[1]
+    
+    def _insert_products(self, conn, rows: List[tuple],
+                         routes: Optional[List[List[int]]] = None) -> Tuple[int, int]:
+        """
+        Вставить продукты и их маршруты в уже открытой транзакции записи.
+        
+        Возвращает (id первой строки, число строк графика): id новых строк
+        идут подряд, так как блокировка записи уже взята.
+        """
+        conn.executemany("""
+            INSERT INTO products 
             (article, product_type_id, product_name, min_partner_price, 
              main_material_id, param1, param2)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        if not routes or not any(routes):
+            return first_id, 0
+        
+        schedule = [
+            (first_id + index, workshop_id, order)
+            for index, route in enumerate(routes)
+            for order, workshop_id in enumerate(route, 1)
+        ]
+        conn.executemany("""
+            INSERT INTO production_schedule (product_id, workshop_id, processing_order)
+            VALUES (?, ?, ?)
+        """, schedule)
+        return first_id, len(schedule)
+    
+    def get_product_workshops(self, product_id: int) -> Optional[List[Dict]]:
+        """
+        Маршрут продукта: цехи в порядке обработки.
+        
+        Возвращает None, если продукта с таким ID нет.
+        """
+        with self.get_connection() as conn:
+            if conn.execute("SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                return None
+            return self._load_routes(conn, [product_id])[product_id]
+    
+    def get_schedule_data(self, product_ids: List[int]) -> Tuple[Dict[int, List[Dict]], Dict[int, Dict]]:
+        """
+        Маршруты продуктов из списка и цехи по ID для планирования.
+        
+        Отсутствующих продуктов в маршрутах нет. Маршруты и цехи читаются
+        в одной транзакции на одном соединении, как в iter_export_chunks,
+        поэтому каждый цех маршрута есть в workshops, даже если цехи
+        меняются во время чтения.
+        """
+        unique_ids = list(dict.fromkeys(product_ids))
+        with self.get_connection() as conn:
+            conn.execute("BEGIN")
+            workshops = {row["id"]: dict(row) for row in conn.execute("SELECT * FROM workshops")}
+            
+            found = set()
+            for start in range(0, len(unique_ids), SQL_IN_CHUNK_SIZE):
+                chunk = unique_ids[start:start + SQL_IN_CHUNK_SIZE]
+                placeholders = ",".join("?" for _ in chunk)
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM products WHERE id IN ({placeholders})", chunk
+                ))
+            routes = self._load_routes(conn, [product_id for product_id in unique_ids
+                                              if product_id in found], workshops)
+            return routes, workshops
+    
+    def replace_product_routes(self, routes: Dict[int, List[int]]) -> Dict[str, Any]:
+        """
+        Заменить маршруты нескольких продуктов одной транзакцией.
+        
+        routes - {product_id: [workshop_id, ...]} в порядке обработки; пустой
+        список очищает маршрут. Старые строки графика удаляются и новые
+        вставляются через executemany. Если хотя бы одного продукта нет,
+        ничего не меняется, а его ID возвращаются в "missing".
+        """
+        workshops = self.reference.workshops_by_id()
+        for product_id, workshop_ids in routes.items():
+            unknown = [workshop_id for workshop_id in workshop_ids if workshop_id not in workshops]
+            if unknown:
+                raise ValueError(f"Продукт {product_id}: цехи {unknown} не найдены")
+            if len(set(workshop_ids)) != len(workshop_ids):
+                raise ValueError(f"Продукт {product_id}: цех указан дважды")
+        
+        product_ids = list(routes)
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            
+            found = set()
+            for start in range(0, len(product_ids), SQL_IN_CHUNK_SIZE):
+                chunk = product_ids[start:start + SQL_IN_CHUNK_SIZE]
+                placeholders = ",".join("?" for _ in chunk)
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM products WHERE id IN ({placeholders})", chunk
+                ))
+            missing = [product_id for product_id in product_ids if product_id not in found]
+            if missing:
+                conn.rollback()
+                return {"products": 0, "schedule_rows": 0, "missing": missing}
+            
+            schedule_rows = self._replace_routes(conn, routes)
+        
+        return {"products": len(product_ids), "schedule_rows": schedule_rows, "missing": []}
+    
+    def _replace_routes(self, conn, routes: Dict[int, List[int]]) -> int:
+        """Заменить строки графика существующих продуктов, возвращает число новых строк"""
+        conn.executemany(
+            "DELETE FROM production_schedule WHERE product_id = ?",
+            [(product_id,) for product_id in routes]
         )
+        schedule = [
+            (product_id, workshop_id, order)
+            for product_id, workshop_ids in routes.items()
+            for order, workshop_id in enumerate(workshop_ids, 1)
+        ]
+        conn.executemany("""
+            INSERT INTO production_schedule (product_id, workshop_id, processing_order)
+            VALUES (?, ?, ?)
+        """, schedule)
+        return len(schedule)
+    
+    def get_product(self, product_id: int, include_workshops: bool = False) -> Optional[Dict]:
+        """Получить продукт по ID вместе с названиями типа и материала (и маршрутом)"""
+        product = self.execute_query("SELECT * FROM products WHERE id = ?",
+                                     (product_id,), fetch_one=True)
+        if product:
+            self._attach_reference_names([product])
+            # Прежние имена полей этого эндпоинта
+            product["type_name"] = product["product_type_name"]
+            if include_workshops:
+                self._attach_workshops([product])
+        return product
+    
+    def update_product(self, product_id: int, fields: Dict[str, Any],
+                       workshop_ids: Optional[List[int]] = None) -> bool:
+        """
+        Обновить указанные поля продукта и (если workshop_ids не None) заменить
+        его маршрут по цехам одной транзакцией.
+        
+        Возвращает False, если продукта с таким ID нет.
+        """
+        columns = [field for field in PRODUCT_UPDATABLE_FIELDS if field in fields]
+        if not columns and workshop_ids is None:
+            raise ValueError("Нет полей для обновления")
+        
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if columns:
+                assignments = ", ".join(f"{column} = ?" for column in columns)
+                values = [fields[column] for column in columns] + [product_id]
+                cursor = conn.execute(f"UPDATE products SET {assignments} WHERE id = ?", values)
+                found = cursor.rowcount > 0
+            else:
+                found = conn.execute(
+                    "SELECT 1 FROM products WHERE id = ?", (product_id,)
+                ).fetchone() is not None
+            
+            if found and workshop_ids is not None:
+                self._replace_routes(conn, {product_id: workshop_ids})
+            return found
+    
+    def delete_product(self, product_id: int) -> bool:
+        """
+        Удалить продукт (график производства удаляется каскадно).
+        
+        Возвращает False, если продукта с таким ID нет.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            return cursor.rowcount > 0
+    
+    def delete_products(self, product_ids: List[int]) -> int:
+        """
+        Массовое удаление продуктов, возвращает число удаленных.
+        
+        ID подставляются в IN (...) порциями по SQL_IN_CHUNK_SIZE в одной
+        транзакции, поэтому размер списка не упирается в лимит параметров.
+        """
+        unique_ids = list(dict.fromkeys(product_ids))
+        deleted = 0
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(unique_ids), SQL_IN_CHUNK_SIZE):
+                chunk = unique_ids[start:start + SQL_IN_CHUNK_SIZE]
+                placeholders = ",".join("?" for _ in chunk)
+                deleted += conn.execute(
+                    f"DELETE FROM products WHERE id IN ({placeholders})", chunk
+                ).rowcount
+        return deleted
+    
+    def apply_product_operations(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Применить пакет операций create/update/delete одной транзакцией.
+        
+        operations - проверенные операции (importers.validate_bulk_operations):
+        {"index", "op", "id", "fields", "route"}. ID изменяемых продуктов
+        загружаются во временную таблицу, и существование, удаление и
+        выборка идут соединением с ней, без списков IN (...). Обновления
+        группируются по набору полей, и каждая группа - один executemany.
+        Внешние ключи включены в пуле соединений, поэтому график удаленных
+        продуктов удаляется каскадно.
+        
+        Операция с несуществующим продуктом не прерывает пакет: ее статус
+        "not_found". Возвращает итоги и результаты в порядке операций.
+        """
+        targets = [operation for operation in operations if operation["op"] != "create"]
+        creates = [operation for operation in operations if operation["op"] == "create"]
+        results: Dict[int, Dict[str, Any]] = {}
+        schedule_rows = 0
+        
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            
+            found = set()
+            if targets:
+                conn.execute("""
+                    CREATE TEMP TABLE bulk_targets (
+                        id INTEGER PRIMARY KEY,
+                        op TEXT NOT NULL
+                    )
+                """)
+                conn.executemany(
+                    "INSERT INTO temp.bulk_targets (id, op) VALUES (?, ?)",
+                    [(operation["id"], operation["op"]) for operation in targets]
+                )
+                found.update(row[0] for row in conn.execute(
+                    "SELECT t.id FROM temp.bulk_targets t JOIN products p ON p.id = t.id"
+                ))
+                
+                conn.execute("""
+                    DELETE FROM products
+                    WHERE id IN (SELECT id FROM temp.bulk_targets WHERE op = 'delete')
+                """)
+                conn.execute("DROP TABLE temp.bulk_targets")
+            
+            # Обновления: один UPDATE на каждый набор изменяемых полей
+            groups: Dict[tuple, List[tuple]] = {}
+            routes: Dict[int, List[int]] = {}
+            for operation in targets:
+                if operation["op"] != "update" or operation["id"] not in found:
+                    continue
+                columns = tuple(operation["fields"])
+                if columns:
+                    groups.setdefault(columns, []).append(
+                        tuple(operation["fields"][column] for column in columns)
+                        + (operation["id"],)
+                    )
+                if operation["route"] is not None:
+                    routes[operation["id"]] = operation["route"]
+            
+            for columns, rows in groups.items():
+                assignments = ", ".join(f"{column} = ?" for column in columns)
+                conn.executemany(f"UPDATE products SET {assignments} WHERE id = ?", rows)
+            if routes:
+                schedule_rows += self._replace_routes(conn, routes)
+            
+            if creates:
+                rows = [tuple(operation["fields"][column] for column in PRODUCT_COLUMNS)
+                        for operation in creates]
+                first_id, created_rows = self._insert_products(
+                    conn, rows, [operation["route"] or [] for operation in creates]
+                )
+                schedule_rows += created_rows
+                for offset, operation in enumerate(creates):
+                    results[operation["index"]] = {"id": first_id + offset, "status": "created"}
+        
+        summary = {"created": len(creates), "updated": 0, "deleted": 0, "not_found": 0}
+        for operation in targets:
+            if operation["id"] not in found:
+                status = "not_found"
+            else:
+                status = "updated" if operation["op"] == "update" else "deleted"
+            summary[status] += 1
+            results[operation["index"]] = {"id": operation["id"], "status": status}
+        
+        summary["schedule_rows"] = schedule_rows
+        summary["results"] = [
+            {"index": operation["index"], "op": operation["op"], **results[operation["index"]]}
+            for operation in operations
+        ]
+        return summary
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        Собрать статистику для отчетов.
+        
+        Счетчики и цены читаются из таблиц-агрегатов, которые поддерживаются
+        триггерами, поэтому время ответа не зависит от размера каталога.
+        """
+        types = self.reference.product_types_by_id()
+        materials = self.reference.materials_by_id()
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Общая статистика и статистика по ценам
+            cursor.execute("""
+                SELECT product_count, price_sum, price_min, price_max
+                FROM product_stats WHERE id = 1
+            """)
+            stats = cursor.fetchone()
+            total_products = stats["product_count"] if stats else 0
+            price_avg = stats["price_sum"] / total_products if total_products else 0
+            price_min = stats["price_min"] if stats else None
+            price_max = stats["price_max"] if stats else None
+            
+            # Распределение по типам и материалам (строк не больше, чем справочников)
+            cursor.execute("""
+                SELECT product_type_id, product_count FROM product_type_stats
+                WHERE product_count > 0
+                ORDER BY product_count DESC
+            """)
+            type_distribution = named_distribution(
+                cursor.fetchall(), types, "type_name", UNKNOWN_TYPE_NAME
+            )
+            
+            cursor.execute("""
+                SELECT material_id, product_count FROM material_stats
+                WHERE product_count > 0
+                ORDER BY product_count DESC
+            """)
+            material_distribution = named_distribution(
+                cursor.fetchall(), materials, "material_name", UNKNOWN_MATERIAL_NAME
+            )
+            
+            # Распределение по ценовым диапазонам
+            cursor.execute("SELECT range_index, product_count FROM price_range_stats")
+            range_counts = dict(cursor.fetchall())
+            bounds = (0,) + PRICE_RANGE_BOUNDS + (None,)
+            price_distribution = [
+                (bounds[index], bounds[index + 1], range_counts.get(index, 0))
+                for index in range(len(bounds) - 1)
+            ]
+            
+            # Время производства: время цеха, умноженное на число маршрутов через него
+            cursor.execute("""
+                SELECT TOTAL(w.processing_time * s.route_count)
+                FROM workshop_route_stats s
+                JOIN workshops w ON w.id = s.workshop_id
+            """)
+            total_production_time = cursor.fetchone()[0]
+            
+            # Последние добавленные товары (по индексу idx_products_created_at)
+            cursor.execute("""
+                SELECT article, product_name, min_partner_price, created_at
+                FROM products
+                ORDER BY created_at DESC
+                LIMIT 10
+            """)
+            recent_products = cursor.fetchall()
+            
+            # Статистика по цехам (производительность)
+            cursor.execute("""
+                SELECT w.workshop_name, w.worker_count, w.processing_time, 
+                       ROUND(w.worker_count * 100.0 / w.processing_time, 2) as productivity,
+                       COALESCE(s.route_count, 0) as route_count
+                FROM workshops w
+                LEFT JOIN workshop_route_stats s ON s.workshop_id = w.id
+                ORDER BY productivity DESC
+            """)
+            workshop_stats = cursor.fetchall()
+        
+        # Размеры справочников берем из кэша
+        return {
+            "total_products": total_products,
+            "total_workshops": len(self.reference.workshops()),
+            "total_types": len(types),
+            "total_materials": len(materials),
+            "price_avg": float(price_avg) if price_avg else 0,
+            "price_min": float(price_min) if price_min else 0,
+            "price_max": float(price_max) if price_max else 0,
+            "total_production_time": total_production_time,
+            "avg_production_time": (
+                total_production_time / total_products if total_products else 0
+            ),
+            "type_distribution": [
+                {"type": row[0], "count": row[1]} 
+                for row in type_distribution
+            ],
+            "material_distribution": [
+                {"material": row[0], "count": row[1]} 
+                for row in material_distribution
+            ],
+            "price_distribution": [
+                {"min": row[0], "max": row[1], "count": row[2]}
+                for row in price_distribution
+            ],
+            "recent_products": [
+                {
+                    "article": row[0],
+                    "name": row[1],
+                    "price": float(row[2]) if row[2] else 0,
+                    "date": row[3]
+                } 
+                for row in recent_products
+            ],
+            "workshop_stats": [
+                {
+                    "name": row[0],
+                    "workers": row[1],
+                    "processing_time": row[2],
+                    "productivity": row[3],
+                    "route_count": row[4]
+                }
+                for row in workshop_stats
+            ]
+        }
+    
+    def rebuild_statistics(self):
+        """Пересчитать агрегаты статистики с нуля (например, после ручных правок БД)"""
+        with self.get_connection() as conn:
+            rebuild_statistics(conn)
+    
+    def rebuild_search_index(self):
+        """Перестроить полнотекстовый индекс (например, после ручных правок БД)"""
+        with self.get_connection() as conn:
+            rebuild_search_index(conn)
+    
+    def get_export_headers(self, data_type: str) -> List[str]:
+        """Заголовки столбцов для экспорта указанного набора данных"""
+        if data_type not in EXPORT_QUERIES:
+            raise ValueError("Неверный тип данных")
+        return EXPORT_QUERIES[data_type][1]
+    
+    def get_export_fields(self, data_type: str) -> List[tuple]:
+        """Имена и типы столбцов для колоночных форматов экспорта"""
+        if data_type not in EXPORT_QUERIES:
+            raise ValueError("Неверный тип данных")
+        return EXPORT_QUERIES[data_type][2]
+    
+    def iter_export_chunks(self, data_type: str, 
+                           chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[sqlite3.Row]]:
+        """
+        Читать набор данных для экспорта порциями по chunk_size строк.
+        
+        Все порции читаются в одной транзакции, то есть из одного снимка БД,
+        даже если во время выгрузки кто-то пишет в таблицы.
+        
+        Потоковый ответ перебирает генератор в пуле потоков Starlette, а не
+        в self.run, и держит соединение и транзакцию до конца скачивания.
+        Поэтому одновременных выгрузок не больше MAX_CONCURRENT_EXPORTS
+        (и всегда меньше размера пула); следующая ждет свободного места
+        не дольше таймаута пула и завершается PoolTimeoutError.
+        """
+        query = EXPORT_QUERIES[data_type][0]
+        if not self._export_slots.acquire(timeout=self.pool.acquire_timeout):
+            raise PoolTimeoutError(
+                f"Слишком много одновременных выгрузок (не больше {MAX_CONCURRENT_EXPORTS})"
+            )
+        try:
+            conn = self.pool.acquire()
+            try:
+                conn.execute("BEGIN")
+                cursor = conn.execute(query)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                self.pool.release(conn)
+        finally:
+            self._export_slots.release()
 
 
 # Глобальный экземпляр для использования
@@ -0,0 +1,122 @@
+import csv
+import io
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+# Метка порядка байтов, чтобы Excel правильно определял UTF-8
+UTF8_BOM = "\ufeff"
+
+# Поддерживаемые форматы выгрузки: формат -> (расширение файла, MIME-тип)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv; charset=utf-8"),
+    "columnar": ("json", "application/json"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+class ExportFormatUnavailable(Exception):
+    """Для выбранного формата не установлена нужная библиотека"""
+
+
+def stream_csv(headers: List[str], chunks: Iterable[Sequence[Sequence]]) -> Iterator[bytes]:
+    """
+    Построчно сформировать CSV из порций строк.
+
+    Каждая порция записывается через csv.writer (с корректным
+    экранированием кавычек, запятых и переводов строк) и сразу отдается
+    клиенту, поэтому память не зависит от числа строк.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    buffer.write(UTF8_BOM)
+    writer.writerow(headers)
+
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def write_export_file(export_format: str, headers: List[str],
+                      fields: List[Tuple[str, str]],
+                      chunks: Iterable[Sequence[Sequence]]) -> str:
+    """
+    Записать выгрузку в формате parquet, arrow или xlsx во временный файл.
+
+    Строки поступают порциями из курсора и сразу дописываются в файл, так
+    что в памяти одновременно находится только одна порция. Возвращает
+    путь к файлу - удалить его должен вызывающий код.
+    """
+    extension = EXPORT_FORMATS[export_format][0]
+    fd, path = tempfile.mkstemp(prefix="furniture_export_", suffix=f".{extension}")
+    os.close(fd)
+
+    try:
+        if export_format == "xlsx":
+            _write_xlsx(path, headers, chunks)
+        else:
+            _write_arrow(path, export_format, fields, chunks)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path
+
+
+def _write_arrow(path: str, export_format: str, fields: List[Tuple[str, str]],
+                 chunks: Iterable[Sequence[Sequence]]):
+    """Колоночная выгрузка: каждая порция строк становится RecordBatch"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportFormatUnavailable(
+            "Для выгрузки в Parquet/Arrow установите пакет pyarrow"
+        )
+
+    schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in fields])
+
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_file(path, schema)
+        write = writer.write_batch
+
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, schema)
+            ]
+            write(pa.RecordBatch.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+
+
+def _write_xlsx(path: str, headers: List[str], chunks: Iterable[Sequence[Sequence]]):
+    """Выгрузка в Excel в потоковом режиме openpyxl (write_only)"""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportFormatUnavailable("Для выгрузки в Excel установите пакет openpyxl")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title="Данные")
+    sheet.append(headers)
+
+    for rows in chunks:
+        for row in rows:
+            sheet.append(tuple(row))
+
+    workbook.save(path)
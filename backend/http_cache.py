@@ -0,0 +1,255 @@
+import gzip
+import os
+import zlib
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен - сжимаем только gzip
+    brotli = None
+
+# Ответы меньше этого размера (в байтах) не сжимаются
+COMPRESSION_MIN_SIZE = int(os.environ.get("FURNITURE_COMPRESSION_MIN_SIZE", "1024"))
+
+# Уровни сжатия: быстрые, чтобы сжатие не стоило дороже передачи
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Какие ответы имеет смысл сжимать (parquet, xlsx, gzip уже сжаты)
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# Пути GET-запросов, ответ которых зависит только от URL и данных БД
+CONDITIONAL_PATHS = ("/products", "/workshops", "/product-types", "/materials",
+                     "/reports", "/export")
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _with_vary(headers: Iterable[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Добавить Accept-Encoding в Vary, не дублируя уже указанные значения"""
+    headers = list(headers)
+    positions = [index for index, (key, _) in enumerate(headers) if key.lower() == b"vary"]
+    tokens = {token.strip().lower()
+              for index in positions for token in headers[index][1].split(b",")}
+    if b"accept-encoding" in tokens or b"*" in tokens:
+        return headers
+
+    if positions:
+        key, value = headers[positions[-1]]
+        headers[positions[-1]] = (key, value + b", Accept-Encoding")
+    else:
+        headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Выбрать кодировку по Accept-Encoding: br (если есть brotli), затем gzip"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(token.strip())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Потоковый компрессор gzip или brotli с общим интерфейсом"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Сжать порцию и сбросить ее клиенту (без ожидания следующих)"""
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    """Сжать тело ответа целиком"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware: сжатие JSON, CSV и текстовых ответов gzip или brotli.
+
+    Обычный ответ сжимается целиком, если он не меньше minimum_size.
+    Потоковый ответ (StreamingResponse) сжимается по мере отправки
+    порций, поэтому выгрузка по-прежнему не собирается в памяти.
+
+    Каждый ответ, сжатый или нет, получает Vary: Accept-Encoding, иначе
+    кэш между клиентом и сервером может отдать сжатое тело клиенту без
+    поддержки сжатия или наоборот.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_vary(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": _with_vary(message.get("headers", []))}
+            await send(message)
+
+        encoding = choose_encoding(_header(scope, b"accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send_with_vary)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = {key.lower(): value for key, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in headers or message["status"] < 200
+                        or message["status"] in (204, 304)
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    passthrough = True
+                    await send_with_vary(message)
+                else:
+                    # Заголовки отправим, когда станет ясно, сжимать ли тело
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send_with_vary(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body:
+                    # Тело целиком в одном сообщении
+                    if len(body) < self.minimum_size:
+                        await send_with_vary(start_message)
+                        await send_with_vary(message)
+                        return
+                    body = compress_body(encoding, body)
+                    await send_with_vary(self._compressed_start(start_message, encoding, len(body)))
+                    await send_with_vary({"type": "http.response.body", "body": body})
+                    return
+
+                compressor = _Compressor(encoding)
+                await send_with_vary(self._compressed_start(start_message, encoding, None))
+
+            data = compressor.compress(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send_with_vary({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressed_start(message, encoding: str, length: Optional[int]):
+        headers: List[Tuple[bytes, bytes]] = [
+            (key, value) for key, value in message.get("headers", [])
+            if key.lower() != b"content-length"
+        ]
+        headers.append((b"content-encoding", encoding.encode("latin-1")))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        return {**message, "headers": headers}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Сравнение If-None-Match с ETag (слабое сравнение, как требует RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:
+    """
+    ASGI-middleware: ETag и ответ 304 Not Modified для GET-запросов к API.
+
+    ETag строится из ревизии данных: revision() - корутина, возвращающая
+    дешевый маркер изменений (счетчик, который триггеры увеличивают при
+    каждой записи, в том числе из других процессов).
+    Если клиент прислал If-None-Match с текущим ETag, обработчик не
+    вызывается вовсе.
+    """
+
+    def __init__(self, app, revision: Callable[[], Awaitable[int]],
+                 paths: Iterable[str] = CONDITIONAL_PATHS):
+        self.app = app
+        self.revision = revision
+        self.paths = tuple(paths)
+
+    def _applies(self, scope) -> bool:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return False
+        path = scope["path"]
+        return any(path == prefix or path.startswith(prefix + "/") for prefix in self.paths)
+
+    async def __call__(self, scope, receive, send):
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Ревизия берется до выполнения запроса: если данные изменятся
+        # во время него, следующий запрос получит новый ETag
+        etag = f'W/"{await self.revision()}"'
+        if etag_matches(_header(scope, b"if-none-match"), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag.encode("latin-1")),
+                            (b"cache-control", b"no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [(key, value) for key, value in message.get("headers", [])
+                           if key.lower() not in (b"etag", b"cache-control")]
+                headers.append((b"etag", etag.encode("latin-1")))
+                headers.append((b"cache-control", b"no-cache"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
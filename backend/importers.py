@@ -0,0 +1,432 @@
+import csv
+import io
+import json
+import re
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Сколько строк проверять и вставлять в одной транзакции
+IMPORT_BATCH_SIZE = 5000
+
+# Сколько ошибок по строкам возвращать в ответе
+MAX_REPORTED_ERRORS = 1000
+
+# Размер порции чтения файла при потоковом разборе JSON
+JSON_READ_SIZE = 64 * 1024
+
+# Разделители списка цехов в одном поле: "1;2;3", "1|2|3", "1 2 3"
+WORKSHOP_SEPARATORS = re.compile(r"[\s,;|]+")
+
+# Столбцы строки INSERT в products (порядок как в Database.insert_products_batch)
+PRODUCT_COLUMNS = ("article", "product_type_id", "product_name", "min_partner_price",
+                   "main_material_id", "param1", "param2")
+
+# Операции POST /products/bulk и максимальный размер пакета
+BULK_OPERATIONS = ("create", "update", "delete")
+MAX_BULK_OPERATIONS = 10000
+
+
+class ImportFormatError(Exception):
+    """Файл импорта не удалось разобрать"""
+
+
+class ImportAborted(Exception):
+    """
+    Импорт прерван посреди файла.
+
+    Порции до failed_at_row уже зафиксированы: report содержит, сколько
+    строк импортировано, и номер строки, с которой ничего не записано.
+    Исходная ошибка доступна в __cause__.
+    """
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+def iter_records(file: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+    """Выбрать разборщик по расширению файла: .csv, .json, .jsonl/.ndjson"""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_csv_records(file)
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return iter_jsonl_records(file)
+    if name.endswith(".json"):
+        return iter_json_records(file)
+    raise ImportFormatError("Поддерживаются файлы .csv, .json и .jsonl")
+
+
+def iter_csv_records(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Построчно читать CSV (разделитель ',' или ';', кодировка UTF-8)"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    header = text.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    fieldnames = next(csv.reader([header], delimiter=delimiter), None)
+    if not fieldnames:
+        return
+
+    fieldnames = [name.strip() for name in fieldnames]
+    for record in csv.DictReader(text, fieldnames=fieldnames, delimiter=delimiter):
+        yield record
+
+
+def iter_jsonl_records(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Читать JSON Lines: один объект продукта в каждой строке"""
+    for line_number, line in enumerate(io.TextIOWrapper(file, encoding="utf-8-sig"), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ImportFormatError(f"Строка {line_number}: некорректный JSON ({e.msg})")
+
+
+def iter_json_records(file: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читать JSON-массив объектов [{...}, {...}, ...].
+
+    Файл читается порциями, а каждый объект массива разбирается сразу,
+    как только он целиком оказался в буфере.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig")
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = text.read(JSON_READ_SIZE)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    while True:
+        # Пропускаем пробелы и запятые между элементами
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                if buffer[position] == "," and not started:
+                    raise ImportFormatError("Ожидался JSON-массив объектов")
+                position += 1
+            if position < len(buffer) or not fill():
+                break
+
+        if position >= len(buffer):
+            raise ImportFormatError("Неожиданный конец JSON-файла")
+
+        if not started:
+            if buffer[position] != "[":
+                raise ImportFormatError("Ожидался JSON-массив объектов")
+            started = True
+            position += 1
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        while True:
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError as e:
+                if eof or not fill():
+                    raise ImportFormatError(f"Некорректный JSON: {e.msg}")
+
+        yield record
+
+
+def parse_workshop_ids(value: Any) -> List[int]:
+    """Маршрут продукта: список ID цехов в порядке обработки"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = [part for part in WORKSHOP_SEPARATORS.split(value.strip()) if part]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("workshops: ожидается список ID цехов")
+    return [int(item) for item in value]
+
+
+def validate_product_fields(record: Any, types: Dict[int, Dict], materials: Dict[int, Dict],
+                            workshops: Dict[int, Dict],
+                            partial: bool = False) -> Tuple[Dict[str, Any], Optional[List[int]]]:
+    """
+    Проверить поля продукта.
+
+    Возвращает {столбец: значение} и маршрут по цехам, либо выбрасывает
+    ValueError со списком ошибок через '; '. При partial=True (обновление)
+    проверяются только переданные поля, а маршрут None, если его нет в записи.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Запись должна быть объектом")
+
+    errors = []
+
+    def text_field(name: str, max_length: int) -> Optional[str]:
+        if partial and name not in record:
+            return None
+        value = record.get(name)
+        if value is None or str(value).strip() == "":
+            errors.append(f"{name}: обязательное поле")
+            return None
+        value = str(value).strip()
+        if len(value) > max_length:
+            errors.append(f"{name}: длиннее {max_length} символов")
+        return value
+
+    def number_field(name: str, cast, minimum: float, strict: bool) -> Any:
+        if partial and name not in record:
+            return None
+        value = record.get(name)
+        if value is None or value == "":
+            errors.append(f"{name}: обязательное поле")
+            return None
+        try:
+            number = cast(str(value).replace(",", ".") if isinstance(value, str) else value)
+        except (TypeError, ValueError):
+            errors.append(f"{name}: ожидается число")
+            return None
+        if number < minimum or (strict and number == minimum):
+            errors.append(f"{name}: должно быть {'>' if strict else '>='} {minimum}")
+        return number
+
+    article = text_field("article", 50)
+    product_name = text_field("product_name", 200)
+    product_type_id = number_field("product_type_id", int, 0, True)
+    material_id = number_field("main_material_id", int, 0, True)
+    price = number_field("min_partner_price", float, 0, False)
+    param1 = number_field("param1", float, 0, True)
+    param2 = number_field("param2", float, 0, True)
+
+    if product_type_id is not None and product_type_id not in types:
+        errors.append(f"product_type_id: тип {product_type_id} не найден")
+    if material_id is not None and material_id not in materials:
+        errors.append(f"main_material_id: материал {material_id} не найден")
+
+    workshop_ids: Optional[List[int]] = None
+    if not partial or "workshops" in record:
+        try:
+            workshop_ids = parse_workshop_ids(record.get("workshops"))
+        except (TypeError, ValueError):
+            errors.append("workshops: ожидается список ID цехов")
+            workshop_ids = []
+        unknown = [workshop_id for workshop_id in workshop_ids if workshop_id not in workshops]
+        if unknown:
+            errors.append(f"workshops: цехи {unknown} не найдены")
+        if len(set(workshop_ids)) != len(workshop_ids):
+            errors.append("workshops: цех указан дважды")
+
+    values = {
+        "article": article,
+        "product_type_id": product_type_id,
+        "product_name": product_name,
+        "min_partner_price": round(price, 2) if price is not None else None,
+        "main_material_id": material_id,
+        "param1": param1,
+        "param2": param2,
+    }
+    fields = {name: values[name] for name in PRODUCT_COLUMNS if not partial or name in record}
+    if partial and not fields and workshop_ids is None:
+        errors.append("Нет полей для обновления")
+
+    if errors:
+        raise ValueError("; ".join(errors))
+    return fields, workshop_ids
+
+
+def validate_product(database, record: Any,
+                     partial: bool = False) -> Tuple[Dict[str, Any], Optional[List[int]]]:
+    """
+    Проверить тело POST /products (partial=False) или PUT /products/{id}
+    (partial=True) по справочникам из кэша database.reference.
+    """
+    return validate_product_fields(
+        record,
+        database.reference.product_types_by_id(),
+        database.reference.materials_by_id(),
+        database.reference.workshops_by_id(),
+        partial=partial
+    )
+
+
+def validate_record(record: Any, types: Dict[int, Dict], materials: Dict[int, Dict],
+                    workshops: Dict[int, Dict]) -> Tuple[tuple, List[int]]:
+    """
+    Проверить одну запись импорта.
+
+    Возвращает строку для INSERT в products и маршрут по цехам,
+    либо выбрасывает ValueError со списком ошибок через '; '.
+    """
+    fields, workshop_ids = validate_product_fields(record, types, materials, workshops)
+    return tuple(fields[name] for name in PRODUCT_COLUMNS), workshop_ids
+
+
+def validate_order_record(record: Any) -> Tuple[int, int]:
+    """Проверить строку книги заказов: возвращает (product_id, quantity) или ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("Запись должна быть объектом")
+
+    values = []
+    errors = []
+    for name in ("product_id", "quantity"):
+        value = record.get(name)
+        if value is None or value == "":
+            errors.append(f"{name}: обязательное поле")
+            continue
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            errors.append(f"{name}: ожидается целое число")
+            continue
+        if number <= 0:
+            errors.append(f"{name}: должно быть > 0")
+        values.append(number)
+
+    if errors:
+        raise ValueError("; ".join(errors))
+    return values[0], values[1]
+
+
+def validate_bulk_operations(database, operations: List[Dict[str, Any]]
+                             ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Проверить пакет операций POST /products/bulk.
+
+    Операция - {"op": "create", "data": {...}}, {"op": "update", "id": N,
+    "data": {...}} или {"op": "delete", "id": N}; в data те же поля, что и
+    при импорте, включая маршрут "workshops". Один продукт нельзя изменять
+    в пакете дважды. Возвращает проверенные операции для
+    Database.apply_product_operations и ошибки с номером операции (с 0).
+    Справочники берутся из кэша database.reference.
+    """
+    if len(operations) > MAX_BULK_OPERATIONS:
+        raise ValueError(f"Не больше {MAX_BULK_OPERATIONS} операций в одном пакете")
+
+    types = database.reference.product_types_by_id()
+    materials = database.reference.materials_by_id()
+    workshops = database.reference.workshops_by_id()
+    checked: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    seen_ids = set()
+
+    for index, operation in enumerate(operations):
+        try:
+            op = operation.get("op")
+            if op not in BULK_OPERATIONS:
+                raise ValueError(f"op: ожидается одно из {', '.join(BULK_OPERATIONS)}")
+
+            product_id = operation.get("id")
+            if op == "create":
+                if product_id is not None:
+                    raise ValueError("id: не указывается при создании")
+            else:
+                if product_id is None:
+                    raise ValueError("id: обязательное поле")
+                if product_id in seen_ids:
+                    raise ValueError(f"Продукт {product_id} указан в пакете дважды")
+                seen_ids.add(product_id)
+
+            fields: Dict[str, Any] = {}
+            route: Optional[List[int]] = None
+            if op != "delete":
+                fields, route = validate_product_fields(
+                    operation.get("data"), types, materials, workshops, partial=op == "update"
+                )
+        except ValueError as e:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"index": index, "error": str(e)})
+            continue
+
+        checked.append({"index": index, "op": op, "id": product_id,
+                        "fields": fields, "route": route})
+
+    return checked, errors
+
+
+def iter_order_lines(records: Iterable[Any], report: Dict[str, Any]) -> Iterator[Tuple[int, int]]:
+    """
+    Строки книги заказов (product_id, quantity) из записей файла.
+
+    Неверные строки пропускаются: в report копятся счетчик "failed" и
+    ошибки "errors" с номером строки (не больше MAX_REPORTED_ERRORS).
+    """
+    report.setdefault("failed", 0)
+    errors = report.setdefault("errors", [])
+
+    for row_number, record in enumerate(records, 1):
+        try:
+            yield validate_order_record(record)
+        except ValueError as e:
+            report["failed"] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": str(e)})
+
+
+def import_products(database, records: Iterable[Any],
+                    batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Массовый импорт продуктов с необязательными маршрутами по цехам.
+
+    Записи проверяются и вставляются порциями по batch_size: каждая
+    порция - одна транзакция с executemany. Ошибочные строки пропускаются
+    и попадают в отчет с номером строки (с 1, без заголовка).
+
+    Если файл перестал разбираться или порция не записалась, уже
+    записанные порции остаются в БД, а выбрасывается ImportAborted с
+    отчетом о них и номером строки failed_at_row.
+    """
+    types = database.reference.product_types_by_id()
+    materials = database.reference.materials_by_id()
+    workshops = database.reference.workshops_by_id()
+
+    imported = 0
+    schedule_rows = 0
+    failed = 0
+    errors: List[Dict[str, Any]] = []
+
+    rows: List[tuple] = []
+    routes: List[List[int]] = []
+    # Первая строка файла, которая еще не записана в БД
+    pending_from = 1
+    row_number = 0
+
+    def report() -> Dict[str, Any]:
+        return {
+            "imported": imported,
+            "failed": failed,
+            "schedule_rows": schedule_rows,
+            "errors": errors,
+            "errors_truncated": failed > len(errors),
+        }
+
+    def flush():
+        nonlocal imported, schedule_rows, rows, routes, pending_from
+        if rows:
+            schedule_rows += database.insert_products_batch(rows, routes)
+            imported += len(rows)
+        rows, routes = [], []
+        pending_from = row_number + 1
+
+    try:
+        for row_number, record in enumerate(records, 1):
+            try:
+                row, route = validate_record(record, types, materials, workshops)
+            except ValueError as e:
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": row_number, "error": str(e)})
+                continue
+
+            rows.append(row)
+            routes.append(route)
+            if len(rows) >= batch_size:
+                flush()
+
+        flush()
+    except Exception as e:
+        raise ImportAborted(str(e), {**report(), "failed_at_row": pending_from}) from e
+
+    return report()
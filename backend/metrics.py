@@ -0,0 +1,344 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("furniture.sql")
+
+# Запросы дольше этого порога (в миллисекундах) попадают в журнал вместе с планом
+SLOW_QUERY_MS = float(os.environ.get("FURNITURE_SLOW_QUERY_MS", "200"))
+
+# Границы корзин гистограмм задержек, в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Тип SQL-запроса для метки operation: первое ключевое слово
+SQL_OPERATION = re.compile(r"^\s*(?:--[^\n]*\n\s*)*(\w+)")
+
+# MIME-тип текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Базовая метрика с набором меток; значения хранятся по кортежу меток"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать"""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными корзинами, суммой и количеством наблюдений"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Счетчики по корзинам (последняя - +Inf), сумма и количество
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, [list(state[0]), state[1], state[2]])
+                           for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_number(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP: задержки, запросы в обработке и ошибки по маршрутам (шаблонам путей)
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "furniture_http_requests_total", "Обработанные HTTP-запросы",
+    ("method", "route", "status")
+))
+HTTP_ERRORS = REGISTRY.register(Counter(
+    "furniture_http_request_errors_total", "HTTP-запросы с ответом 5xx или исключением",
+    ("method", "route")
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "furniture_http_request_duration_seconds", "Время обработки HTTP-запроса до отправки заголовков",
+    ("method", "route")
+))
+HTTP_IN_PROGRESS = REGISTRY.register(Gauge(
+    "furniture_http_requests_in_progress", "HTTP-запросы в обработке",
+    ("method", "route")
+))
+
+# SQL: время выполнения и выборки, медленные запросы
+SQL_LATENCY = REGISTRY.register(Histogram(
+    "furniture_sql_query_duration_seconds", "Время выполнения SQL-запроса (execute/executemany)",
+    ("operation",)
+))
+SQL_FETCH_LATENCY = REGISTRY.register(Histogram(
+    "furniture_sql_fetch_duration_seconds", "Время выборки строк результата (fetch*)",
+    ("operation",)
+))
+SQL_ERRORS = REGISTRY.register(Counter(
+    "furniture_sql_errors_total", "SQL-запросы, завершившиеся ошибкой",
+    ("operation",)
+))
+SQL_SLOW = REGISTRY.register(Counter(
+    "furniture_sql_slow_queries_total", "SQL-запросы дольше порога FURNITURE_SLOW_QUERY_MS",
+    ("operation",)
+))
+
+
+def sql_operation(sql: str) -> str:
+    """Метка operation: SELECT, INSERT, UPDATE, DELETE, BEGIN, PRAGMA и т.д."""
+    match = SQL_OPERATION.match(sql)
+    return match.group(1).upper() if match else "OTHER"
+
+
+def explain_plan(conn: sqlite3.Connection, sql: str, parameters) -> Optional[str]:
+    """План запроса (EXPLAIN QUERY PLAN) для журнала медленных запросов"""
+    if sql_operation(sql) not in ("SELECT", "WITH"):
+        return None
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return "; ".join(str(row[-1]) for row in rows)
+
+
+def record_query(conn: sqlite3.Connection, sql: str, parameters, elapsed: float,
+                 failed: bool = False) -> str:
+    """Учесть выполненный запрос и записать его в журнал, если он медленный"""
+    operation = sql_operation(sql)
+    SQL_LATENCY.observe(elapsed, operation=operation)
+    if failed:
+        SQL_ERRORS.inc(operation=operation)
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SQL_SLOW.inc(operation=operation)
+        plan = explain_plan(conn, sql, parameters) if parameters is not None else None
+        logger.warning(
+            "Медленный запрос (%.1f мс): %s%s", elapsed * 1000, " ".join(sql.split()),
+            f" | план: {plan}" if plan else ""
+        )
+    return operation
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Курсор, который измеряет время выполнения запросов и выборки строк"""
+
+    _operation = "OTHER"
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(sql, parameters)
+            failed = False
+            return result
+        finally:
+            self._operation = record_query(
+                self.connection, sql, parameters, time.perf_counter() - started, failed
+            )
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+            failed = False
+            return result
+        finally:
+            # Параметры executemany - итератор, план для них не строится
+            self._operation = record_query(
+                self.connection, sql, None, time.perf_counter() - started, failed
+            )
+
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            SQL_FETCH_LATENCY.observe(time.perf_counter() - started, operation=self._operation)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed_fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Соединение, все запросы которого идут через TimedCursor.
+
+    Передается в sqlite3.connect(factory=...): так измеряются и запросы
+    execute_query, и прямые вызовы conn.execute() в методах Database.
+    """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def route_template(app, scope) -> str:
+    """Шаблон пути маршрута (/products/{product_id}), а не конкретный URL"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+
+    from starlette.routing import Match
+    for candidate in app.router.routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержки, запросы в обработке и ошибки по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope)
+        status = 500
+        responded = False
+
+        async def send_wrapper(message):
+            nonlocal status, responded
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                responded = True
+                HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            if not responded:
+                HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_IN_PROGRESS.dec(method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+            if status >= 500:
+                HTTP_ERRORS.inc(method=method, route=route)
@@ -0,0 +1,554 @@
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Схема БД как упорядоченный список миграций. Номер последней примененной
+# миграции хранится в PRAGMA user_version; при запуске применяются только
+# миграции с большим номером. Новые таблицы, индексы и триггеры добавляются
+# новой миграцией в конец MIGRATIONS, уже выпущенные миграции не меняются.
+
+# Таблицы и триггер обновления времени
+SCHEMA_SQL = [
+    # Таблица типов продукции
+    """
+    CREATE TABLE IF NOT EXISTS product_types (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type_name VARCHAR(50) NOT NULL UNIQUE,
+        production_coefficient REAL NOT NULL CHECK(production_coefficient > 0)
+    )
+    """,
+    
+    # Таблица материалов
+    """
+    CREATE TABLE IF NOT EXISTS materials (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        material_name VARCHAR(100) NOT NULL UNIQUE,
+        loss_percentage REAL NOT NULL CHECK(loss_percentage >= 0 AND loss_percentage <= 100)
+    )
+    """,
+    
+    # Таблица цехов
+    """
+    CREATE TABLE IF NOT EXISTS workshops (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workshop_name VARCHAR(100) NOT NULL UNIQUE,
+        worker_count INTEGER NOT NULL CHECK(worker_count > 0),
+        processing_time INTEGER NOT NULL CHECK(processing_time > 0)
+    )
+    """,
+    
+    # Таблица продукции
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        article VARCHAR(50) NOT NULL,
+        product_type_id INTEGER NOT NULL,
+        product_name VARCHAR(200) NOT NULL,
+        min_partner_price DECIMAL(10,2) NOT NULL CHECK(min_partner_price >= 0),
+        main_material_id INTEGER NOT NULL,
+        param1 REAL NOT NULL CHECK(param1 > 0),
+        param2 REAL NOT NULL CHECK(param2 > 0),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_type_id) REFERENCES product_types(id),
+        FOREIGN KEY (main_material_id) REFERENCES materials(id)
+    )
+    """,
+    
+    # Таблица производственного графика
+    """
+    CREATE TABLE IF NOT EXISTS production_schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        workshop_id INTEGER NOT NULL,
+        processing_order INTEGER NOT NULL CHECK(processing_order > 0),
+        FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+        FOREIGN KEY (workshop_id) REFERENCES workshops(id),
+        UNIQUE(product_id, workshop_id, processing_order)
+    )
+    """,
+    
+    # Триггер для обновления времени
+    """
+    CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
+    AFTER UPDATE ON products
+    BEGIN
+        UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+    END
+    """
+]
+
+# Индексы для фильтрации и постраничной выборки продукции. Отделены от
+# таблиц, чтобы при массовой загрузке создавать их после вставки данных.
+INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_products_created_at ON products(created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_price ON products(min_partner_price, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_name ON products(product_name, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_article ON products(article, id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_type ON products(product_type_id)",
+    "CREATE INDEX IF NOT EXISTS idx_products_material ON products(main_material_id)",
+    # Маршрут продукта читается и заменяется целиком по product_id
+    "CREATE INDEX IF NOT EXISTS idx_schedule_product ON production_schedule(product_id, processing_order)"
+]
+
+# Границы ценовых диапазонов для отчета (руб): [0, 5000), [5000, 10000), ...,
+# [50000, +inf)
+PRICE_RANGE_BOUNDS = (5000, 10000, 20000, 50000)
+
+
+def price_range_sql(column: str) -> str:
+    """SQL-выражение с номером ценового диапазона для значения column"""
+    cases = " ".join(
+        f"WHEN {column} < {bound} THEN {index}"
+        for index, bound in enumerate(PRICE_RANGE_BOUNDS)
+    )
+    return f"CASE {cases} ELSE {len(PRICE_RANGE_BOUNDS)} END"
+
+
+# Агрегаты для /reports/statistics. Поддерживаются триггерами при каждой
+# вставке, изменении и удалении продукта и строки маршрута, поэтому отчет
+# читает готовые значения, а не сканирует таблицы products и production_schedule.
+STATISTICS_SQL = [
+    # Общие показатели по ценам (одна строка с id = 1)
+    """
+    CREATE TABLE IF NOT EXISTS product_stats (
+        id INTEGER PRIMARY KEY CHECK(id = 1),
+        product_count INTEGER NOT NULL DEFAULT 0,
+        price_sum REAL NOT NULL DEFAULT 0,
+        price_min REAL,
+        price_max REAL
+    )
+    """,
+    
+    # Количество продуктов по типам
+    """
+    CREATE TABLE IF NOT EXISTS product_type_stats (
+        product_type_id INTEGER PRIMARY KEY,
+        product_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    
+    # Количество продуктов по материалам
+    """
+    CREATE TABLE IF NOT EXISTS material_stats (
+        material_id INTEGER PRIMARY KEY,
+        product_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    
+    # Новый продукт: минимум и максимум считаются по новому значению
+    """
+    CREATE TRIGGER IF NOT EXISTS products_stats_insert
+    AFTER INSERT ON products
+    BEGIN
+        UPDATE product_stats SET
+            product_count = product_count + 1,
+            price_sum = price_sum + NEW.min_partner_price,
+            price_min = MIN(COALESCE(price_min, NEW.min_partner_price), NEW.min_partner_price),
+            price_max = MAX(COALESCE(price_max, NEW.min_partner_price), NEW.min_partner_price)
+        WHERE id = 1;
+        INSERT INTO product_type_stats (product_type_id, product_count)
+        VALUES (NEW.product_type_id, 1)
+        ON CONFLICT(product_type_id) DO UPDATE SET product_count = product_count + 1;
+        INSERT INTO material_stats (material_id, product_count)
+        VALUES (NEW.main_material_id, 1)
+        ON CONFLICT(material_id) DO UPDATE SET product_count = product_count + 1;
+    END
+    """,
+    
+    # Удаление: минимум и максимум пересчитываются по индексу idx_products_price
+    """
+    CREATE TRIGGER IF NOT EXISTS products_stats_delete
+    AFTER DELETE ON products
+    BEGIN
+        UPDATE product_stats SET
+            product_count = product_count - 1,
+            price_sum = price_sum - OLD.min_partner_price,
+            price_min = (SELECT MIN(min_partner_price) FROM products),
+            price_max = (SELECT MAX(min_partner_price) FROM products)
+        WHERE id = 1;
+        UPDATE product_type_stats SET product_count = product_count - 1
+        WHERE product_type_id = OLD.product_type_id;
+        UPDATE material_stats SET product_count = product_count - 1
+        WHERE material_id = OLD.main_material_id;
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS products_stats_update_price
+    AFTER UPDATE OF min_partner_price ON products
+    WHEN OLD.min_partner_price IS NOT NEW.min_partner_price
+    BEGIN
+        UPDATE product_stats SET
+            price_sum = price_sum - OLD.min_partner_price + NEW.min_partner_price,
+            price_min = (SELECT MIN(min_partner_price) FROM products),
+            price_max = (SELECT MAX(min_partner_price) FROM products)
+        WHERE id = 1;
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS products_stats_update_type
+    AFTER UPDATE OF product_type_id ON products
+    WHEN OLD.product_type_id IS NOT NEW.product_type_id
+    BEGIN
+        UPDATE product_type_stats SET product_count = product_count - 1
+        WHERE product_type_id = OLD.product_type_id;
+        INSERT INTO product_type_stats (product_type_id, product_count)
+        VALUES (NEW.product_type_id, 1)
+        ON CONFLICT(product_type_id) DO UPDATE SET product_count = product_count + 1;
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS products_stats_update_material
+    AFTER UPDATE OF main_material_id ON products
+    WHEN OLD.main_material_id IS NOT NEW.main_material_id
+    BEGIN
+        UPDATE material_stats SET product_count = product_count - 1
+        WHERE material_id = OLD.main_material_id;
+        INSERT INTO material_stats (material_id, product_count)
+        VALUES (NEW.main_material_id, 1)
+        ON CONFLICT(material_id) DO UPDATE SET product_count = product_count + 1;
+    END
+    """,
+    
+    # Количество продуктов по ценовым диапазонам (номер из price_range_sql)
+    """
+    CREATE TABLE IF NOT EXISTS price_range_stats (
+        range_index INTEGER PRIMARY KEY,
+        product_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    
+    # Число строк маршрута по каждому цеху (из него считается время производства)
+    """
+    CREATE TABLE IF NOT EXISTS workshop_route_stats (
+        workshop_id INTEGER PRIMARY KEY,
+        route_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_price_range_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO price_range_stats (range_index, product_count)
+        VALUES ({price_range_sql("NEW.min_partner_price")}, 1)
+        ON CONFLICT(range_index) DO UPDATE SET product_count = product_count + 1;
+    END
+    """,
+    
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_price_range_delete
+    AFTER DELETE ON products
+    BEGIN
+        UPDATE price_range_stats SET product_count = product_count - 1
+        WHERE range_index = {price_range_sql("OLD.min_partner_price")};
+    END
+    """,
+    
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_price_range_update
+    AFTER UPDATE OF min_partner_price ON products
+    WHEN OLD.min_partner_price IS NOT NEW.min_partner_price
+    BEGIN
+        UPDATE price_range_stats SET product_count = product_count - 1
+        WHERE range_index = {price_range_sql("OLD.min_partner_price")};
+        INSERT INTO price_range_stats (range_index, product_count)
+        VALUES ({price_range_sql("NEW.min_partner_price")}, 1)
+        ON CONFLICT(range_index) DO UPDATE SET product_count = product_count + 1;
+    END
+    """,
+    
+    # Удаление продукта удаляет его маршрут каскадно, триггер срабатывает и тогда
+    """
+    CREATE TRIGGER IF NOT EXISTS schedule_route_stats_insert
+    AFTER INSERT ON production_schedule
+    BEGIN
+        INSERT INTO workshop_route_stats (workshop_id, route_count)
+        VALUES (NEW.workshop_id, 1)
+        ON CONFLICT(workshop_id) DO UPDATE SET route_count = route_count + 1;
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS schedule_route_stats_delete
+    AFTER DELETE ON production_schedule
+    BEGIN
+        UPDATE workshop_route_stats SET route_count = route_count - 1
+        WHERE workshop_id = OLD.workshop_id;
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS schedule_route_stats_update
+    AFTER UPDATE OF workshop_id ON production_schedule
+    WHEN OLD.workshop_id IS NOT NEW.workshop_id
+    BEGIN
+        UPDATE workshop_route_stats SET route_count = route_count - 1
+        WHERE workshop_id = OLD.workshop_id;
+        INSERT INTO workshop_route_stats (workshop_id, route_count)
+        VALUES (NEW.workshop_id, 1)
+        ON CONFLICT(workshop_id) DO UPDATE SET route_count = route_count + 1;
+    END
+    """
+]
+
+
+# Полнотекстовый поиск по артикулу и названию. Таблица products_fts хранит
+# только триграммный индекс (external content), сами строки берутся из
+# products; синхронизацию выполняют триггеры.
+SEARCH_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        article, product_name,
+        content='products', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts (rowid, article, product_name)
+        VALUES (NEW.id, NEW.article, NEW.product_name);
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete
+    AFTER DELETE ON products
+    BEGIN
+        INSERT INTO products_fts (products_fts, rowid, article, product_name)
+        VALUES ('delete', OLD.id, OLD.article, OLD.product_name);
+    END
+    """,
+    
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF article, product_name ON products
+    BEGIN
+        INSERT INTO products_fts (products_fts, rowid, article, product_name)
+        VALUES ('delete', OLD.id, OLD.article, OLD.product_name);
+        INSERT INTO products_fts (rowid, article, product_name)
+        VALUES (NEW.id, NEW.article, NEW.product_name);
+    END
+    """
+]
+
+# Таблицы, изменение которых меняет ответы API
+REVISION_TABLES = ("products", "production_schedule", "product_types", "materials", "workshops")
+
+# Номер ревизии данных для ETag: триггеры увеличивают его при любом
+# изменении этих таблиц, в том числе из других процессов
+REVISION_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS data_revision (
+        id INTEGER PRIMARY KEY CHECK(id = 1),
+        revision INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO data_revision (id, revision) VALUES (1, 0)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_revision_{event.lower()}
+    AFTER {event} ON {table}
+    BEGIN
+        UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+    END
+    """
+    for table in REVISION_TABLES
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+def rebuild_search_index(conn):
+    """Заново построить полнотекстовый индекс по таблице products"""
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def rebuild_statistics(conn):
+    """Полностью пересчитать агрегаты статистики по таблице products"""
+    conn.execute("DELETE FROM product_stats")
+    conn.execute("DELETE FROM product_type_stats")
+    conn.execute("DELETE FROM material_stats")
+    conn.execute("DELETE FROM price_range_stats")
+    conn.execute("DELETE FROM workshop_route_stats")
+    conn.execute("""
+        INSERT INTO product_stats (id, product_count, price_sum, price_min, price_max)
+        SELECT 1, COUNT(*), TOTAL(min_partner_price), 
+               MIN(min_partner_price), MAX(min_partner_price)
+        FROM products
+    """)
+    conn.execute("""
+        INSERT INTO product_type_stats (product_type_id, product_count)
+        SELECT product_type_id, COUNT(*) FROM products GROUP BY product_type_id
+    """)
+    conn.execute("""
+        INSERT INTO material_stats (material_id, product_count)
+        SELECT main_material_id, COUNT(*) FROM products GROUP BY main_material_id
+    """)
+    conn.execute(f"""
+        INSERT INTO price_range_stats (range_index, product_count)
+        SELECT {price_range_sql("min_partner_price")} AS range_index, COUNT(*)
+        FROM products GROUP BY range_index
+    """)
+    conn.execute("""
+        INSERT INTO workshop_route_stats (workshop_id, route_count)
+        SELECT workshop_id, COUNT(*) FROM production_schedule GROUP BY workshop_id
+    """)
+
+
+# Миграции: (номер, описание, SQL, заполнение после SQL или None).
+# Каждая применяется в своей транзакции вместе с записью user_version.
+MIGRATIONS: List[Tuple[int, str, Sequence[str], Optional[Callable]]] = [
+    (1, "Таблицы справочников, продукции и графика цехов", SCHEMA_SQL, None),
+    (2, "Индексы фильтров, сортировок и маршрутов", INDEXES_SQL, None),
+    (3, "Агрегаты статистики и их триггеры", STATISTICS_SQL, rebuild_statistics),
+    (4, "Полнотекстовый индекс products_fts", SEARCH_SQL, rebuild_search_index),
+    (5, "Ревизия данных для ETag", REVISION_SQL, None),
+]
+
+# Версия схемы, которую ожидает код
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    """Номер последней примененной миграции (PRAGMA user_version)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn) -> List[Tuple[int, str, Sequence[str], Optional[Callable]]]:
+    """Миграции, которые еще не применены к этой БД"""
+    version = schema_version(conn)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def migrate(conn, target: Optional[int] = None) -> List[int]:
+    """
+    Применить недостающие миграции (до target включительно, по умолчанию
+    до последней) и вернуть номера примененных.
+
+    Вызывается вне открытой транзакции. Каждая миграция выполняется под
+    BEGIN IMMEDIATE, а версия перепроверяется внутри транзакции, поэтому
+    процессы, запущенные одновременно, не применяют миграцию дважды.
+    """
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    for version, description, statements, after in MIGRATIONS:
+        if version > target:
+            break
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            if after is not None:
+                after(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+        print(f"🔧 Миграция {version}: {description}")
+        applied.append(version)
+
+    return applied
+
+
+def managed_indexes() -> List[str]:
+    """Имена индексов, которые создают миграции"""
+    names = []
+    for _, _, statements, _ in MIGRATIONS:
+        for sql in statements:
+            words = sql.split()
+            if words[:2] == ["CREATE", "INDEX"]:
+                names.append(words[5] if words[2:5] == ["IF", "NOT", "EXISTS"] else words[2])
+    return names
+
+
+def missing_indexes(conn) -> List[str]:
+    """Индексы из миграций, которых нет в БД"""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'"
+    )}
+    return [name for name in managed_indexes() if name not in existing]
+
+
+def schema_script() -> str:
+    """
+    SQL-скрипт всей схемы (для database/init.sql): миграции по порядку
+    и установка user_version
+    """
+    parts = ["-- Схема БД мебельной компании. Файл сгенерирован из backend/migrations.py:",
+             "--     python backend/migrations.py --sql > database/init.sql",
+             "-- Не редактируйте вручную - добавьте новую миграцию.", ""]
+    for version, description, statements, after in MIGRATIONS:
+        parts.append(f"-- Миграция {version}: {description}")
+        for sql in statements:
+            lines = [line[4:] if line.startswith("    ") else line
+                     for line in sql.strip("\n").splitlines()]
+            parts.append("\n".join(lines).strip() + ";")
+        parts.append("")
+    parts.append(f"PRAGMA user_version = {LATEST_VERSION};")
+    return "\n".join(parts) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Командная строка: применить миграции, показать состояние, проверить планы"""
+    from connection_pool import DEFAULT_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Миграции схемы БД мебельной компании")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="Путь к базе данных")
+    parser.add_argument("--status", action="store_true",
+                        help="Показать версию схемы и недостающие индексы, ничего не меняя")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="Проверить планы горячих запросов (код 1 при полном сканировании)")
+    parser.add_argument("--sql", action="store_true",
+                        help="Вывести SQL-скрипт схемы (для database/init.sql)")
+    args = parser.parse_args(argv)
+
+    if args.sql:
+        sys.stdout.write(schema_script())
+        return 0
+
+    if args.check_plans:
+        from query_plans import check_query_plans, print_report
+        problems = check_query_plans(args.db)
+        print_report(problems)
+        return 1 if problems else 0
+
+    if not Path(args.db).exists() and args.status:
+        print(f"❌ База данных не найдена: {args.db}")
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.status:
+            version = schema_version(conn)
+            print(f"Версия схемы: {version} из {LATEST_VERSION}")
+            for number, description, _, _ in pending_migrations(conn):
+                print(f"   ожидает: {number} - {description}")
+            missing = missing_indexes(conn)
+            print(f"Недостающие индексы: {', '.join(missing) if missing else 'нет'}")
+            return 0 if version >= LATEST_VERSION and not missing else 1
+
+        applied = migrate(conn)
+        print(f"✅ Схема актуальна (версия {schema_version(conn)}), "
+              f"применено миграций: {len(applied)}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -87,6 +87,35 @@ class ProductWithWorkshops(Product):
     workshops: List[Workshop] = []
     total_production_time: Optional[int] = None
 
+class ProductWorkshopsUpdate(BaseModel):
+    """Новый маршрут продукта: ID цехов в порядке обработки"""
+    workshop_ids: List[int]
+
+class ProductRoute(ProductWorkshopsUpdate):
+    product_id: int
+
+class ProductRoutesUpdate(BaseModel):
+    routes: List[ProductRoute] = Field(..., min_items=1)
+
+class ProductBulkOperation(BaseModel):
+    """Операция пакета: create (data), update (id и изменяемые поля в data) или delete (id)"""
+    op: str
+    id: Optional[int] = None
+    data: Optional[dict] = None
+
+class ProductBulkRequest(BaseModel):
+    operations: List[ProductBulkOperation] = Field(..., min_items=1)
+
+class ScheduleOrder(BaseModel):
+    product_id: int
+    quantity: int = Field(..., gt=0)
+    due: Optional[float] = Field(None, ge=0, description="Срок, часов от начала планирования")
+
+class ScheduleRequest(BaseModel):
+    orders: List[ScheduleOrder] = Field(..., min_items=1)
+    rule: str = "johnson"
+    include_steps: bool = True
+
 class MaterialCalculationRequest(BaseModel):
     product_type_id: int
     material_type_id: int
@@ -96,4 +125,20 @@ class MaterialCalculationRequest(BaseModel):
 
 class MaterialCalculationResponse(BaseModel):
     raw_material_needed: int
-    calculation_details: dict
\ No newline at end of file
+    calculation_details: dict
+
+class MaterialCalculationItem(BaseModel):
+    """Строка пакетного расчета: неверные значения дают -1, а не ошибку запроса"""
+    product_type_id: int
+    material_type_id: int
+    quantity: float
+    param1: float
+    param2: float
+
+class MaterialCalculationBatchRequest(BaseModel):
+    items: List[MaterialCalculationItem]
+
+class MaterialCalculationBatchResponse(BaseModel):
+    results: List[int]
+    count: int
+    failed: int
\ No newline at end of file
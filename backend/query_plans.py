@@ -0,0 +1,125 @@
+import sqlite3
+from typing import List, Tuple
+
+from database import (
+    PRODUCT_SORT_KEYS, ROUTES_SQL, build_products_page_query, build_search_query,
+    encode_cursor
+)
+from migrations import LATEST_VERSION, missing_indexes, schema_version
+
+# Справочники маленькие - их полный просмотр регрессией не считается
+REFERENCE_TABLES = ("product_types", "materials", "workshops", "pt", "m", "w")
+
+# Допущения для отдельных запросов:
+# TEMP_SORT - сортировка уже отобранной по индексу части во временном B-дереве;
+# ROWID_SCAN - просмотр таблицы в порядке id, который останавливает LIMIT
+TEMP_SORT = "temp_sort"
+ROWID_SCAN = "rowid_scan"
+
+# Значение ключа сортировки для курсора второй страницы
+CURSOR_SAMPLES = {
+    "created_at": "2025-01-01 00:00:00",
+    "price": 1000.0,
+    "name": "Стул",
+    "article": "CHAIR",
+    "id": None,
+}
+
+
+def hot_queries() -> List[Tuple[str, str, tuple, Tuple[str, ...]]]:
+    """
+    Горячие запросы API: (название, SQL, параметры, допущения).
+
+    SQL берется из тех же функций, что строят запросы в Database, поэтому
+    проверяются именно те планы, которые выполняет сервер.
+    """
+    queries = []
+
+    # Страницы каталога: сортировка должна идти по индексу, без TEMP B-TREE
+    for sort in PRODUCT_SORT_KEYS:
+        for order in ("asc", "desc"):
+            sql, params = build_products_page_query(sort=sort, order=order)
+            allowed = (ROWID_SCAN,) if sort == "id" else ()
+            queries.append((f"GET /products sort={sort} order={order}",
+                            sql, params + (50,), allowed))
+
+            cursor = encode_cursor(sort, order, CURSOR_SAMPLES[sort], 1000)
+            sql, params = build_products_page_query(sort=sort, order=order, cursor=cursor)
+            queries.append((f"GET /products sort={sort} order={order} (курсор)",
+                            sql, params + (50,), ()))
+
+    # Фильтры: отбор по индексу, сортировка выбранной части допустима
+    filters = [
+        ("type_id", {"product_type_id": 1}),
+        ("material_id", {"material_id": 1}),
+        ("price_min/price_max", {"price_min": 1000.0, "price_max": 2000.0, "sort": "price"}),
+        ("search", {"search": "стул"}),
+    ]
+    for name, arguments in filters:
+        sql, params = build_products_page_query(**arguments)
+        queries.append((f"GET /products {name}", sql, params + (50,), (TEMP_SORT,)))
+
+    sql, params = build_search_query("стул", 20)
+    queries.append(("GET /products/search (триграммы)", sql, params, (TEMP_SORT,)))
+    sql, params = build_search_query("ст", 20)
+    queries.append(("GET /products/search (короткий запрос)", sql, params, (TEMP_SORT,)))
+
+    queries.append(("GET /products/{id}", "SELECT * FROM products WHERE id = ?", (1,), ()))
+    queries.append(("Маршруты продуктов (include_workshops)",
+                    ROUTES_SQL.format(placeholders="?,?,?"), (1, 2, 3), ()))
+    queries.append(("DELETE маршрута продукта",
+                    "DELETE FROM production_schedule WHERE product_id = ?", (1,), ()))
+    # Триггер удаления продукта пересчитывает минимум и максимум цены
+    queries.append(("Минимальная цена (триггер статистики)",
+                    "SELECT MIN(min_partner_price) FROM products", (), ()))
+    return queries
+
+
+def plan_problems(details: List[str], allowed: Tuple[str, ...] = ()) -> List[str]:
+    """Шаги плана, которые означают регрессию"""
+    sorted_by_index = not any("TEMP B-TREE" in detail for detail in details)
+    problems = []
+    for detail in details:
+        words = detail.split()
+        if words[:1] == ["SCAN"] and len(words) > 1:
+            table = words[1]
+            if ("USING" in words or "VIRTUAL" in words or table in REFERENCE_TABLES
+                    or detail.startswith("SCAN CONSTANT ROW")
+                    or (ROWID_SCAN in allowed and sorted_by_index)):
+                continue
+            problems.append(f"полный просмотр таблицы: {detail}")
+        elif "TEMP B-TREE" in detail and TEMP_SORT not in allowed:
+            problems.append(f"сортировка без индекса: {detail}")
+    return problems
+
+
+def check_query_plans(db_path: str) -> List[Tuple[str, str]]:
+    """
+    Выполнить EXPLAIN QUERY PLAN для каждого горячего запроса.
+
+    Возвращает список (запрос, проблема); пустой список - все планы
+    используют индексы.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        version = schema_version(conn)
+        if version < LATEST_VERSION:
+            return [("Схема", f"версия {version}, ожидается {LATEST_VERSION} - примените миграции")]
+
+        problems = [("Схема", f"нет индекса {name}") for name in missing_indexes(conn)]
+        for name, sql, params, allowed in hot_queries():
+            details = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            problems.extend((name, problem) for problem in plan_problems(details, allowed))
+        return problems
+    finally:
+        conn.close()
+
+
+def print_report(problems: List[Tuple[str, str]]):
+    """Вывести результат проверки планов"""
+    if not problems:
+        print(f"✅ Планы {len(hot_queries())} горячих запросов используют индексы")
+        return
+    print(f"❌ Найдено проблем в планах запросов: {len(problems)}")
+    for name, problem in problems:
+        print(f"   {name}: {problem}")
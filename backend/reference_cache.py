@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Как часто (в секундах) проверять, не изменил ли БД другой процесс
+DEFAULT_CHECK_INTERVAL = float(os.environ.get("FURNITURE_CACHE_CHECK_INTERVAL", "1.0"))
+
+
+class ChangeWatcher:
+    """
+    Отслеживает изменения базы данных через PRAGMA data_version.
+
+    Значение data_version меняется, когда любое другое соединение (в том
+    числе из другого процесса) фиксирует транзакцию. Поэтому у наблюдателя
+    свое отдельное соединение, через которое ничего не записывается.
+    Проверка выполняется не чаще check_interval секунд, а записи из этого
+    процесса сообщают о себе через mark_dirty() и видны сразу. При
+    check_interval = 0 (несколько рабочих процессов) data_version
+    читается при каждом обращении - это дешевый запрос без чтения страниц.
+    """
+
+    def __init__(self, db_path: Path, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.db_path = db_path
+        self.check_interval = check_interval
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._generation = 0
+        self._checked_at = 0.0
+        self._dirty = True
+
+    def mark_dirty(self):
+        """Сообщить, что этот процесс только что изменил данные"""
+        self._dirty = True
+
+    def generation(self) -> int:
+        """Номер поколения данных: увеличивается после каждого изменения БД"""
+        now = time.monotonic()
+        if not self._dirty and now - self._checked_at < self.check_interval:
+            return self._generation
+
+        with self._lock:
+            self._dirty = False
+            self._checked_at = now
+
+            if self._conn is None:
+                self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._generation += 1
+
+            return self._generation
+
+    def close(self):
+        """Закрыть соединение наблюдателя"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._dirty = True
+
+
+class ReferenceCache:
+    """
+    Кэш справочников в памяти: типы продукции, материалы и цехи.
+
+    Справочники меняются редко, поэтому они целиком хранятся в памяти и
+    перечитываются только после изменения БД (по поколению ChangeWatcher).
+    Возвращаемые списки и словари общие для всех вызовов - их нельзя менять.
+
+    Справочники читаются без блокировки (соединением вызывающего потока
+    из пула), блокировка берется только для замены снимка. Иначе поток,
+    ждущий свободное соединение под блокировкой, и потоки, которые держат
+    соединения и ждут блокировку, останавливали бы друг друга.
+    """
+
+    QUERIES = {
+        "product_types": "SELECT * FROM product_types ORDER BY type_name",
+        "materials": "SELECT * FROM materials ORDER BY material_name",
+        "workshops": "SELECT * FROM workshops ORDER BY workshop_name",
+    }
+
+    def __init__(self, database, watcher: ChangeWatcher):
+        self.database = database
+        self.watcher = watcher
+
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._data: Dict[str, Any] = {}
+        # Увеличивается в invalidate(): снимок, начатый до сброса, не ставится
+        self._epoch = 0
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Актуальный снимок справочников (перечитывается при изменении БД)"""
+        generation = self.watcher.generation()
+        if generation == self._generation:
+            return self._data
+        epoch = self._epoch
+
+        # Чтение вне блокировки; одновременно его могут выполнить несколько
+        # потоков - каждый получит согласованный снимок
+        data: Dict[str, Any] = {}
+        with self.database.get_connection() as conn:
+            for name, query in self.QUERIES.items():
+                rows = [dict(row) for row in conn.execute(query)]
+                data[name] = rows
+                data[name + "_by_id"] = {row["id"]: row for row in rows}
+
+        with self._lock:
+            # Более новый снимок, поставленный другим потоком, не заменяем
+            if epoch == self._epoch and (self._generation is None
+                                         or generation >= self._generation):
+                self._data = data
+                self._generation = generation
+        return data
+
+    @property
+    def version(self) -> int:
+        """Поколение данных, из которого построен текущий снимок"""
+        self._snapshot()
+        return self._generation
+
+    def invalidate(self):
+        """Принудительно перечитать справочники при следующем обращении"""
+        with self._lock:
+            self._generation = None
+            self._epoch += 1
+
+    def product_types(self) -> List[Dict]:
+        """Все типы продукции"""
+        return self._snapshot()["product_types"]
+
+    def materials(self) -> List[Dict]:
+        """Все материалы"""
+        return self._snapshot()["materials"]
+
+    def workshops(self) -> List[Dict]:
+        """Все цехи"""
+        return self._snapshot()["workshops"]
+
+    def product_types_by_id(self) -> Dict[int, Dict]:
+        """Типы продукции по ID"""
+        return self._snapshot()["product_types_by_id"]
+
+    def materials_by_id(self) -> Dict[int, Dict]:
+        """Материалы по ID"""
+        return self._snapshot()["materials_by_id"]
+
+    def workshops_by_id(self) -> Dict[int, Dict]:
+        """Цехи по ID"""
+        return self._snapshot()["workshops_by_id"]
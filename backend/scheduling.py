@@ -0,0 +1,204 @@
+import heapq
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Правила выбора очередности заказов; "best" перебирает их все и берет
+# график с наименьшим makespan
+SCHEDULING_RULES = ("johnson", "spt", "lpt", "edd", "fifo")
+BEST_RULE = "best"
+
+# Сколько самых загруженных цехов показывать как узкие места
+BOTTLENECK_COUNT = 3
+
+
+def _round(value: float) -> float:
+    return round(value, 4)
+
+
+def johnson_key(durations: List[float]) -> Tuple[int, float]:
+    """
+    Ключ сортировки по правилу Джонсона для многостадийного маршрута.
+
+    Маршрут делится пополам (время средней стадии нечетного маршрута
+    делится между половинами) и сводится к двум "машинам": a - первая
+    половина, b - вторая. Сначала идут заказы с a <= b по возрастанию a,
+    затем остальные по убыванию b.
+    """
+    half, odd = divmod(len(durations), 2)
+    a = sum(durations[:half])
+    b = sum(durations[half + odd:])
+    if odd:
+        a += durations[half] / 2
+        b += durations[half] / 2
+    return (0, a) if a <= b else (1, -b)
+
+
+def order_sequence(jobs: List[Dict[str, Any]], rule: str) -> List[Dict[str, Any]]:
+    """Очередность запуска заказов по выбранному правилу"""
+    if rule == "johnson":
+        return sorted(jobs, key=lambda job: (johnson_key(job["durations"]), job["index"]))
+    if rule == "spt":
+        return sorted(jobs, key=lambda job: (job["work"], job["index"]))
+    if rule == "lpt":
+        return sorted(jobs, key=lambda job: (-job["work"], job["index"]))
+    if rule == "edd":
+        return sorted(jobs, key=lambda job: (
+            job["due"] is None, job["due"] if job["due"] is not None else 0, job["index"]
+        ))
+    if rule == "fifo":
+        return list(jobs)
+    raise ValueError(f"Неизвестное правило планирования: {rule}")
+
+
+def schedule_orders(orders: Iterable[Dict[str, Any]], routes: Dict[int, List[Dict]],
+                    workshops: Dict[int, Dict], rule: str = "johnson",
+                    include_steps: bool = True) -> Dict[str, Any]:
+    """
+    Построить график выполнения заказов по цехам (гибкий поточный цех).
+
+    Заказ (product_id, quantity) проходит цехи в порядке маршрута продукта;
+    в цехе он занимает одного из worker_count рабочих на
+    quantity * processing_time часов, следующая стадия начинается не раньше
+    окончания предыдущей. Заказы запускаются в очередности правила rule и
+    по очереди ставятся на самого рано освобождающегося рабочего каждого
+    цеха (списочное планирование, у каждого цеха своя куча рабочих).
+
+    Время - в часах от начала планирования. Возвращает makespan, загрузку
+    цехов, узкие места и сроки по заказам; заказы без маршрута попадают в
+    "unscheduled".
+    """
+    if rule == BEST_RULE:
+        orders = list(orders)
+        makespans = {
+            candidate: schedule_orders(orders, routes, workshops, candidate,
+                                       include_steps=False)["summary"]["makespan"]
+            for candidate in SCHEDULING_RULES
+        }
+        best = min(SCHEDULING_RULES, key=lambda candidate: makespans[candidate])
+        result = schedule_orders(orders, routes, workshops, best, include_steps)
+        result["summary"]["compared"] = makespans
+        return result
+
+    if rule not in SCHEDULING_RULES:
+        raise ValueError(f"Неизвестное правило планирования: {rule}")
+
+    jobs: List[Dict[str, Any]] = []
+    unscheduled: List[Dict[str, Any]] = []
+    for index, order in enumerate(orders):
+        route = routes.get(order["product_id"])
+        if route is None:
+            unscheduled.append({"index": index, "product_id": order["product_id"],
+                                "reason": "Продукт не найден"})
+            continue
+        if not route:
+            unscheduled.append({"index": index, "product_id": order["product_id"],
+                                "reason": "У продукта нет маршрута по цехам"})
+            continue
+
+        quantity = order["quantity"]
+        steps = [step["id"] for step in route]
+        durations = [quantity * workshops[workshop_id]["processing_time"] for workshop_id in steps]
+        jobs.append({
+            "index": index,
+            "product_id": order["product_id"],
+            "quantity": quantity,
+            "due": order.get("due"),
+            "steps": steps,
+            "durations": durations,
+            "work": sum(durations),
+        })
+
+    # Для каждого цеха - куча (время освобождения, номер рабочего)
+    free_at: Dict[int, List[Tuple[float, int]]] = {}
+    busy: Dict[int, float] = {}
+    first_start: Dict[int, float] = {}
+    last_end: Dict[int, float] = {}
+    waiting: Dict[int, float] = {}
+    jobs_count: Dict[int, int] = {}
+
+    results = []
+    makespan = 0.0
+    total_tardiness = 0.0
+    late_orders = 0
+
+    for job in order_sequence(jobs, rule):
+        ready = 0.0
+        job_start = None
+        steps = []
+        for workshop_id, duration in zip(job["steps"], job["durations"]):
+            heap = free_at.get(workshop_id)
+            if heap is None:
+                workers = max(1, int(workshops[workshop_id]["worker_count"]))
+                heap = free_at[workshop_id] = [(0.0, worker) for worker in range(workers)]
+
+            worker_free, worker = heapq.heappop(heap)
+            start = max(ready, worker_free)
+            end = start + duration
+            heapq.heappush(heap, (end, worker))
+            if job_start is None:
+                job_start = start
+
+            busy[workshop_id] = busy.get(workshop_id, 0.0) + duration
+            first_start[workshop_id] = min(first_start.get(workshop_id, start), start)
+            last_end[workshop_id] = max(last_end.get(workshop_id, end), end)
+            waiting[workshop_id] = waiting.get(workshop_id, 0.0) + (start - ready)
+            jobs_count[workshop_id] = jobs_count.get(workshop_id, 0) + 1
+
+            if include_steps:
+                steps.append({"workshop_id": workshop_id, "worker": worker + 1,
+                              "start": _round(start), "end": _round(end)})
+            ready = end
+
+        makespan = max(makespan, ready)
+        result = {
+            "index": job["index"],
+            "product_id": job["product_id"],
+            "quantity": job["quantity"],
+            "start": _round(job_start),
+            "end": _round(ready),
+        }
+        if include_steps:
+            result["steps"] = steps
+        if job["due"] is not None:
+            tardiness = max(0.0, ready - job["due"])
+            result["tardiness"] = _round(tardiness)
+            total_tardiness += tardiness
+            late_orders += tardiness > 0
+        results.append(result)
+
+    results.sort(key=lambda item: item["index"])
+
+    workshop_stats = []
+    for workshop_id in sorted(busy):
+        workers = len(free_at[workshop_id])
+        workshop_stats.append({
+            "workshop_id": workshop_id,
+            "workshop_name": workshops[workshop_id].get("workshop_name"),
+            "worker_count": workers,
+            "orders": jobs_count[workshop_id],
+            "busy_hours": _round(busy[workshop_id]),
+            "start": _round(first_start[workshop_id]),
+            "end": _round(last_end[workshop_id]),
+            "waiting_hours": _round(waiting[workshop_id]),
+            "utilization": _round(busy[workshop_id] / (workers * makespan)) if makespan else 0.0,
+        })
+
+    bottlenecks = sorted(workshop_stats, key=lambda item: item["utilization"], reverse=True)
+
+    summary: Dict[str, Any] = {
+        "rule": rule,
+        "makespan": _round(makespan),
+        "scheduled": len(results),
+        "unscheduled_count": len(unscheduled),
+    }
+    if late_orders or any(job["due"] is not None for job in jobs):
+        summary["late_orders"] = late_orders
+        summary["total_tardiness"] = _round(total_tardiness)
+
+    return {
+        "summary": summary,
+        "workshops": workshop_stats,
+        "bottlenecks": [item["workshop_id"] for item in bottlenecks[:BOTTLENECK_COUNT]],
+        "orders": results,
+        "unscheduled": unscheduled,
+    }
+
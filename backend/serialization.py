@@ -0,0 +1,65 @@
+import json
+from typing import Any, Iterable, Iterator, List, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен - работает стандартный json
+    orjson = None
+
+# Форматы списков в ответах API: строки-объекты или колонки + массивы значений
+RESPONSE_FORMATS = ("json", "columnar")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Сериализовать ответ в JSON (UTF-8, без пробелов).
+
+    Если установлен orjson, кортежи строк курсора, списки и словари
+    кодируются им напрямую; иначе - стандартным json.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON-ответ без jsonable_encoder: содержимое сразу уходит в dumps()"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def columnar(columns: Sequence[str], rows: Iterable[Sequence]) -> dict:
+    """
+    Колоночное представление списка: имена столбцов один раз и
+    массив значений на каждую строку (в порядке columns).
+    """
+    return {"columns": list(columns), "rows": rows if isinstance(rows, list) else list(rows)}
+
+
+def records_to_columnar(records: List[dict]) -> dict:
+    """Колоночное представление списка словарей с одинаковыми ключами"""
+    columns = list(records[0]) if records else []
+    return columnar(columns, [[record[name] for name in columns] for record in records])
+
+
+def stream_columnar(columns: Sequence[str], chunks: Iterable[Sequence[Sequence]]) -> Iterator[bytes]:
+    """
+    Потоково сформировать {"columns": [...], "rows": [[...], ...]} из порций строк.
+
+    Каждая порция кодируется одним вызовом dumps() и сразу отдается
+    клиенту, так что в памяти находится только одна порция.
+    """
+    yield b'{"columns":' + dumps(list(columns)) + b',"rows":['
+    first = True
+    for rows in chunks:
+        if not rows:
+            continue
+        encoded = dumps([tuple(row) for row in rows])[1:-1]
+        yield encoded if first else b"," + encoded
+        first = False
+    yield b"]}"
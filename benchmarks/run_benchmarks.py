@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Нагрузочное тестирование API мебельной компании.
+
+Для каждого размера каталога собирается отдельная база (generate_products.py
+--build), затем все маршруты прогоняются дважды:
+  * inprocess - последовательные запросы через TestClient без сети;
+  * http      - конкурентная нагрузка по HTTP на локальный uvicorn.
+
+По каждому маршруту считаются пропускная способность и задержки p50/p95/p99.
+Любой ответ не из 2xx прерывает прогон с ошибкой: задержки неработающего
+сценария (например, 4xx на каждый запрос) не должны попадать в отчет.
+Результаты сохраняются в JSON (benchmarks/results/), а с --compare
+выводится сравнение с предыдущим прогоном.
+
+Дополнительно нужен пакет httpx (pip install httpx).
+
+Примеры:
+    python benchmarks/run_benchmarks.py --sizes 1000,100000
+    python benchmarks/run_benchmarks.py --sizes 1000000 --concurrency 32 --no-inprocess
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+sys.path.insert(0, str(ROOT_DIR))
+
+# Размеры каталога и параметры нагрузки по умолчанию
+DEFAULT_SIZES = "1000,10000,100000"
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 16
+DEFAULT_SEED = 42
+
+# Сколько секунд ждать запуска uvicorn
+SERVER_START_TIMEOUT = 60
+
+# Доля от --requests для тяжелых маршрутов (полная выгрузка) и для
+# одиночного удаления (вторая половина созданных продуктов удаляется пачками)
+HEAVY_SHARE = 0.05
+DELETE_SHARE = 0.5
+
+# Сколько продуктов удаляется одним запросом DELETE /products/batch
+BATCH_DELETE_SIZE = 10
+
+# Размеры пакетных запросов: продуктов, созданных и измененных одним
+# POST /products/bulk, заказов в /schedule, записей в файле /import и
+# строк в /calculate-materials/batch
+BULK_SIZE = 10
+SCHEDULE_ORDERS = 20
+IMPORT_SIZE = 50
+CALCULATE_BATCH_SIZE = 100
+
+# Количество типов продукции и материалов в справочниках
+PRODUCT_TYPE_COUNT = 4
+MATERIAL_COUNT = 5
+
+# Запрос: (метод, путь, тело JSON или Upload)
+Request = Tuple[str, str, Any]
+
+
+class Upload:
+    """Тело запроса multipart/form-data: файл в поле file"""
+
+    def __init__(self, filename: str, content: bytes):
+        self.filename = filename
+        self.content = content
+
+
+def request_kwargs(body: Any) -> Dict[str, Any]:
+    """Аргументы client.request для тела запроса (одинаковы для TestClient и httpx)"""
+    if isinstance(body, Upload):
+        return {"files": {"file": (body.filename, body.content)}}
+    return {"json": body}
+
+
+class BenchmarkError(Exception):
+    """Сценарий получил ответ не из 2xx - результаты прогона недействительны"""
+
+
+def check_response(name: str, method: str, path: str, response) -> None:
+    """Убедиться, что сценарий получил успешный ответ"""
+    if not 200 <= response.status_code < 300:
+        raise BenchmarkError(
+            f"{name}: {method} {path} вернул {response.status_code}: {response.text[:300]}"
+        )
+
+
+class BenchmarkContext:
+    """Общие данные сценариев: диапазон ID каталога и созданные продукты"""
+
+    def __init__(self, db_path: Path, seed: int):
+        conn = sqlite3.connect(str(db_path))
+        try:
+            self.min_id, self.max_id = conn.execute(
+                "SELECT MIN(id), MAX(id) FROM products"
+            ).fetchone()
+        finally:
+            conn.close()
+        self.rng = random.Random(seed)
+        self.created: List[int] = []
+        self.counter = 0
+
+    def random_id(self) -> int:
+        return self.rng.randint(self.min_id, self.max_id)
+
+    def next_number(self) -> int:
+        self.counter += 1
+        return self.counter
+
+    def take_created(self, count: int = 1) -> List[int]:
+        taken, self.created = self.created[:count], self.created[count:]
+        return taken
+
+
+def new_product(ctx: BenchmarkContext) -> Dict[str, Any]:
+    number = ctx.next_number()
+    return {
+        "article": f"BENCH-{os.getpid()}-{number:07d}",
+        "product_type_id": 1,
+        "product_name": f"Тестовый стул {number}",
+        "min_partner_price": round(ctx.rng.uniform(1000, 9000), 2),
+        "main_material_id": 1,
+        "param1": 0.5,
+        "param2": 0.5,
+    }
+
+
+def delete_created(ctx: BenchmarkContext) -> Optional[Request]:
+    ids = ctx.take_created()
+    return ("DELETE", f"/products/{ids[0]}", None) if ids else None
+
+
+def delete_created_batch(ctx: BenchmarkContext) -> Optional[Request]:
+    ids = ctx.take_created(BATCH_DELETE_SIZE)
+    return ("DELETE", "/products/batch", ids) if ids else None
+
+
+def bulk_operations(ctx: BenchmarkContext) -> Request:
+    """Пакет: BULK_SIZE новых продуктов и изменение цены стольких же созданных"""
+    operations = [{"op": "create", "data": new_product(ctx)} for _ in range(BULK_SIZE)]
+    for product_id in ctx.rng.sample(ctx.created, min(BULK_SIZE, len(ctx.created))):
+        operations.append({"op": "update", "id": product_id,
+                           "data": {"min_partner_price": round(ctx.rng.uniform(1000, 9000), 2)}})
+    return ("POST", "/products/bulk", {"operations": operations})
+
+
+def schedule_request(ctx: BenchmarkContext) -> Request:
+    orders = [{"product_id": ctx.random_id(), "quantity": ctx.rng.randint(1, 50)}
+              for _ in range(SCHEDULE_ORDERS)]
+    return ("POST", "/schedule", {"orders": orders, "rule": "johnson", "include_steps": False})
+
+
+def import_file(ctx: BenchmarkContext) -> Request:
+    records = [new_product(ctx) for _ in range(IMPORT_SIZE)]
+    content = json.dumps(records, ensure_ascii=False).encode("utf-8")
+    return ("POST", "/import", Upload("products.json", content))
+
+
+def calculate_batch(ctx: BenchmarkContext) -> Request:
+    items = [{
+        "product_type_id": ctx.rng.randint(1, PRODUCT_TYPE_COUNT),
+        "material_type_id": ctx.rng.randint(1, MATERIAL_COUNT),
+        "quantity": ctx.rng.randint(1, 100),
+        "param1": round(ctx.rng.uniform(0.5, 3), 2),
+        "param2": round(ctx.rng.uniform(0.5, 3), 2),
+    } for _ in range(CALCULATE_BATCH_SIZE)]
+    return ("POST", "/calculate-materials/batch", {"items": items})
+
+
+# Сценарии по порядку выполнения: (имя, построитель запроса, доля от --requests).
+# Построитель возвращает None, если запрос выполнить не из чего (например,
+# удалять уже нечего).
+SCENARIOS: List[Tuple[str, Callable[[BenchmarkContext], Optional[Request]], float]] = [
+    ("GET /products",
+     lambda ctx: ("GET", "/products?limit=50", None), 1.0),
+    ("GET /products?search",
+     lambda ctx: ("GET", "/products?limit=50&search=%D0%A1%D1%82%D0%BE%D0%BB", None), 1.0),
+    ("GET /products?filters",
+     lambda ctx: ("GET", "/products?limit=50&type_id=2&price_min=10000&sort=price&order=desc", None), 1.0),
+    ("GET /products/{id}",
+     lambda ctx: ("GET", f"/products/{ctx.random_id()}", None), 1.0),
+    ("GET /products/search",
+     lambda ctx: ("GET", "/products/search?q=%D0%A1%D1%82%D0%BE%D0%BB&limit=20", None), 1.0),
+    ("GET /reports/statistics",
+     lambda ctx: ("GET", "/reports/statistics", None), 1.0),
+    ("GET /export/workshops",
+     lambda ctx: ("GET", "/export/workshops", None), 1.0),
+    ("GET /export/products",
+     lambda ctx: ("GET", "/export/products", None), HEAVY_SHARE),
+    ("POST /products",
+     lambda ctx: ("POST", "/products", new_product(ctx)), 1.0),
+    ("PUT /products/{id}",
+     lambda ctx: ("PUT", f"/products/{ctx.rng.choice(ctx.created)}",
+                  {"min_partner_price": round(ctx.rng.uniform(1000, 9000), 2)})
+     if ctx.created else None, 1.0),
+    ("POST /products/bulk", bulk_operations, 1.0),
+    ("POST /import", import_file, HEAVY_SHARE),
+    ("POST /schedule", schedule_request, 1.0),
+    ("POST /calculate-materials/batch", calculate_batch, 1.0),
+    ("DELETE /products/{id}", delete_created, DELETE_SHARE),
+    ("DELETE /products/batch", delete_created_batch, 1.0),
+]
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(share * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], wall_time: float) -> Dict[str, Any]:
+    """Сводка по сценарию; задержки в миллисекундах"""
+    values = sorted(latency * 1000 for latency in latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "wall_time_s": round(wall_time, 4),
+        "throughput_rps": round(count / wall_time, 2) if wall_time > 0 else 0.0,
+        "mean_ms": round(sum(values) / count, 3) if count else 0.0,
+        "min_ms": round(values[0], 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3) if count else 0.0,
+    }
+
+
+def scenario_requests(share: float, requests: int) -> int:
+    return max(1, int(requests * share))
+
+
+def record_created(ctx: BenchmarkContext, method: str, path: str, response) -> None:
+    """Запомнить ID продуктов, созданных запросами POST /products и /products/bulk"""
+    if method != "POST" or response.status_code != 200:
+        return
+    if path == "/products":
+        ctx.created.append(response.json()["id"])
+    elif path == "/products/bulk":
+        ctx.created.extend(result["id"] for result in response.json()["results"]
+                           if result["status"] == "created")
+
+
+# ---------------------------------------------------------------------------
+# Прогон в процессе (TestClient)
+# ---------------------------------------------------------------------------
+
+def run_inprocess(db_path: Path, requests: int, seed: int) -> Dict[str, Any]:
+    """
+    Последовательный прогон всех сценариев через TestClient.
+
+    Выполняется в отдельном процессе: модуль app создает глобальную базу
+    при импорте, поэтому путь к ней задается через FURNITURE_DB_PATH.
+    """
+    sys.path.insert(0, str(BACKEND_DIR))
+    from fastapi.testclient import TestClient
+    import app as app_module
+
+    ctx = BenchmarkContext(db_path, seed)
+    results = {}
+    with TestClient(app_module.app) as client:
+        for name, build, share in SCENARIOS:
+            latencies: List[float] = []
+            started = time.perf_counter()
+            for _ in range(scenario_requests(share, requests)):
+                request = build(ctx)
+                if request is None:
+                    break
+                method, path, body = request
+                t0 = time.perf_counter()
+                response = client.request(method, path, **request_kwargs(body))
+                latencies.append(time.perf_counter() - t0)
+                check_response(name, method, path, response)
+                record_created(ctx, method, path, response)
+            results[name] = summarize(latencies, time.perf_counter() - started)
+    return results
+
+
+def run_inprocess_subprocess(db_path: Path, requests: int, seed: int) -> Dict[str, Any]:
+    """Запустить run_inprocess в дочернем процессе с нужной базой"""
+    env = dict(os.environ, FURNITURE_DB_PATH=str(db_path))
+    completed = subprocess.run(
+        [sys.executable, __file__, "--inprocess-worker", str(db_path),
+         "--requests", str(requests), "--seed", str(seed)],
+        cwd=str(BACKEND_DIR), env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        # Последние строки stderr - трассировка с сообщением BenchmarkError
+        raise BenchmarkError("Прогон в процессе завершился с ошибкой:\n"
+                             + "\n".join(completed.stderr.strip().splitlines()[-5:]))
+    # Последняя строка вывода - результат, остальное - сообщения сервера
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# ---------------------------------------------------------------------------
+# Конкурентная нагрузка по HTTP (uvicorn + httpx)
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path: Path, port: int) -> subprocess.Popen:
+    """Запустить uvicorn на копии базы и дождаться, пока он начнет отвечать"""
+    import httpx
+
+    env = dict(os.environ, FURNITURE_DB_PATH=str(db_path))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=str(BACKEND_DIR), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn завершился при запуске")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/product-types", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("uvicorn не ответил за отведенное время")
+
+
+async def run_http_scenario(client, ctx: BenchmarkContext, name: str, build, total: int,
+                            concurrency: int) -> Dict[str, Any]:
+    """Выполнить total запросов сценария, держа concurrency запросов в полете"""
+    latencies: List[float] = []
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = build(ctx)
+            if request is None:
+                return
+            method, path, body = request
+            t0 = time.perf_counter()
+            response = await client.request(method, path, **request_kwargs(body))
+            latencies.append(time.perf_counter() - t0)
+            check_response(name, method, path, response)
+            record_created(ctx, method, path, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_http_scenarios(base_url: str, ctx: BenchmarkContext, requests: int,
+                             concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for name, build, share in SCENARIOS:
+            results[name] = await run_http_scenario(
+                client, ctx, name, build, scenario_requests(share, requests), concurrency
+            )
+    return results
+
+
+def run_http(db_path: Path, requests: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    port = free_port()
+    server = start_server(db_path, port)
+    try:
+        ctx = BenchmarkContext(db_path, seed)
+        return asyncio.run(
+            run_http_scenarios(f"http://127.0.0.1:{port}", ctx, requests, concurrency)
+        )
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+# ---------------------------------------------------------------------------
+# Сборка баз, отчеты и сравнение прогонов
+# ---------------------------------------------------------------------------
+
+def prepare_database(workdir: Path, size: int, seed: int, rebuild: bool) -> Path:
+    """
+    Эталонная база нужного размера (собирается один раз и переиспользуется)
+    и ее рабочая копия, которую сценарии могут изменять.
+    """
+    from generate_products import build_database
+
+    pristine = workdir / f"catalog_{size}_seed{seed}.db"
+    if rebuild or not pristine.exists():
+        build_database(pristine, size, seed=seed, force=True)
+
+    working = workdir / f"bench_{size}.db"
+    for suffix in ("-wal", "-shm"):
+        leftover = Path(str(working) + suffix)
+        if leftover.exists():
+            leftover.unlink()
+    shutil.copyfile(pristine, working)
+    return working
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT_DIR),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(title: str, results: Dict[str, Any]):
+    print(f"\n{title}")
+    print(f"  {'Маршрут':<34}{'запросов':>9}{'RPS':>10}"
+          f"{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for name, row in results.items():
+        print(f"  {name:<34}{row['requests']:>9}{row['throughput_rps']:>10}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]):
+    """Изменение p95 относительно предыдущего прогона (в процентах)"""
+    print(f"\n📈 Сравнение с {previous.get('revision')} ({previous.get('timestamp')}), p95:")
+    for size, modes in current["sizes"].items():
+        for mode, results in modes.items():
+            old_results = previous.get("sizes", {}).get(size, {}).get(mode, {})
+            for name, row in results.items():
+                old = old_results.get(name)
+                if not old or not old["p95_ms"]:
+                    continue
+                change = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+                mark = "🔺" if change > 10 else ("🔻" if change < -10 else "  ")
+                print(f"  {mark} {size:>9} {mode:<10}{name:<34}"
+                      f"{old['p95_ms']:>10} -> {row['p95_ms']:<10} ({change:+.1f}%)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование API")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="размеры каталога через запятую")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS,
+                        help="запросов на маршрут")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="одновременных запросов при HTTP-нагрузке")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workdir", type=Path,
+                        default=Path(tempfile.gettempdir()) / "furniture_benchmarks",
+                        help="каталог для собранных баз")
+    parser.add_argument("--rebuild", action="store_true", help="пересобрать базы")
+    parser.add_argument("--no-inprocess", action="store_true", help="без прогона в процессе")
+    parser.add_argument("--no-http", action="store_true", help="без HTTP-нагрузки")
+    parser.add_argument("--output", type=Path, default=None, help="файл результатов JSON")
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="предыдущий файл результатов для сравнения")
+    parser.add_argument("--inprocess-worker", type=Path, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.inprocess_worker is not None:
+        print(json.dumps(run_inprocess(args.inprocess_worker, args.requests, args.seed)))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    args.workdir.mkdir(parents=True, exist_ok=True)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "sizes": {},
+    }
+
+    for size in sizes:
+        print(f"\n{'=' * 60}\n📦 Каталог: {size} продуктов\n{'=' * 60}")
+        report["sizes"][str(size)] = modes = {}
+
+        if not args.no_inprocess:
+            db_path = prepare_database(args.workdir, size, args.seed, args.rebuild)
+            modes["inprocess"] = run_inprocess_subprocess(db_path, args.requests, args.seed)
+            print_table("🧪 В процессе (TestClient, последовательно)", modes["inprocess"])
+
+        if not args.no_http:
+            db_path = prepare_database(args.workdir, size, args.seed, False)
+            modes["http"] = run_http(db_path, args.requests, args.concurrency, args.seed)
+            print_table(f"🌐 HTTP (uvicorn, {args.concurrency} одновременно)", modes["http"])
+
+    output = args.output or RESULTS_DIR / (
+        f"{datetime.now():%Y%m%d_%H%M%S}_{report['revision'] or 'local'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n💾 Результаты сохранены: {output}")
+
+    if args.compare is not None:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BenchmarkError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
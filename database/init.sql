@@ -1,412 +1,300 @@
-import sqlite3
-import pandas as pd
-from contextlib import contextmanager
-from pathlib import Path
-from typing import Optional, List, Dict, Any
+-- Схема БД мебельной компании. Файл сгенерирован из backend/migrations.py:
+--     python backend/migrations.py --sql > database/init.sql
+-- Не редактируйте вручную - добавьте новую миграцию.
 
-class Database:
-    def __init__(self, db_path: Optional[str] = None):
-        """Инициализация подключения к базе данных SQLite"""
-        if db_path is None:
-            # Путь к базе данных относительно расположения этого файла
-            self.db_path = Path(__file__).parent.parent / "database" / "furniture.db"
-        else:
-            self.db_path = Path(db_path)
-        
-        # Создаем папку для базы данных, если её нет
-        self.db_path.parent.mkdir(exist_ok=True)
-    
-    @contextmanager
-    def get_connection(self):
-        """
-        Контекстный менеджер для работы с подключением к БД.
-        Автоматически закрывает соединение после использования.
-        """
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row  # Возвращает строки как словари
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"❌ Ошибка в транзакции: {e}")
-            raise
-        finally:
-            conn.close()
-    
-    def init_database(self) -> bool:
-        """Инициализация базы данных: создает таблицы и заполняет тестовыми данными"""
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # 1. Создаем таблицу типов продукции
-                cursor.execute("""
-                CREATE TABLE IF NOT EXISTS product_types (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    type_name VARCHAR(50) NOT NULL UNIQUE,
-                    production_coefficient REAL NOT NULL CHECK(production_coefficient > 0)
-                )
-                """)
-                
-                # 2. Создаем таблицу материалов
-                cursor.execute("""
-                CREATE TABLE IF NOT EXISTS materials (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    material_name VARCHAR(100) NOT NULL UNIQUE,
-                    loss_percentage REAL NOT NULL CHECK(loss_percentage >= 0 AND loss_percentage <= 100)
-                )
-                """)
-                
-                # 3. Создаем таблицу цехов
-                cursor.execute("""
-                CREATE TABLE IF NOT EXISTS workshops (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    workshop_name VARCHAR(100) NOT NULL UNIQUE,
-                    worker_count INTEGER NOT NULL CHECK(worker_count > 0),
-                    processing_time INTEGER NOT NULL CHECK(processing_time > 0)
-                )
-                """)
-                
-                # 4. Создаем таблицу продукции
-                cursor.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    article VARCHAR(50) NOT NULL,
-                    product_type_id INTEGER NOT NULL,
-                    product_name VARCHAR(200) NOT NULL,
-                    min_partner_price DECIMAL(10,2) NOT NULL CHECK(min_partner_price >= 0),
-                    main_material_id INTEGER NOT NULL,
-                    param1 REAL NOT NULL CHECK(param1 > 0),
-                    param2 REAL NOT NULL CHECK(param2 > 0),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (product_type_id) REFERENCES product_types(id),
-                    FOREIGN KEY (main_material_id) REFERENCES materials(id)
-                )
-                """)
-                
-                # 5. Создаем таблицу для связи продукции и цехов (производственный график)
-                cursor.execute("""
-                CREATE TABLE IF NOT EXISTS production_schedule (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_id INTEGER NOT NULL,
-                    workshop_id INTEGER NOT NULL,
-                    processing_order INTEGER NOT NULL CHECK(processing_order > 0),
-                    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
-                    FOREIGN KEY (workshop_id) REFERENCES workshops(id),
-                    UNIQUE(product_id, workshop_id, processing_order)
-                )
-                """)
-                
-                # 6. Создаем триггер для автоматического обновления времени изменения
-                cursor.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
-                AFTER UPDATE ON products
-                BEGIN
-                    UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-                END
-                """)
-                
-                # 7. Заполняем тестовыми данными (используем INSERT OR IGNORE чтобы избежать ошибок дублирования)
-                
-                # Типы продукции
-                cursor.execute("""
-                INSERT OR IGNORE INTO product_types (type_name, production_coefficient) VALUES
-                ('Современный стул', 1.2),
-                ('Классический стол', 1.5),
-                ('Современный шкаф', 1.8),
-                ('Классическое кресло', 1.3)
-                """)
-                
-                # Материалы
-                cursor.execute("""
-                INSERT OR IGNORE INTO materials (material_name, loss_percentage) VALUES
-                ('Дуб', 5.0),
-                ('Бук', 4.5),
-                ('Сосна', 6.0),
-                ('МДФ', 3.0),
-                ('Массив ясеня', 4.0)
-                """)
-                
-                # Цехи
-                cursor.execute("""
-                INSERT OR IGNORE INTO workshops (workshop_name, worker_count, processing_time) VALUES
-                ('Цех распиловки', 8, 2),
-                ('Цех шлифовки', 6, 3),
-                ('Цех сборки', 10, 5),
-                ('Цех покраски', 7, 4),
-                ('Цех упаковки', 4, 1)
-                """)
-                
-                # Проверяем, есть ли уже продукты, если нет - добавляем тестовые
-                cursor.execute("SELECT COUNT(*) as count FROM products")
-                if cursor.fetchone()['count'] == 0:
-                    # Добавляем тестовый продукт
-                    cursor.execute("""
-                    INSERT OR IGNORE INTO products 
-                    (article, product_type_id, product_name, min_partner_price, main_material_id, param1, param2)
-                    VALUES 
-                    ('CHAIR-001', 1, 'Современный стул "Эко"', 4500.00, 1, 0.5, 0.5)
-                    """)
-                    
-                    # Получаем ID добавленного продукта
-                    product_id = cursor.lastrowid
-                    
-                    # Назначаем цехи для этого продукта
-                    if product_id:
-                        cursor.execute("""
-                        INSERT OR IGNORE INTO production_schedule (product_id, workshop_id, processing_order) VALUES
-                        (?, 1, 1),
-                        (?, 2, 2),
-                        (?, 3, 3)
-                        """, (product_id, product_id, product_id))
-                
-                print(f"✅ База данных успешно инициализирована: {self.db_path}")
-                return True
-                
-        except Exception as e:
-            print(f"❌ Ошибка инициализации базы данных: {e}")
-            return False
-    
-    def execute_query(self, query: str, params: tuple = None, 
-                     fetch_one: bool = False, fetch_all: bool = False) -> Any:
-        """
-        Универсальный метод для выполнения SQL запросов
-        
-        Аргументы:
-            query: SQL запрос
-            params: параметры для запроса
-            fetch_one: вернуть одну строку
-            fetch_all: вернуть все строки
-            
-        Возвращает:
-            Результат запроса или ID последней вставленной строки
-        """
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params or ())
-                
-                if fetch_one:
-                    result = cursor.fetchone()
-                    return dict(result) if result else None
-                elif fetch_all:
-                    return [dict(row) for row in cursor.fetchall()]
-                else:
-                    return cursor.lastrowid
-        except Exception as e:
-            print(f"❌ Ошибка выполнения запроса: {e}")
-            print(f"   Запрос: {query}")
-            print(f"   Параметры: {params}")
-            raise
-    
-    def import_from_excel(self, file_path: str, table_name: str) -> bool:
-        """
-        Импорт данных из Excel файла в указанную таблицу
-        
-        Аргументы:
-            file_path: путь к Excel файлу
-            table_name: имя таблицы для импорта
-            
-        Возвращает:
-            True если импорт успешен, False если есть ошибки
-        """
-        try:
-            # Читаем Excel файл
-            df = pd.read_excel(file_path)
-            
-            with self.get_connection() as conn:
-                # Используем if_exists='append' чтобы добавлять данные, не удаляя существующие
-                df.to_sql(table_name, conn, if_exists='append', index=False)
-            
-            print(f"✅ Данные успешно импортированы из {file_path} в таблицу {table_name}")
-            return True
-            
-        except FileNotFoundError:
-            print(f"❌ Файл не найден: {file_path}")
-            return False
-        except Exception as e:
-            print(f"❌ Ошибка импорта из Excel: {e}")
-            return False
-    
-    def get_all_products(self) -> List[Dict]:
-        """Получить все продукты с информацией о типе и материале"""
-        query = """
-        SELECT 
-            p.*,
-            pt.type_name as product_type_name,
-            pt.production_coefficient,
-            m.material_name,
-            m.loss_percentage
-        FROM products p
-        LEFT JOIN product_types pt ON p.product_type_id = pt.id
-        LEFT JOIN materials m ON p.main_material_id = m.id
-        ORDER BY p.created_at DESC
-        """
-        return self.execute_query(query, fetch_all=True)
-    
-    def get_product_by_id(self, product_id: int) -> Optional[Dict]:
-        """Получить продукт по ID"""
-        query = """
-        SELECT 
-            p.*,
-            pt.type_name as product_type_name,
-            pt.production_coefficient,
-            m.material_name,
-            m.loss_percentage
-        FROM products p
-        LEFT JOIN product_types pt ON p.product_type_id = pt.id
-        LEFT JOIN materials m ON p.main_material_id = m.id
-        WHERE p.id = ?
-        """
-        result = self.execute_query(query, (product_id,), fetch_one=True)
-        if result:
-            # Получаем цехи для этого продукта
-            workshops_query = """
-            SELECT w.*, ps.processing_order
-            FROM workshops w
-            JOIN production_schedule ps ON w.id = ps.workshop_id
-            WHERE ps.product_id = ?
-            ORDER BY ps.processing_order
-            """
-            workshops = self.execute_query(workshops_query, (product_id,), fetch_all=True)
-            result['workshops'] = workshops
-        return result
-    
-    def get_all_workshops(self) -> List[Dict]:
-        """Получить все цехи"""
-        return self.execute_query("SELECT * FROM workshops ORDER BY workshop_name", fetch_all=True)
-    
-    def get_product_workshops(self, product_id: int) -> List[Dict]:
-        """Получить цехи для конкретного продукта"""
-        query = """
-        SELECT w.*, ps.processing_order
-        FROM workshops w
-        JOIN production_schedule ps ON w.id = ps.workshop_id
-        WHERE ps.product_id = ?
-        ORDER BY ps.processing_order
-        """
-        return self.execute_query(query, (product_id,), fetch_all=True)
-    
-    def add_product(self, article: str, product_type_id: int, product_name: str,
-                   min_partner_price: float, main_material_id: int,
-                   param1: float, param2: float) -> Optional[int]:
-        """Добавить новый продукт"""
-        query = """
-        INSERT INTO products 
-        (article, product_type_id, product_name, min_partner_price, 
-         main_material_id, param1, param2)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        try:
-            product_id = self.execute_query(
-                query, 
-                (article, product_type_id, product_name, min_partner_price, 
-                 main_material_id, param1, param2)
-            )
-            return product_id
-        except Exception as e:
-            print(f"❌ Ошибка добавления продукта: {e}")
-            return None
-    
-    def update_product(self, product_id: int, article: str, product_type_id: int, 
-                      product_name: str, min_partner_price: float, 
-                      main_material_id: int, param1: float, param2: float) -> bool:
-        """Обновить существующий продукт"""
-        query = """
-        UPDATE products 
-        SET article = ?, product_type_id = ?, product_name = ?, 
-            min_partner_price = ?, main_material_id = ?, 
-            param1 = ?, param2 = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-        """
-        try:
-            self.execute_query(
-                query,
-                (article, product_type_id, product_name, min_partner_price,
-                 main_material_id, param1, param2, product_id)
-            )
-            return True
-        except Exception as e:
-            print(f"❌ Ошибка обновления продукта: {e}")
-            return False
-    
-    def delete_product(self, product_id: int) -> bool:
-        """Удалить продукт (каскадное удаление через production_schedule)"""
-        query = "DELETE FROM products WHERE id = ?"
-        try:
-            self.execute_query(query, (product_id,))
-            return True
-        except Exception as e:
-            print(f"❌ Ошибка удаления продукта: {e}")
-            return False
-    
-    def add_workshop_to_product(self, product_id: int, workshop_id: int, 
-                               processing_order: int) -> bool:
-        """Добавить цех к продукту"""
-        query = """
-        INSERT OR REPLACE INTO production_schedule 
-        (product_id, workshop_id, processing_order)
-        VALUES (?, ?, ?)
-        """
-        try:
-            self.execute_query(query, (product_id, workshop_id, processing_order))
-            return True
-        except Exception as e:
-            print(f"❌ Ошибка добавления цеха к продукту: {e}")
-            return False
-    
-    def get_product_types(self) -> List[Dict]:
-        """Получить все типы продукции"""
-        return self.execute_query("SELECT * FROM product_types ORDER BY type_name", fetch_all=True)
-    
-    def get_materials(self) -> List[Dict]:
-        """Получить все материалы"""
-        return self.execute_query("SELECT * FROM materials ORDER BY material_name", fetch_all=True)
-    
-    def calculate_total_production_time(self, product_id: int) -> int:
-        """Рассчитать общее время производства продукта"""
-        query = """
-        SELECT SUM(w.processing_time) as total_time
-        FROM workshops w
-        JOIN production_schedule ps ON w.id = ps.workshop_id
-        WHERE ps.product_id = ?
-        """
-        result = self.execute_query(query, (product_id,), fetch_one=True)
-        return result['total_time'] if result and result['total_time'] else 0
-    
-    def backup_database(self, backup_path: str) -> bool:
-        """Создать резервную копию базы данных"""
-        try:
-            import shutil
-            shutil.copy2(str(self.db_path), backup_path)
-            print(f"✅ Резервная копия создана: {backup_path}")
-            return True
-        except Exception as e:
-            print(f"❌ Ошибка создания резервной копии: {e}")
-            return False
+-- Миграция 1: Таблицы справочников, продукции и графика цехов
+CREATE TABLE IF NOT EXISTS product_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type_name VARCHAR(50) NOT NULL UNIQUE,
+    production_coefficient REAL NOT NULL CHECK(production_coefficient > 0)
+);
+CREATE TABLE IF NOT EXISTS materials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    material_name VARCHAR(100) NOT NULL UNIQUE,
+    loss_percentage REAL NOT NULL CHECK(loss_percentage >= 0 AND loss_percentage <= 100)
+);
+CREATE TABLE IF NOT EXISTS workshops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workshop_name VARCHAR(100) NOT NULL UNIQUE,
+    worker_count INTEGER NOT NULL CHECK(worker_count > 0),
+    processing_time INTEGER NOT NULL CHECK(processing_time > 0)
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    article VARCHAR(50) NOT NULL,
+    product_type_id INTEGER NOT NULL,
+    product_name VARCHAR(200) NOT NULL,
+    min_partner_price DECIMAL(10,2) NOT NULL CHECK(min_partner_price >= 0),
+    main_material_id INTEGER NOT NULL,
+    param1 REAL NOT NULL CHECK(param1 > 0),
+    param2 REAL NOT NULL CHECK(param2 > 0),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_type_id) REFERENCES product_types(id),
+    FOREIGN KEY (main_material_id) REFERENCES materials(id)
+);
+CREATE TABLE IF NOT EXISTS production_schedule (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER NOT NULL,
+    workshop_id INTEGER NOT NULL,
+    processing_order INTEGER NOT NULL CHECK(processing_order > 0),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (workshop_id) REFERENCES workshops(id),
+    UNIQUE(product_id, workshop_id, processing_order)
+);
+CREATE TRIGGER IF NOT EXISTS update_products_timestamp 
+AFTER UPDATE ON products
+BEGIN
+    UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
 
+-- Миграция 2: Индексы фильтров, сортировок и маршрутов
+CREATE INDEX IF NOT EXISTS idx_products_created_at ON products(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products(min_partner_price, id);
+CREATE INDEX IF NOT EXISTS idx_products_name ON products(product_name, id);
+CREATE INDEX IF NOT EXISTS idx_products_article ON products(article, id);
+CREATE INDEX IF NOT EXISTS idx_products_type ON products(product_type_id);
+CREATE INDEX IF NOT EXISTS idx_products_material ON products(main_material_id);
+CREATE INDEX IF NOT EXISTS idx_schedule_product ON production_schedule(product_id, processing_order);
 
-# Создаем глобальный экземпляр для удобства использования
-db_instance = Database()
+-- Миграция 3: Агрегаты статистики и их триггеры
+CREATE TABLE IF NOT EXISTS product_stats (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    product_count INTEGER NOT NULL DEFAULT 0,
+    price_sum REAL NOT NULL DEFAULT 0,
+    price_min REAL,
+    price_max REAL
+);
+CREATE TABLE IF NOT EXISTS product_type_stats (
+    product_type_id INTEGER PRIMARY KEY,
+    product_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS material_stats (
+    material_id INTEGER PRIMARY KEY,
+    product_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS products_stats_insert
+AFTER INSERT ON products
+BEGIN
+    UPDATE product_stats SET
+        product_count = product_count + 1,
+        price_sum = price_sum + NEW.min_partner_price,
+        price_min = MIN(COALESCE(price_min, NEW.min_partner_price), NEW.min_partner_price),
+        price_max = MAX(COALESCE(price_max, NEW.min_partner_price), NEW.min_partner_price)
+    WHERE id = 1;
+    INSERT INTO product_type_stats (product_type_id, product_count)
+    VALUES (NEW.product_type_id, 1)
+    ON CONFLICT(product_type_id) DO UPDATE SET product_count = product_count + 1;
+    INSERT INTO material_stats (material_id, product_count)
+    VALUES (NEW.main_material_id, 1)
+    ON CONFLICT(material_id) DO UPDATE SET product_count = product_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS products_stats_delete
+AFTER DELETE ON products
+BEGIN
+    UPDATE product_stats SET
+        product_count = product_count - 1,
+        price_sum = price_sum - OLD.min_partner_price,
+        price_min = (SELECT MIN(min_partner_price) FROM products),
+        price_max = (SELECT MAX(min_partner_price) FROM products)
+    WHERE id = 1;
+    UPDATE product_type_stats SET product_count = product_count - 1
+    WHERE product_type_id = OLD.product_type_id;
+    UPDATE material_stats SET product_count = product_count - 1
+    WHERE material_id = OLD.main_material_id;
+END;
+CREATE TRIGGER IF NOT EXISTS products_stats_update_price
+AFTER UPDATE OF min_partner_price ON products
+WHEN OLD.min_partner_price IS NOT NEW.min_partner_price
+BEGIN
+    UPDATE product_stats SET
+        price_sum = price_sum - OLD.min_partner_price + NEW.min_partner_price,
+        price_min = (SELECT MIN(min_partner_price) FROM products),
+        price_max = (SELECT MAX(min_partner_price) FROM products)
+    WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS products_stats_update_type
+AFTER UPDATE OF product_type_id ON products
+WHEN OLD.product_type_id IS NOT NEW.product_type_id
+BEGIN
+    UPDATE product_type_stats SET product_count = product_count - 1
+    WHERE product_type_id = OLD.product_type_id;
+    INSERT INTO product_type_stats (product_type_id, product_count)
+    VALUES (NEW.product_type_id, 1)
+    ON CONFLICT(product_type_id) DO UPDATE SET product_count = product_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS products_stats_update_material
+AFTER UPDATE OF main_material_id ON products
+WHEN OLD.main_material_id IS NOT NEW.main_material_id
+BEGIN
+    UPDATE material_stats SET product_count = product_count - 1
+    WHERE material_id = OLD.main_material_id;
+    INSERT INTO material_stats (material_id, product_count)
+    VALUES (NEW.main_material_id, 1)
+    ON CONFLICT(material_id) DO UPDATE SET product_count = product_count + 1;
+END;
+CREATE TABLE IF NOT EXISTS price_range_stats (
+    range_index INTEGER PRIMARY KEY,
+    product_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS workshop_route_stats (
+    workshop_id INTEGER PRIMARY KEY,
+    route_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS products_price_range_insert
+AFTER INSERT ON products
+BEGIN
+    INSERT INTO price_range_stats (range_index, product_count)
+    VALUES (CASE WHEN NEW.min_partner_price < 5000 THEN 0 WHEN NEW.min_partner_price < 10000 THEN 1 WHEN NEW.min_partner_price < 20000 THEN 2 WHEN NEW.min_partner_price < 50000 THEN 3 ELSE 4 END, 1)
+    ON CONFLICT(range_index) DO UPDATE SET product_count = product_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS products_price_range_delete
+AFTER DELETE ON products
+BEGIN
+    UPDATE price_range_stats SET product_count = product_count - 1
+    WHERE range_index = CASE WHEN OLD.min_partner_price < 5000 THEN 0 WHEN OLD.min_partner_price < 10000 THEN 1 WHEN OLD.min_partner_price < 20000 THEN 2 WHEN OLD.min_partner_price < 50000 THEN 3 ELSE 4 END;
+END;
+CREATE TRIGGER IF NOT EXISTS products_price_range_update
+AFTER UPDATE OF min_partner_price ON products
+WHEN OLD.min_partner_price IS NOT NEW.min_partner_price
+BEGIN
+    UPDATE price_range_stats SET product_count = product_count - 1
+    WHERE range_index = CASE WHEN OLD.min_partner_price < 5000 THEN 0 WHEN OLD.min_partner_price < 10000 THEN 1 WHEN OLD.min_partner_price < 20000 THEN 2 WHEN OLD.min_partner_price < 50000 THEN 3 ELSE 4 END;
+    INSERT INTO price_range_stats (range_index, product_count)
+    VALUES (CASE WHEN NEW.min_partner_price < 5000 THEN 0 WHEN NEW.min_partner_price < 10000 THEN 1 WHEN NEW.min_partner_price < 20000 THEN 2 WHEN NEW.min_partner_price < 50000 THEN 3 ELSE 4 END, 1)
+    ON CONFLICT(range_index) DO UPDATE SET product_count = product_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS schedule_route_stats_insert
+AFTER INSERT ON production_schedule
+BEGIN
+    INSERT INTO workshop_route_stats (workshop_id, route_count)
+    VALUES (NEW.workshop_id, 1)
+    ON CONFLICT(workshop_id) DO UPDATE SET route_count = route_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS schedule_route_stats_delete
+AFTER DELETE ON production_schedule
+BEGIN
+    UPDATE workshop_route_stats SET route_count = route_count - 1
+    WHERE workshop_id = OLD.workshop_id;
+END;
+CREATE TRIGGER IF NOT EXISTS schedule_route_stats_update
+AFTER UPDATE OF workshop_id ON production_schedule
+WHEN OLD.workshop_id IS NOT NEW.workshop_id
+BEGIN
+    UPDATE workshop_route_stats SET route_count = route_count - 1
+    WHERE workshop_id = OLD.workshop_id;
+    INSERT INTO workshop_route_stats (workshop_id, route_count)
+    VALUES (NEW.workshop_id, 1)
+    ON CONFLICT(workshop_id) DO UPDATE SET route_count = route_count + 1;
+END;
 
-if __name__ == "__main__":
-    # Тестирование базы данных
-    print("🔧 Тестирование базы данных...")
-    
-    db = Database()
-    if db.init_database():
-        print("✅ База данных успешно протестирована")
-        
-        # Показываем примеры данных
-        products = db.get_all_products()
-        print(f"📦 Найдено продуктов: {len(products)}")
-        
-        workshops = db.get_all_workshops()
-        print(f"🏭 Найдено цехов: {len(workshops)}")
-        
-        materials = db.get_materials()
-        print(f"🌳 Найдено материалов: {len(materials)}")
-    else:
-        print("❌ Ошибка тестирования базы данных")
\ No newline at end of file
+-- Миграция 4: Полнотекстовый индекс products_fts
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    article, product_name,
+    content='products', content_rowid='id',
+    tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS products_fts_insert
+AFTER INSERT ON products
+BEGIN
+    INSERT INTO products_fts (rowid, article, product_name)
+    VALUES (NEW.id, NEW.article, NEW.product_name);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_delete
+AFTER DELETE ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, article, product_name)
+    VALUES ('delete', OLD.id, OLD.article, OLD.product_name);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_update
+AFTER UPDATE OF article, product_name ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, article, product_name)
+    VALUES ('delete', OLD.id, OLD.article, OLD.product_name);
+    INSERT INTO products_fts (rowid, article, product_name)
+    VALUES (NEW.id, NEW.article, NEW.product_name);
+END;
+
+-- Миграция 5: Ревизия данных для ETag
+CREATE TABLE IF NOT EXISTS data_revision (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    revision INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO data_revision (id, revision) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS products_revision_insert
+AFTER INSERT ON products
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS products_revision_update
+AFTER UPDATE ON products
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS products_revision_delete
+AFTER DELETE ON products
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS production_schedule_revision_insert
+AFTER INSERT ON production_schedule
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS production_schedule_revision_update
+AFTER UPDATE ON production_schedule
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS production_schedule_revision_delete
+AFTER DELETE ON production_schedule
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS product_types_revision_insert
+AFTER INSERT ON product_types
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS product_types_revision_update
+AFTER UPDATE ON product_types
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS product_types_revision_delete
+AFTER DELETE ON product_types
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS materials_revision_insert
+AFTER INSERT ON materials
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS materials_revision_update
+AFTER UPDATE ON materials
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS materials_revision_delete
+AFTER DELETE ON materials
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS workshops_revision_insert
+AFTER INSERT ON workshops
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS workshops_revision_update
+AFTER UPDATE ON workshops
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS workshops_revision_delete
+AFTER DELETE ON workshops
+BEGIN
+    UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+END;
+
+PRAGMA user_version = 5;
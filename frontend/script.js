@@ -2,9 +2,15 @@
 let currentPage = 1;
 const itemsPerPage = 10;
 let allProducts = [];
+let productsCursor = null;      // Курсор текущей страницы
+let nextProductsCursor = null;  // Курсор следующей страницы (от сервера)
+let productsCursorStack = [];   // Курсоры предыдущих страниц для кнопки "Назад"
 let allWorkshops = [];
 let productTypes = [];
 let materials = [];
+let catalogStats = null;        // Статистика всего каталога (/reports/statistics)
+const REPORT_PAGE_SIZE = 500;   // Размер страницы при выборке строк пользовательского отчета
+const CUSTOM_REPORT_MAX_ROWS = 10000;  // Больше строк - через выгрузку "Товары"
 let selectedProducts = new Set(); // Для массового удаления
 
 // API базовый URL
@@ -40,51 +46,84 @@ function getNotificationIcon(type) {
 // Загрузка данных
 async function loadData() {
     try {
-        // Загружаем продукцию
-        const productsResponse = await fetch(`${API_URL}/products`);
-        if (productsResponse.ok) {
-            allProducts = await productsResponse.json();
-            renderProductsTable();
-            updatePagination();
-            updateReports();
-            updateDashboard();
-        }
+        // Загружаем первую страницу продукции
+        productsCursor = null;
+        productsCursorStack = [];
+        currentPage = 1;
+        await loadProductsPage();
         
         // Загружаем цехи
         const workshopsResponse = await fetch(`${API_URL}/workshops`);
         if (workshopsResponse.ok) {
-            allWorkshops = await workshopsResponse.json();
+            allWorkshops = (await workshopsResponse.json()).data;
             renderWorkshopsTable();
         }
         
         // Загружаем типы продукции
         const typesResponse = await fetch(`${API_URL}/product-types`);
         if (typesResponse.ok) {
-            productTypes = await typesResponse.json();
+            productTypes = (await typesResponse.json()).data;
             populateProductTypes();
         }
         
         // Загружаем материалы
         const materialsResponse = await fetch(`${API_URL}/materials`);
         if (materialsResponse.ok) {
-            materials = await materialsResponse.json();
+            materials = (await materialsResponse.json()).data;
             populateMaterials();
         }
         
+        // Отчеты и дашборд - по статистике всего каталога
+        await loadStatistics();
+        
     } catch (error) {
         console.error('Ошибка загрузки данных:', error);
         showNotification('Ошибка загрузки данных. Проверьте подключение к серверу.', 'error');
     }
 }
 
+// Параметры запроса списка продукции из полей фильтра
+function buildProductsQuery(cursor) {
+    const params = new URLSearchParams();
+    const value = id => (document.getElementById(id)?.value || '').trim();
+    
+    if (value('search-products')) params.set('search', value('search-products'));
+    if (value('filter-type')) params.set('type_id', value('filter-type'));
+    if (value('filter-material')) params.set('material_id', value('filter-material'));
+    if (value('filter-price-min')) params.set('price_min', value('filter-price-min'));
+    if (value('filter-price-max')) params.set('price_max', value('filter-price-max'));
+    if (cursor) params.set('cursor', cursor);
+    params.set('limit', itemsPerPage);
+    // Маршрут по цехам и общее время нужны для просмотра цехов продукта
+    params.set('include_workshops', 'true');
+    
+    return params.toString();
+}
+
+// Загрузка одной страницы продукции: фильтрация и пагинация на сервере
+async function loadProductsPage() {
+    const response = await fetch(`${API_URL}/products?${buildProductsQuery(productsCursor)}`);
+    if (!response.ok) {
+        const error = await response.json();
+        showNotification(`Ошибка: ${error.detail || 'Неизвестная ошибка'}`, 'error');
+        return false;
+    }
+    
+    const result = await response.json();
+    allProducts = result.data;
+    nextProductsCursor = result.next_cursor;
+    renderProductsTable();
+    updatePagination();
+    return true;
+}
+
 // Отображение таблицы продукции с чекбоксами
 function renderProductsTable() {
     const tbody = document.getElementById('products-tbody');
     tbody.innerHTML = '';
     
-    const startIndex = (currentPage - 1) * itemsPerPage;
-    const endIndex = startIndex + itemsPerPage;
-    const displayedProducts = allProducts.slice(startIndex, endIndex);
+    // Сервер уже вернул только текущую страницу
+    const displayedProducts = allProducts;
     
     displayedProducts.forEach(product => {
         const row = document.createElement('tr');
@@ -215,13 +254,13 @@ async function deleteProduct(productId) {
                     allProducts = allProducts.filter(p => p.id !== productId);
                     // Удаляем из выбранных
                     selectedProducts.delete(productId);
-                    // Обновляем данные
-                    updateReports();
-                    updateDashboard();
                     updateSelectedCount();
                 }, 300);
             }
             
+            // Статистика каталога изменилась
+            loadStatistics();
+            
             showNotification('Продукт успешно удален', 'success');
             
             // Закрываем модальное окно
@@ -277,9 +316,8 @@ async function deleteSelectedProducts() {
             selectedProducts.clear();
             
             // Обновляем данные
-            updateReports();
-            updateDashboard();
             updateSelectedCount();
+            loadStatistics();
             
             showNotification(result.message || `Удалено ${productIds.length} товаров`, 'success');
             
@@ -369,72 +407,41 @@ function populateMaterials() {
     });
 }
 
-// Пагинация
+// Пагинация (курсорная: сервер возвращает курсор следующей страницы)
 function updatePagination() {
-    const totalPages = Math.ceil(allProducts.length / itemsPerPage);
-    document.getElementById('page-info').textContent = `Страница ${currentPage} из ${totalPages}`;
+    updatePageInfo();
 }
 
-function nextPage() {
-    const totalPages = Math.ceil(allProducts.length / itemsPerPage);
-    if (currentPage < totalPages) {
+async function nextPage() {
+    if (nextProductsCursor) {
+        productsCursorStack.push(productsCursor);
+        productsCursor = nextProductsCursor;
         currentPage++;
-        renderProductsTable();
+        await loadProductsPage();
     }
 }
 
-function prevPage() {
-    if (currentPage > 1) {
+async function prevPage() {
+    if (productsCursorStack.length > 0) {
+        productsCursor = productsCursorStack.pop();
         currentPage--;
-        renderProductsTable();
+        await loadProductsPage();
     }
 }
 
 function updatePageInfo() {
-    const start = (currentPage - 1) * itemsPerPage + 1;
-    const end = Math.min(currentPage * itemsPerPage, allProducts.length);
+    const start = allProducts.length > 0 ? (currentPage - 1) * itemsPerPage + 1 : 0;
+    const end = (currentPage - 1) * itemsPerPage + allProducts.length;
     document.getElementById('page-info').textContent = 
-        `Показано ${start}-${end} из ${allProducts.length} записей`;
+        `Страница ${currentPage}: записи ${start}-${end}${nextProductsCursor ? '' : ' (последняя)'}`;
 }
 
-// Фильтрация продукции
-function filterProducts() {
-    const searchTerm = document.getElementById('search-products').value.toLowerCase();
-    const typeFilter = document.getElementById('filter-type').value;
-    const materialFilter = document.getElementById('filter-material').value;
-    const priceMin = parseFloat(document.getElementById('filter-price-min').value) || 0;
-    const priceMax = parseFloat(document.getElementById('filter-price-max').value) || Infinity;
-    
-    let filtered = allProducts;
-    
-    if (searchTerm) {
-        filtered = filtered.filter(product => 
-            product.product_name.toLowerCase().includes(searchTerm) ||
-            product.article.toLowerCase().includes(searchTerm)
-        );
-    }
-    
-    if (typeFilter) {
-        filtered = filtered.filter(product => 
-            product.product_type_id == typeFilter
-        );
-    }
-    
-    if (materialFilter) {
-        filtered = filtered.filter(product => 
-            product.main_material_id == materialFilter
-        );
-    }
-    
-    // Фильтр по цене
-    filtered = filtered.filter(product => {
-        const price = parseFloat(product.min_partner_price);
-        return price >= priceMin && price <= priceMax;
-    });
-    
+// Фильтрация продукции (выполняется на сервере)
+async function filterProducts() {
     currentPage = 1;
-    allProducts = filtered;
-    renderProductsTable();
+    productsCursor = null;
+    productsCursorStack = [];
+    await loadProductsPage();
 }
 
 function resetFilters() {
@@ -545,7 +552,11 @@ async function saveProduct(event) {
         min_partner_price: parseFloat(document.getElementById('min-price').value),
         main_material_id: parseInt(document.getElementById('main-material').value),
         param1: parseFloat(document.getElementById('param1').value),
-        param2: parseFloat(document.getElementById('param2').value)
+        param2: parseFloat(document.getElementById('param2').value),
+        // Маршрут сохраняется в той же транзакции, что и продукт
+        workshops: Array.from(
+            document.querySelectorAll('input[name="workshop"]:checked')
+        ).map(cb => parseInt(cb.value))
     };
     
     // Валидация
@@ -578,13 +589,6 @@ async function saveProduct(event) {
         }
         
         if (response.ok) {
-            // Сохраняем выбранные цехи
-            const selectedWorkshops = Array.from(
-                document.querySelectorAll('input[name="workshop"]:checked')
-            ).map(cb => parseInt(cb.value));
-            
-            await saveProductWorkshops(productId || (await response.json()).id, selectedWorkshops);
-            
             showNotification(
                 productId ? 'Продукт успешно обновлен' : 'Продукт успешно добавлен',
                 'success'
@@ -602,24 +606,6 @@ async function saveProduct(event) {
     }
 }
 
-async function saveProductWorkshops(productId, workshopIds) {
-    try {
-        // Сначала удаляем все существующие связи
-        await fetch(`${API_URL}/products/${productId}/workshops`, {
-            method: 'DELETE'
-        });
-        
-        // Затем добавляем новые связи
-        for (let i = 0; i < workshopIds.length; i++) {
-            await fetch(`${API_URL}/products/${productId}/workshops/${workshopIds[i]}?order=${i + 1}`, {
-                method: 'POST'
-            });
-        }
-    } catch (error) {
-        console.error('Ошибка сохранения цехов:', error);
-    }
-}
-
 // Редактирование продукта
 async function editProduct(productId) {
     openProductForm(productId);
@@ -635,8 +621,7 @@ function viewWorkshops(productId) {
             product.workshops.forEach((workshop, index) => {
                 message += `${index + 1}. ${workshop.workshop_name} - ${workshop.processing_time} ч<br>`;
             });
-            const totalTime = product.workshops.reduce((sum, w) => sum + w.processing_time, 0);
-            message += `<br><strong>Общее время: ${totalTime} ч</strong>`;
+            message += `<br><strong>Общее время: ${product.total_production_time} ч</strong>`;
         } else {
             message += 'Цехи не назначены';
         }
@@ -695,28 +680,57 @@ async function calculateMaterials() {
     }
 }
 
+// Загрузка статистики каталога с сервера: отчеты и дашборд строятся
+// по всему каталогу, а в allProducts только видимая страница
+async function loadStatistics() {
+    try {
+        const response = await fetch(`${API_URL}/reports/statistics`);
+        if (!response.ok) {
+            const error = await response.json();
+            showNotification(`Ошибка: ${error.detail || 'Неизвестная ошибка'}`, 'error');
+            return false;
+        }
+        
+        const result = await response.json();
+        catalogStats = result.statistics;
+        updateReports();
+        updateDashboard();
+        return true;
+    } catch (error) {
+        console.error('Ошибка загрузки статистики:', error);
+        showNotification('Ошибка загрузки статистики', 'error');
+        return false;
+    }
+}
+
+// Подпись ценового диапазона из статистики
+function formatPriceRange(range) {
+    const format = value => value.toLocaleString('en-US');
+    if (!range.min) return `До ${format(range.max)} ₽`;
+    if (range.max === null) return `Свыше ${format(range.min)} ₽`;
+    return `${format(range.min)} - ${format(range.max)} ₽`;
+}
+
+// Доля (%) от общего числа товаров каталога
+function catalogShare(count, digits = 0) {
+    const total = catalogStats?.total_products || 0;
+    return total > 0 ? ((count / total) * 100).toFixed(digits) : 0;
+}
+
 // Обновление отчетов и дашборда
 function updateReports() {
-    // Общая статистика
-    document.getElementById('total-products').textContent = allProducts.length;
-    document.getElementById('total-workshops').textContent = allWorkshops.length;
+    if (!catalogStats) return;
     
-    const avgTime = allProducts.length > 0 ? 
-        Math.round(allProducts.reduce((sum, p) => {
-            const total = p.workshops ? p.workshops.reduce((s, w) => s + w.processing_time, 0) : 0;
-            return sum + total;
-        }, 0) / allProducts.length) : 0;
-    document.getElementById('avg-production-time').textContent = `${avgTime} ч`;
+    // Общая статистика
+    document.getElementById('total-products').textContent = catalogStats.total_products;
+    document.getElementById('total-workshops').textContent = catalogStats.total_workshops;
+    document.getElementById('avg-production-time').textContent = 
+        `${Math.round(catalogStats.avg_production_time)} ч`;
     
     // Статистика по ценам
-    const prices = allProducts.map(p => parseFloat(p.min_partner_price));
-    const avgPrice = prices.length > 0 ? (prices.reduce((a, b) => a + b, 0) / prices.length).toFixed(2) : 0;
-    const minPrice = prices.length > 0 ? Math.min(...prices).toFixed(2) : 0;
-    const maxPrice = prices.length > 0 ? Math.max(...prices).toFixed(2) : 0;
-    
-    document.getElementById('avg-price').textContent = `${avgPrice} ₽`;
-    document.getElementById('min-price-stat').textContent = `${minPrice} ₽`;
-    document.getElementById('max-price-stat').textContent = `${maxPrice} ₽`;
+    document.getElementById('avg-price').textContent = `${catalogStats.price_avg.toFixed(2)} ₽`;
+    document.getElementById('min-price-stat').textContent = `${catalogStats.price_min.toFixed(2)} ₽`;
+    document.getElementById('max-price-stat').textContent = `${catalogStats.price_max.toFixed(2)} ₽`;
     
     // Строим простые графики распределения
     buildTypeDistributionChart();
@@ -728,22 +742,24 @@ function updateReports() {
 }
 
 function updateDashboard() {
+    if (!catalogStats) return;
+    
     // Обновляем статистику на дашборде
-    document.getElementById('dashboard-total-products').textContent = allProducts.length;
-    document.getElementById('dashboard-total-workshops').textContent = allWorkshops.length;
-    document.getElementById('dashboard-total-types').textContent = productTypes.length;
-    document.getElementById('dashboard-total-materials').textContent = materials.length;
+    document.getElementById('dashboard-total-products').textContent = catalogStats.total_products;
+    document.getElementById('dashboard-total-workshops').textContent = catalogStats.total_workshops;
+    document.getElementById('dashboard-total-types').textContent = catalogStats.total_types;
+    document.getElementById('dashboard-total-materials').textContent = catalogStats.total_materials;
     
     // Показываем последние добавленные товары
     const recentProductsContainer = document.getElementById('recent-products-list');
     if (recentProductsContainer) {
-        const recentProducts = allProducts.slice(0, 5);
+        const recentProducts = catalogStats.recent_products.slice(0, 5);
         let html = '';
         recentProducts.forEach(product => {
             html += `
                 <div class="recent-product-item">
-                    <div class="recent-product-name">${product.article} - ${product.product_name}</div>
-                    <div class="recent-product-price">${parseFloat(product.min_partner_price).toFixed(2)} ₽</div>
+                    <div class="recent-product-name">${product.article} - ${product.name}</div>
+                    <div class="recent-product-price">${product.price.toFixed(2)} ₽</div>
                 </div>
             `;
         });
@@ -751,158 +767,108 @@ function updateDashboard() {
     }
 }
 
-function buildTypeDistributionChart() {
-    const chartElement = document.getElementById('type-chart');
-    if (!chartElement) return;
-    
-    // Группируем по типам
-    const typeCounts = {};
-    allProducts.forEach(product => {
-        const typeName = product.product_type?.type_name || 'Не указан';
-        typeCounts[typeName] = (typeCounts[typeName] || 0) + 1;
-    });
-    
-    // Создаем простую текстовую визуализацию
+// Простая текстовая визуализация распределения: [[подпись, количество], ...]
+function renderDistribution(items, barStyle = '') {
     let html = '<div class="distribution-list">';
-    for (const [typeName, count] of Object.entries(typeCounts)) {
-        const percentage = allProducts.length > 0 ? Math.round((count / allProducts.length) * 100) : 0;
+    for (const [label, count] of items) {
+        const percentage = catalogShare(count);
         html += `
             <div class="distribution-item">
-                <span class="dist-label">${typeName}</span>
+                <span class="dist-label">${label}</span>
                 <div class="dist-bar-container">
-                    <div class="dist-bar" style="width: ${percentage}%;"></div>
+                    <div class="dist-bar" style="width: ${percentage}%;${barStyle}"></div>
                 </div>
                 <span class="dist-value">${count} (${percentage}%)</span>
             </div>
         `;
     }
     html += '</div>';
+    return html;
+}
+
+function buildTypeDistributionChart() {
+    const chartElement = document.getElementById('type-chart');
+    if (!chartElement) return;
     
-    chartElement.innerHTML = html;
+    chartElement.innerHTML = renderDistribution(
+        catalogStats.type_distribution.map(item => [item.type, item.count])
+    );
 }
 
 function buildMaterialDistributionChart() {
     const chartElement = document.getElementById('material-chart');
     if (!chartElement) return;
     
-    // Группируем по материалам
-    const materialCounts = {};
-    allProducts.forEach(product => {
-        const materialName = product.main_material?.material_name || 'Не указан';
-        materialCounts[materialName] = (materialCounts[materialName] || 0) + 1;
-    });
-    
-    // Создаем простую текстовую визуализацию
-    let html = '<div class="distribution-list">';
-    for (const [materialName, count] of Object.entries(materialCounts)) {
-        const percentage = allProducts.length > 0 ? Math.round((count / allProducts.length) * 100) : 0;
-        html += `
-            <div class="distribution-item">
-                <span class="dist-label">${materialName}</span>
-                <div class="dist-bar-container">
-                    <div class="dist-bar" style="width: ${percentage}%; background-color: var(--primary-color);"></div>
-                </div>
-                <span class="dist-value">${count} (${percentage}%)</span>
-            </div>
-        `;
-    }
-    html += '</div>';
-    
-    chartElement.innerHTML = html;
+    chartElement.innerHTML = renderDistribution(
+        catalogStats.material_distribution.map(item => [item.material, item.count]),
+        ' background-color: var(--primary-color);'
+    );
 }
 
 function buildPriceDistributionChart() {
     const chartElement = document.getElementById('price-chart');
     if (!chartElement) return;
     
-    // Группируем по ценовым диапазонам
-    const priceRanges = {
-        'До 5,000 ₽': 0,
-        '5,000 - 10,000 ₽': 0,
-        '10,000 - 20,000 ₽': 0,
-        '20,000 - 50,000 ₽': 0,
-        'Свыше 50,000 ₽': 0
-    };
-    
-    allProducts.forEach(product => {
-        const price = parseFloat(product.min_partner_price);
-        if (price < 5000) priceRanges['До 5,000 ₽']++;
-        else if (price < 10000) priceRanges['5,000 - 10,000 ₽']++;
-        else if (price < 20000) priceRanges['10,000 - 20,000 ₽']++;
-        else if (price < 50000) priceRanges['20,000 - 50,000 ₽']++;
-        else priceRanges['Свыше 50,000 ₽']++;
+    chartElement.innerHTML = renderDistribution(
+        catalogStats.price_distribution.map(range => [formatPriceRange(range), range.count]),
+        ' background-color: var(--secondary-color);'
+    );
+}
+
+// Скачивание CSV, сформированного в браузере
+function downloadCsv(content, filename) {
+    const blob = new Blob(['\ufeff' + content], { 
+        type: 'text/csv;charset=utf-8;'
     });
     
-    // Создаем простую текстовую визуализацию
-    let html = '<div class="distribution-list">';
-    for (const [range, count] of Object.entries(priceRanges)) {
-        const percentage = allProducts.length > 0 ? Math.round((count / allProducts.length) * 100) : 0;
-        html += `
-            <div class="distribution-item">
-                <span class="dist-label">${range}</span>
-                <div class="dist-bar-container">
-                    <div class="dist-bar" style="width: ${percentage}%; background-color: var(--secondary-color);"></div>
-                </div>
-                <span class="dist-value">${count} (${percentage}%)</span>
-            </div>
-        `;
-    }
-    html += '</div>';
-    
-    chartElement.innerHTML = html;
+    const url = window.URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = filename;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+    window.URL.revokeObjectURL(url);
 }
 
 // Выгрузка отчетов
 async function exportReport(type) {
     try {
+        const date = new Date().toISOString().split('T')[0];
         let reportData;
-        let filename;
-        let contentType;
+        
+        // Отчеты строятся по статистике сервера
+        if (!catalogStats && !(await loadStatistics())) return;
         
         switch(type) {
-            case 'products':
-                reportData = generateProductsReport();
-                filename = `products_report_${new Date().toISOString().split('T')[0]}.csv`;
-                contentType = 'text/csv;charset=utf-8;';
-                break;
+            case 'products': {
+                // Каталог целиком сервер отдает потоком, без загрузки в браузер
+                const a = document.createElement('a');
+                a.href = `${API_URL}/export/products`;
+                a.download = `products_report_${date}.csv`;
+                document.body.appendChild(a);
+                a.click();
+                document.body.removeChild(a);
+                showNotification('Отчет успешно выгружен', 'success');
+                return;
+            }
             case 'workshops':
                 reportData = generateWorkshopsReport();
-                filename = `workshops_report_${new Date().toISOString().split('T')[0]}.csv`;
-                contentType = 'text/csv;charset=utf-8;';
                 break;
             case 'materials':
                 reportData = generateMaterialsReport();
-                filename = `materials_report_${new Date().toISOString().split('T')[0]}.csv`;
-                contentType = 'text/csv;charset=utf-8;';
                 break;
             case 'full':
                 reportData = generateFullReport();
-                filename = `full_report_${new Date().toISOString().split('T')[0]}.csv`;
-                contentType = 'text/csv;charset=utf-8;';
                 break;
             case 'statistics':
                 reportData = generateStatisticsReport();
-                filename = `statistics_report_${new Date().toISOString().split('T')[0]}.csv`;
-                contentType = 'text/csv;charset=utf-8;';
                 break;
             default:
                 return;
         }
         
-        // Создаем Blob и скачиваем
-        const blob = new Blob(['\ufeff' + reportData], { 
-            type: contentType
-        });
-        
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = filename;
-        document.body.appendChild(a);
-        a.click();
-        document.body.removeChild(a);
-        window.URL.revokeObjectURL(url);
-        
+        downloadCsv(reportData, `${type}_report_${date}.csv`);
         showNotification('Отчет успешно выгружен', 'success');
         
     } catch (error) {
@@ -911,45 +877,6 @@ async function exportReport(type) {
     }
 }
 
-// Генерация отчета по продукции
-function generateProductsReport() {
-    let csvContent = '';
-    
-    // Заголовки
-    const headers = [
-        'ID', 'Артикул', 'Наименование', 'Тип продукции', 'Материал', 
-        'Цена (руб)', 'Параметр 1', 'Параметр 2', 'Количество цехов', 
-        'Общее время (ч)', 'Дата создания', 'Дата обновления'
-    ];
-    
-    csvContent += headers.join(';') + "\n";
-    
-    // Данные
-    allProducts.forEach(product => {
-        const totalTime = product.workshops ? 
-            product.workshops.reduce((sum, w) => sum + w.processing_time, 0) : 0;
-        
-        const row = [
-            product.id,
-            product.article,
-            product.product_name,
-            product.product_type?.type_name || '',
-            product.main_material?.material_name || '',
-            product.min_partner_price,
-            product.param1,
-            product.param2,
-            product.workshops?.length || 0,
-            totalTime,
-            new Date(product.created_at).toLocaleDateString('ru-RU'),
-            new Date(product.updated_at).toLocaleDateString('ru-RU')
-        ].map(cell => `"${cell}"`).join(';');
-        
-        csvContent += row + "\n";
-    });
-    
-    return csvContent;
-}
-
 // Генерация отчета по цехам
 function generateWorkshopsReport() {
     let csvContent = '';
@@ -984,16 +911,18 @@ function generateMaterialsReport() {
     const headers = ['ID', 'Материал', 'Потери (%)', 'Используется в товарах'];
     csvContent += headers.join(';') + "\n";
     
+    // Количество товаров по материалам - из статистики сервера
+    const materialCounts = Object.fromEntries(
+        catalogStats.material_distribution.map(item => [item.material, item.count])
+    );
+    
     // Данные
     materials.forEach(material => {
-        // Считаем количество товаров с этим материалом
-        const productCount = allProducts.filter(p => p.main_material_id === material.id).length;
-        
         const row = [
             material.id,
             material.material_name,
             material.loss_percentage,
-            productCount
+            materialCounts[material.material_name] || 0
         ].map(cell => `"${cell}"`).join(';');
         
         csvContent += row + "\n";
@@ -1002,43 +931,18 @@ function generateMaterialsReport() {
     return csvContent;
 }
 
-// Генерация полного отчета
+// Генерация полного отчета: показатели и распределения по всему каталогу
+// (список товаров целиком - в выгрузке "Товары")
 function generateFullReport() {
     let csvContent = '';
     
     // Раздел: Общая статистика
     csvContent += "ОТЧЕТ ПО МЕБЕЛЬНОЙ КОМПАНИИ\n\n";
     csvContent += "Общая статистика\n";
-    csvContent += `Всего товаров;${allProducts.length}\n`;
-    csvContent += `Всего цехов;${allWorkshops.length}\n`;
-    csvContent += `Всего типов продукции;${productTypes.length}\n`;
-    csvContent += `Всего материалов;${materials.length}\n\n`;
-    
-    // Раздел: Товары
-    csvContent += "Товары\n";
-    const productHeaders = ['Артикул', 'Наименование', 'Тип', 'Материал', 'Цена', 'Цехи', 'Общее время'];
-    csvContent += productHeaders.join(';') + "\n";
-    
-    allProducts.forEach(product => {
-        const workshopNames = product.workshops ? 
-            product.workshops.map(w => w.workshop_name).join(', ') : '';
-        const totalTime = product.workshops ? 
-            product.workshops.reduce((sum, w) => sum + w.processing_time, 0) : 0;
-        
-        const row = [
-            product.article,
-            product.product_name,
-            product.product_type?.type_name || '',
-            product.main_material?.material_name || '',
-            product.min_partner_price,
-            workshopNames,
-            totalTime
-        ].map(cell => `"${cell}"`).join(';');
-        
-        csvContent += row + "\n";
-    });
-    
-    csvContent += "\n";
+    csvContent += `Всего товаров;${catalogStats.total_products}\n`;
+    csvContent += `Всего цехов;${catalogStats.total_workshops}\n`;
+    csvContent += `Всего типов продукции;${catalogStats.total_types}\n`;
+    csvContent += `Всего материалов;${catalogStats.total_materials}\n\n`;
     
     // Раздел: Цехи
     csvContent += "Цехи\n";
@@ -1060,16 +964,13 @@ function generateFullReport() {
     
     // Раздел: Статистика
     csvContent += "\nСтатистика\n";
-    const prices = allProducts.map(p => parseFloat(p.min_partner_price));
-    const avgPrice = prices.length > 0 ? (prices.reduce((a, b) => a + b, 0) / prices.length).toFixed(2) : 0;
+    csvContent += `Средняя цена товара;${catalogStats.price_avg.toFixed(2)} ₽\n`;
+    csvContent += `Минимальная цена;${catalogStats.price_min.toFixed(2)} ₽\n`;
+    csvContent += `Максимальная цена;${catalogStats.price_max.toFixed(2)} ₽\n`;
+    csvContent += `Общее время производства всех товаров;${catalogStats.total_production_time} ч\n\n`;
     
-    csvContent += `Средняя цена товара;${avgPrice} ₽\n`;
-    csvContent += `Минимальная цена;${prices.length > 0 ? Math.min(...prices).toFixed(2) : 0} ₽\n`;
-    csvContent += `Максимальная цена;${prices.length > 0 ? Math.max(...prices).toFixed(2) : 0} ₽\n`;
-    csvContent += `Общее время производства всех товаров;${allProducts.reduce((sum, p) => {
-        const total = p.workshops ? p.workshops.reduce((s, w) => s + w.processing_time, 0) : 0;
-        return sum + total;
-    }, 0)} ч\n`;
+    // Раздел: Распределения
+    csvContent += generateStatisticsReport();
     
     return csvContent;
 }
@@ -1084,109 +985,112 @@ function generateStatisticsReport() {
     csvContent += "Распределение по типам продукции\n";
     csvContent += "Тип;Количество;Доля (%)\n";
     
-    const typeCounts = {};
-    allProducts.forEach(product => {
-        const typeName = product.product_type?.type_name || 'Не указан';
-        typeCounts[typeName] = (typeCounts[typeName] || 0) + 1;
+    catalogStats.type_distribution.forEach(item => {
+        csvContent += `${item.type};${item.count};${catalogShare(item.count, 2)}\n`;
     });
     
-    for (const [typeName, count] of Object.entries(typeCounts)) {
-        const percentage = allProducts.length > 0 ? ((count / allProducts.length) * 100).toFixed(2) : 0;
-        csvContent += `${typeName};${count};${percentage}\n`;
-    }
-    
     csvContent += "\n";
     
     // Распределение по материалам
     csvContent += "Распределение по материалам\n";
     csvContent += "Материал;Количество;Доля (%)\n";
     
-    const materialCounts = {};
-    allProducts.forEach(product => {
-        const materialName = product.main_material?.material_name || 'Не указан';
-        materialCounts[materialName] = (materialCounts[materialName] || 0) + 1;
+    catalogStats.material_distribution.forEach(item => {
+        csvContent += `${item.material};${item.count};${catalogShare(item.count, 2)}\n`;
     });
     
-    for (const [materialName, count] of Object.entries(materialCounts)) {
-        const percentage = allProducts.length > 0 ? ((count / allProducts.length) * 100).toFixed(2) : 0;
-        csvContent += `${materialName};${count};${percentage}\n`;
-    }
-    
     csvContent += "\n";
     
     // Распределение по ценам
     csvContent += "Распределение по ценовым диапазонам\n";
     csvContent += "Диапазон цен;Количество;Доля (%)\n";
     
-    const priceRanges = {
-        'До 5,000 ₽': 0,
-        '5,000 - 10,000 ₽': 0,
-        '10,000 - 20,000 ₽': 0,
-        '20,000 - 50,000 ₽': 0,
-        'Свыше 50,000 ₽': 0
-    };
-    
-    allProducts.forEach(product => {
-        const price = parseFloat(product.min_partner_price);
-        if (price < 5000) priceRanges['До 5,000 ₽']++;
-        else if (price < 10000) priceRanges['5,000 - 10,000 ₽']++;
-        else if (price < 20000) priceRanges['10,000 - 20,000 ₽']++;
-        else if (price < 50000) priceRanges['20,000 - 50,000 ₽']++;
-        else priceRanges['Свыше 50,000 ₽']++;
+    catalogStats.price_distribution.forEach(range => {
+        csvContent += `${formatPriceRange(range)};${range.count};${catalogShare(range.count, 2)}\n`;
     });
     
-    for (const [range, count] of Object.entries(priceRanges)) {
-        const percentage = allProducts.length > 0 ? ((count / allProducts.length) * 100).toFixed(2) : 0;
-        csvContent += `${range};${count};${percentage}\n`;
-    }
-    
     return csvContent;
 }
 
-// Настройка кнопок выгрузки отчетов
+// Настройка кнопок выгрузки отчетов (onclick, чтобы повторные вызовы не добавляли обработчики)
 function setupReportExportButtons() {
     const exportButtons = document.querySelectorAll('[data-export]');
     exportButtons.forEach(button => {
-        button.addEventListener('click', (e) => {
+        button.onclick = (e) => {
             e.preventDefault();
             const reportType = button.getAttribute('data-export');
             exportReport(reportType);
-        });
+        };
     });
 }
 
+// Строки пользовательского отчета: тип и материал фильтруются на сервере,
+// страницы идут от новых товаров к старым, поэтому выборка останавливается,
+// как только дата создания стала раньше начала периода
+async function fetchReportProducts(productType, material, fromDate, toDate) {
+    const products = [];
+    let cursor = null;
+    
+    while (products.length < CUSTOM_REPORT_MAX_ROWS) {
+        const params = new URLSearchParams({
+            sort: 'created_at',
+            order: 'desc',
+            limit: REPORT_PAGE_SIZE
+        });
+        if (productType) params.set('type_id', productType);
+        if (material) params.set('material_id', material);
+        if (cursor) params.set('cursor', cursor);
+        
+        const response = await fetch(`${API_URL}/products?${params}`);
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Неизвестная ошибка');
+        }
+        
+        const page = await response.json();
+        for (const product of page.data) {
+            const created = new Date(product.created_at);
+            if (fromDate && created < fromDate) return { products, truncated: false };
+            if (toDate && created > toDate) continue;
+            products.push(product);
+        }
+        
+        cursor = page.next_cursor;
+        if (!cursor) return { products, truncated: false };
+    }
+    
+    return { products: products.slice(0, CUSTOM_REPORT_MAX_ROWS), truncated: true };
+}
+
 // Генерация пользовательских отчетов
-function generateCustomReport() {
+async function generateCustomReport() {
     const productType = document.getElementById('report-product-type').value;
     const material = document.getElementById('report-material').value;
     const dateFrom = document.getElementById('report-date-from').value;
     const dateTo = document.getElementById('report-date-to').value;
     
-    let filteredProducts = allProducts;
-    
-    if (productType) {
-        filteredProducts = filteredProducts.filter(p => p.product_type_id == productType);
-    }
-    
-    if (material) {
-        filteredProducts = filteredProducts.filter(p => p.main_material_id == material);
-    }
-    
-    if (dateFrom) {
-        const fromDate = new Date(dateFrom);
-        filteredProducts = filteredProducts.filter(p => new Date(p.created_at) >= fromDate);
-    }
+    const typeNames = Object.fromEntries(productTypes.map(t => [t.id, t.type_name]));
+    const materialNames = Object.fromEntries(materials.map(m => [m.id, m.material_name]));
     
-    if (dateTo) {
-        const toDate = new Date(dateTo);
-        filteredProducts = filteredProducts.filter(p => new Date(p.created_at) <= toDate);
+    let result;
+    try {
+        result = await fetchReportProducts(
+            productType, material,
+            dateFrom ? new Date(dateFrom) : null,
+            dateTo ? new Date(dateTo) : null
+        );
+    } catch (error) {
+        console.error('Ошибка формирования отчета:', error);
+        showNotification(`Ошибка формирования отчета: ${error.message}`, 'error');
+        return;
     }
+    const filteredProducts = result.products;
     
     // Генерируем отчет
     let csvContent = "ПОЛЬЗОВАТЕЛЬСКИЙ ОТЧЕТ\n\n";
     csvContent += `Параметры отчета:\n`;
-    csvContent += `Тип продукции: ${productType ? productTypes.find(t => t.id == productType)?.type_name : 'Все'}\n`;
-    csvContent += `Материал: ${material ? materials.find(m => m.id == material)?.material_name : 'Все'}\n`;
+    csvContent += `Тип продукции: ${productType ? typeNames[productType] : 'Все'}\n`;
+    csvContent += `Материал: ${material ? materialNames[material] : 'Все'}\n`;
     csvContent += `Период: ${dateFrom || 'Начало'} - ${dateTo || 'Конец'}\n\n`;
     
     csvContent += "Результаты:\n";
@@ -1198,31 +1102,23 @@ function generateCustomReport() {
             product.article,
             product.product_name,
             product.min_partner_price,
-            product.product_type?.type_name || '',
-            product.main_material?.material_name || '',
+            typeNames[product.product_type_id] || '',
+            materialNames[product.main_material_id] || '',
             new Date(product.created_at).toLocaleDateString('ru-RU')
         ].map(cell => `"${cell}"`).join(';');
         
         csvContent += row + "\n";
     });
     
+    if (result.truncated) {
+        csvContent += `\nПоказаны первые ${CUSTOM_REPORT_MAX_ROWS} товаров; полный список - в выгрузке "Товары"\n`;
+    }
     csvContent += `\nИтого: ${filteredProducts.length} товаров\n`;
     const totalValue = filteredProducts.reduce((sum, p) => sum + parseFloat(p.min_partner_price), 0);
     csvContent += `Общая стоимость: ${totalValue.toFixed(2)} ₽\n`;
     
     // Скачиваем отчет
-    const blob = new Blob(['\ufeff' + csvContent], { 
-        type: 'text/csv;charset=utf-8;'
-    });
-    
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = `custom_report_${new Date().toISOString().split('T')[0]}.csv`;
-    document.body.appendChild(a);
-    a.click();
-    document.body.removeChild(a);
-    window.URL.revokeObjectURL(url);
+    downloadCsv(csvContent, `custom_report_${new Date().toISOString().split('T')[0]}.csv`);
     
     showNotification('Пользовательский отчет успешно сгенерирован', 'success');
 }
@@ -1248,10 +1144,8 @@ function showPage(pageId) {
     }
     
     // Загружаем данные для страницы, если нужно
-    if (pageId === 'reports') {
-        updateReports();
-    } else if (pageId === 'dashboard') {
-        updateDashboard();
+    if (pageId === 'reports' || pageId === 'dashboard') {
+        loadStatistics();
     }
     
     // Скрываем модальные окна при переключении страниц
@@ -1276,6 +1170,13 @@ async function backupDatabase() {
             window.URL.revokeObjectURL(url);
             
             showNotification('Резервная копия создана успешно', 'success');
+        } else {
+            // 409 - другая копия еще создается, 500 - копия не создана
+            const error = await response.json().catch(() => ({}));
+            showNotification(
+                `Ошибка создания резервной копии: ${error.detail || response.statusText}`,
+                'error'
+            );
         }
     } catch (error) {
         console.error('Ошибка создания резервной копии:', error);
@@ -1302,7 +1203,12 @@ async function importData() {
         });
         
         if (response.ok) {
-            showNotification('Данные успешно импортированы', 'success');
+            const result = await response.json();
+            const message = `Импортировано: ${result.imported}, с ошибками: ${result.failed}`;
+            showNotification(message, result.failed ? 'warning' : 'success');
+            if (result.errors && result.errors.length) {
+                console.warn('Ошибки импорта:', result.errors);
+            }
             await loadData(); // Перезагружаем данные
             fileInput.value = ''; // Сбрасываем выбор файла
         } else {
@@ -1,6 +1,12 @@
+import argparse
+import os
 import sqlite3
 import random
+import sys
+import time
 from datetime import datetime, timedelta
+from itertools import combinations
+from multiprocessing import Pool
 from pathlib import Path
 
 
@@ -30,14 +36,14 @@ MATERIALS = [
 ]
 
 WORKSHOPS = [
-    {"id": 1, "name": "Цех распиловки", "time": 2},
-    {"id": 2, "name": "Цех шлифовки", "time": 3},
-    {"id": 3, "name": "Цех сборки", "time": 5},
-    {"id": 4, "name": "Цех покраски", "time": 4},
-    {"id": 5, "name": "Цех упаковки", "time": 1},
-    {"id": 6, "name": "Цех фрезеровки", "time": 3},
-    {"id": 7, "name": "Цех лакировки", "time": 4},
-    {"id": 8, "name": "Цех фурнитуры", "time": 2}
+    {"id": 1, "name": "Цех распиловки", "workers": 8, "time": 2},
+    {"id": 2, "name": "Цех шлифовки", "workers": 6, "time": 3},
+    {"id": 3, "name": "Цех сборки", "workers": 10, "time": 5},
+    {"id": 4, "name": "Цех покраски", "workers": 7, "time": 4},
+    {"id": 5, "name": "Цех упаковки", "workers": 4, "time": 1},
+    {"id": 6, "name": "Цех фрезеровки", "workers": 5, "time": 3},
+    {"id": 7, "name": "Цех лакировки", "workers": 6, "time": 4},
+    {"id": 8, "name": "Цех фурнитуры", "workers": 3, "time": 2}
 ]
 
 
@@ -74,7 +80,7 @@ WARDROBE_NAMES = [
     "Шкаф встроенный 'Стиль'"
 ]
 
-CHAIR_NAMES = [
+ARMCHAIR_NAMES = [
     "Кресло офисное 'Комфорт'",
     "Кресло качалка 'Релакс'",
     "Кресло компьютерное 'Геймер'",
@@ -129,138 +135,300 @@ RACK_NAMES = [
     "Стеллаж модульный 'Система'"
 ]
 
-ALL_PRODUCT_NAMES = CHAIR_NAMES + TABLE_NAMES + WARDROBE_NAMES + CHAIR_NAMES + CHEST_NAMES + CABINET_NAMES + SHELF_NAMES + RACK_NAMES
-
-def generate_articles(start_num=1, count=200):
-    """Генерация артикулов"""
-    articles = []
-    for i in range(start_num, start_num + count):
-        if i <= 12:
-            articles.append(f"CHAIR-{i:03d}")
-        elif i <= 24:
-            articles.append(f"TABLE-{i-12:03d}")
-        elif i <= 36:
-            articles.append(f"WARD-{i-24:03d}")
-        elif i <= 48:
-            articles.append(f"CRSL-{i-36:03d}")
-        else:
-            articles.append(f"COMP-{i-48:03d}")
-    return articles
-
-def get_product_name(article, product_type_id):
-    """Получить название товара на основе артикула и типа"""
-    if "CHAIR" in article:
-        names = CHAIR_NAMES if product_type_id == 1 else CHAIR_NAMES
-    elif "TABLE" in article:
-        names = TABLE_NAMES
-    elif "WARD" in article:
-        names = WARDROBE_NAMES
-    elif "CRSL" in article:
-        names = CHAIR_NAMES
-    else:
-        names = random.choice([CHEST_NAMES, CABINET_NAMES, SHELF_NAMES, RACK_NAMES])
-    
-    return random.choice(names)
+# Названия и префиксы артикулов по типам продукции
+NAMES_BY_TYPE = {
+    1: CHAIR_NAMES,
+    2: TABLE_NAMES,
+    3: WARDROBE_NAMES,
+    4: ARMCHAIR_NAMES,
+    5: CHEST_NAMES,
+    6: CABINET_NAMES,
+    7: SHELF_NAMES,
+    8: RACK_NAMES
+}
+
+ARTICLE_PREFIXES = {
+    1: "CHAIR",
+    2: "TABLE",
+    3: "WARD",
+    4: "CRSL",
+    5: "CHEST",
+    6: "CAB",
+    7: "SHELF",
+    8: "RACK"
+}
+
+# Диапазоны размеров (param1, param2) и цен по типам продукции
+PRODUCT_RANGES = {
+    1: ((0.4, 0.6), (0.4, 0.6), (2500, 8500)),     # Стул
+    2: ((0.8, 1.6), (0.6, 1.0), (7500, 25000)),    # Стол
+    3: ((1.2, 2.4), (0.4, 0.8), (15000, 50000)),   # Шкаф
+    4: ((0.6, 0.9), (0.6, 0.9), (5000, 15000)),    # Кресло
+}
+DEFAULT_RANGES = ((0.5, 1.5), (0.3, 0.8), (3000, 20000))  # Другая мебель
+
+# Технологический порядок цехов: маршрут продукта - подпоследовательность
+# этого порядка, которая всегда начинается распиловкой и заканчивается упаковкой
+PROCESS_FLOW = [1, 6, 2, 3, 8, 4, 7, 5]
+FIRST_WORKSHOP = PROCESS_FLOW[0]
+LAST_WORKSHOP = PROCESS_FLOW[-1]
+
+# Даты создания отсчитываются от фиксированной даты, чтобы результат
+# зависел только от seed
+BASE_DATE = datetime(2025, 1, 1)
+DATE_RANGE_DAYS = 180
+
+# Сколько продуктов генерирует одна задача рабочего процесса
+GENERATION_CHUNK_SIZE = 50_000
+
+# Допустимый размер каталога в режиме сборки
+MIN_BUILD_COUNT = 1
+MAX_BUILD_COUNT = 10_000_000
+
+
+def make_article(number: int, product_type_id: int) -> str:
+    """Артикул вида CHAIR-00000042: номер уникален в пределах всего каталога"""
+    return f"{ARTICLE_PREFIXES.get(product_type_id, 'COMP')}-{number:08d}"
+
+
+def get_product_name(rng, product_type_id):
+    """Получить название товара по типу продукции"""
+    names = NAMES_BY_TYPE.get(product_type_id)
+    if names is None:
+        names = rng.choice([CHEST_NAMES, CABINET_NAMES, SHELF_NAMES, RACK_NAMES])
+    return rng.choice(names)
+
+
+def build_routes(workshop_ids):
+    """
+    Все допустимые маршруты, сгруппированные по числу промежуточных цехов.
+
+    Маршрут идет в технологическом порядке: распиловка, от одного до трех
+    промежуточных цехов, упаковка.
+    """
+    flow = [workshop_id for workshop_id in PROCESS_FLOW if workshop_id in workshop_ids]
+    head = [w for w in flow[:1] if w == FIRST_WORKSHOP]
+    tail = [w for w in flow[-1:] if w == LAST_WORKSHOP]
+    middle = [w for w in flow if w not in (FIRST_WORKSHOP, LAST_WORKSHOP)]
+
+    routes = {}
+    for size in range(min(1, len(middle)), min(3, len(middle)) + 1):
+        routes[size] = [head + list(steps) + tail for steps in combinations(middle, size)]
+    return routes
+
+
+def generate_route(rng, routes):
+    """Случайный маршрут: сначала число промежуточных цехов, затем их набор"""
+    return rng.choice(routes[rng.choice(list(routes))])
+
+
+def generate_product(rng, number, type_ids, material_ids):
+    """Одна строка products (без id) для порядкового номера number"""
+    product_type_id = rng.choice(type_ids)
+    (p1_min, p1_max), (p2_min, p2_max), (price_min, price_max) = \
+        PRODUCT_RANGES.get(product_type_id, DEFAULT_RANGES)
+
+    created_at = BASE_DATE + timedelta(seconds=rng.randrange(DATE_RANGE_DAYS * 86400))
+    created_at = created_at.strftime("%Y-%m-%d %H:%M:%S")
+
+    return (
+        make_article(number, product_type_id),
+        product_type_id,
+        get_product_name(rng, product_type_id),
+        round(rng.uniform(price_min, price_max), 2),
+        rng.choice(material_ids),
+        round(rng.uniform(p1_min, p1_max), 2),
+        round(rng.uniform(p2_min, p2_max), 2),
+        created_at,
+        created_at
+    )
+
+
+def generate_chunk(task):
+    """
+    Сгенерировать продукты с номерами [start, start + count).
+
+    Генератор случайных чисел зависит только от seed и номера порции,
+    поэтому результат не зависит от числа рабочих процессов.
+    Возвращает строки products (с явными id) и строки production_schedule.
+    """
+    seed, chunk_index, start, count, type_ids, material_ids, workshop_ids = task
+    rng = random.Random(f"{seed}:{chunk_index}")
+
+    routes = build_routes(workshop_ids)
+
+    products = []
+    schedule = []
+    for number in range(start, start + count):
+        products.append((number,) + generate_product(rng, number, type_ids, material_ids))
+        for order, workshop_id in enumerate(generate_route(rng, routes), 1):
+            schedule.append((number, workshop_id, order))
+
+    return products, schedule
+
+
+def load_backend():
+    """Импорт миграций схемы БД из backend/migrations.py"""
+    sys.path.insert(0, str(Path(__file__).parent / "backend"))
+    import migrations
+    return migrations
+
+
+def seed_reference_data(conn):
+    """Справочники генератора: типы продукции, материалы и цехи"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO product_types (id, type_name, production_coefficient) VALUES (?, ?, ?)",
+        [(t["id"], t["name"], t["coefficient"]) for t in PRODUCT_TYPES]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO materials (id, material_name, loss_percentage) VALUES (?, ?, ?)",
+        [(m["id"], m["name"], m["loss"]) for m in MATERIALS]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO workshops (id, workshop_name, worker_count, processing_time) VALUES (?, ?, ?, ?)",
+        [(w["id"], w["name"], w["workers"], w["time"]) for w in WORKSHOPS]
+    )
+
+
+def build_database(db_path, count, seed=42, workers=None, force=False):
+    """
+    Собрать новую базу данных с count продуктами (режим нагрузочного тестирования).
+
+    Схема создается миграциями backend/migrations.py. Данные генерируются порциями в
+    нескольких процессах, а вставляются одним соединением через executemany
+    без журнала и индексов. Индексы, агрегаты статистики и их триггеры
+    создаются после загрузки. Один и тот же seed дает одинаковую базу.
+    """
+    if not MIN_BUILD_COUNT <= count <= MAX_BUILD_COUNT:
+        raise ValueError(f"Количество продуктов должно быть от {MIN_BUILD_COUNT} до {MAX_BUILD_COUNT}")
+
+    db_path = Path(db_path)
+    if db_path.exists():
+        if not force:
+            raise FileExistsError(f"Файл {db_path} уже существует (используйте --force)")
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            leftover = Path(str(db_path) + suffix)
+            if leftover.exists():
+                leftover.unlink()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    migrations = load_backend()
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
 
-def generate_products(count=200):
-    """Генерация тестовых товаров"""
+    conn = sqlite3.connect(str(db_path))
+    # База собирается с нуля: при сбое ее просто пересоздают
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+
+    # Сначала только таблицы (миграция 1): индексы и триггеры - после загрузки
+    migrations.migrate(conn, target=1)
+    seed_reference_data(conn)
+    conn.commit()
+
+    type_ids = [t["id"] for t in PRODUCT_TYPES]
+    material_ids = [m["id"] for m in MATERIALS]
+    workshop_ids = [w["id"] for w in WORKSHOPS]
+    tasks = [
+        (seed, index, start, min(GENERATION_CHUNK_SIZE, count + 1 - start),
+         type_ids, material_ids, workshop_ids)
+        for index, start in enumerate(range(1, count + 1, GENERATION_CHUNK_SIZE))
+    ]
+
+    print(f"🔧 Генерация {count} продуктов (seed={seed}, процессов: {workers})...")
+    inserted = 0
+    schedule_rows = 0
+    with Pool(processes=workers) as pool:
+        # imap сохраняет порядок порций: id и содержимое не зависят от числа процессов
+        for products, schedule in pool.imap(generate_chunk, tasks):
+            conn.execute("BEGIN")
+            conn.executemany("""
+                INSERT INTO products 
+                (id, article, product_type_id, product_name, min_partner_price, 
+                 main_material_id, param1, param2, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, products)
+            conn.executemany("""
+                INSERT INTO production_schedule (product_id, workshop_id, processing_order)
+                VALUES (?, ?, ?)
+            """, schedule)
+            conn.commit()
+
+            inserted += len(products)
+            schedule_rows += len(schedule)
+            print(f"   ... {inserted}/{count}", end="\r", flush=True)
+
+    loaded = time.perf_counter()
+    print(f"\n📦 Загружено {inserted} продуктов и {schedule_rows} строк графика "
+          f"за {loaded - started:.1f} с")
+
+    print("🔧 Создание индексов, агрегатов статистики и полнотекстового индекса...")
+    migrations.migrate(conn)
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+
+    print(f"✅ База {db_path} собрана за {time.perf_counter() - started:.1f} с")
+    return inserted
+
+
+def generate_products(count=200, seed=None):
+    """Дополнить текущую базу тестовыми товарами до count штук"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    
-    
+
     cursor.execute("SELECT COUNT(*) FROM products")
     existing_count = cursor.fetchone()[0]
-    
+
     if existing_count >= count:
         print(f"✅ В базе уже есть {existing_count} товаров")
+        conn.close()
         return
-    
-    articles = generate_articles(existing_count + 1, count)
-    
-    inserted_count = 0
-    for i, article in enumerate(articles):
-        try:
-            
-            if "CHAIR" in article:
-                product_type_id = 1  
-            elif "TABLE" in article:
-                product_type_id = 2  
-            elif "WARD" in article:
-                product_type_id = 3  
-            elif "CRSL" in article:
-                product_type_id = 4  
-            else:
-                product_type_id = random.randint(5, 8)  
-            
-            product_name = get_product_name(article, product_type_id)
-            material_id = random.randint(1, len(MATERIALS))
-            
-           
-            if product_type_id == 1:  # Стул
-                param1 = round(random.uniform(0.4, 0.6), 2)  
-                param2 = round(random.uniform(0.4, 0.6), 2)  
-                price = round(random.uniform(2500, 8500), 2)
-            elif product_type_id == 2:  # Стол
-                param1 = round(random.uniform(0.8, 1.6), 2)  
-                param2 = round(random.uniform(0.6, 1.0), 2)  
-                price = round(random.uniform(7500, 25000), 2)
-            elif product_type_id == 3:  # Шкаф
-                param1 = round(random.uniform(1.2, 2.4), 2)  
-                param2 = round(random.uniform(0.4, 0.8), 2)  
-                price = round(random.uniform(15000, 50000), 2)
-            elif product_type_id == 4:  # Кресло
-                param1 = round(random.uniform(0.6, 0.9), 2)  
-                param2 = round(random.uniform(0.6, 0.9), 2)  
-                price = round(random.uniform(5000, 15000), 2)
-            else:  # Другая мебель
-                param1 = round(random.uniform(0.5, 1.5), 2)
-                param2 = round(random.uniform(0.3, 0.8), 2)
-                price = round(random.uniform(3000, 20000), 2)
-            
-           
-            days_ago = random.randint(0, 180)
-            created_date = datetime.now() - timedelta(days=days_ago)
-            
-            
-            cursor.execute("""
-                INSERT INTO products 
-                (article, product_type_id, product_name, min_partner_price, 
-                 main_material_id, param1, param2, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                article, product_type_id, product_name, price,
-                material_id, param1, param2,
-                created_date, created_date
-            ))
-            
-            product_id = cursor.lastrowid
-            
-            
-            workshop_count = random.randint(1, 4)
-            selected_workshops = random.sample(range(1, len(WORKSHOPS) + 1), workshop_count)
-            
-            for order, workshop_id in enumerate(selected_workshops, 1):
-                cursor.execute("""
-                    INSERT INTO production_schedule (product_id, workshop_id, processing_order)
-                    VALUES (?, ?, ?)
-                """, (product_id, workshop_id, order))
-            
-            inserted_count += 1
-            
-            print(f"✅ Добавлен товар: {article} - {product_name}")
-            
-        except Exception as e:
-            print(f"❌ Ошибка при добавлении товара {article}: {e}")
-    
+
+    # Используем только те справочники, которые действительно есть в базе
+    type_ids = [row[0] for row in cursor.execute("SELECT id FROM product_types ORDER BY id")]
+    material_ids = [row[0] for row in cursor.execute("SELECT id FROM materials ORDER BY id")]
+    workshop_ids = [row[0] for row in cursor.execute("SELECT id FROM workshops ORDER BY id")]
+    start_number = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM products").fetchone()[0]
+
+    rng = random.Random(seed)
+    routes = build_routes(workshop_ids)
+    products = []
+    product_routes = []
+    for number in range(start_number, start_number + count - existing_count):
+        products.append(generate_product(rng, number, type_ids, material_ids))
+        product_routes.append(generate_route(rng, routes))
+
+    cursor.executemany("""
+        INSERT INTO products 
+        (article, product_type_id, product_name, min_partner_price, 
+         main_material_id, param1, param2, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, products)
+
+    # id новых строк идут подряд и заканчиваются last_insert_rowid()
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(products) + 1
+    cursor.executemany("""
+        INSERT INTO production_schedule (product_id, workshop_id, processing_order)
+        VALUES (?, ?, ?)
+    """, [
+        (first_id + index, workshop_id, order)
+        for index, route in enumerate(product_routes)
+        for order, workshop_id in enumerate(route, 1)
+    ])
+
     conn.commit()
     conn.close()
-    
-    print(f"\n🎉 Успешно добавлено {inserted_count} товаров!")
-    print(f"📊 Всего товаров в базе: {existing_count + inserted_count}")
 
-def check_database():
+    print(f"\n🎉 Успешно добавлено {len(products)} товаров!")
+    print(f"📊 Всего товаров в базе: {existing_count + len(products)}")
+
+def check_database(db_path=DB_PATH):
     """Проверка состояния базы данных"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     print("\n📊 Проверка базы данных:")
@@ -290,14 +458,41 @@ def check_database():
     
     conn.close()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Генератор тестовых товаров для мебельной компании")
+    parser.add_argument("--build", action="store_true",
+                        help="собрать новую базу для нагрузочного тестирования")
+    parser.add_argument("--count", type=int, default=None,
+                        help="количество товаров (по умолчанию 200, в режиме --build 100000)")
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора случайных чисел")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="число процессов генерации (по умолчанию - число ядер)")
+    parser.add_argument("--db", type=Path, default=None,
+                        help="путь к собираемой базе (по умолчанию database/furniture_load.db)")
+    parser.add_argument("--force", action="store_true", help="перезаписать существующую базу")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    
     print("=" * 60)
     print("🎯 Генератор тестовых товаров для мебельной компании")
     print("=" * 60)
     
-    generate_products(200)
-    
-    check_database()
-    
-    print("\n✅ Генерация завершена!")
-    print(f"🌐 Откройте http://localhost:8000 для просмотра товаров")
\ No newline at end of file
+    if args.build:
+        db_path = args.db or DB_PATH.with_name("furniture_load.db")
+        try:
+            build_database(db_path, args.count or 100_000, seed=args.seed,
+                           workers=args.workers, force=args.force)
+        except (ValueError, FileExistsError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        check_database(db_path)
+        print(f"\n🌐 Запуск сервера на этой базе: FURNITURE_DB_PATH={db_path} python run.py")
+    else:
+        generate_products(args.count or 200, seed=args.seed)
+        
+        check_database()
+        
+        print("\n✅ Генерация завершена!")
+        print(f"🌐 Откройте http://localhost:8000 для просмотра товаров")
@@ -1,12 +1,98 @@
+import itertools
 import math
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple
+
+# NumPy нужен только для пакетного расчета и импортируется при первом
+# обращении, чтобы не замедлять запуск сервера
+if TYPE_CHECKING:
+    import numpy as np
+
+# Путь к базе данных по умолчанию - тот же, что у backend
+# (можно переопределить через FURNITURE_DB_PATH)
+DEFAULT_DB_PATH = Path(
+    os.environ.get(
+        "FURNITURE_DB_PATH",
+        Path(__file__).parent.parent / "database" / "furniture.db"
+    )
+)
+
+# Как часто (в секундах) проверять, не изменились ли коэффициенты в БД
+# (только без Database backend - с ним изменения отслеживает его ChangeWatcher)
+COEFFICIENTS_CHECK_INTERVAL = 1.0
+
+# Сколько строк заказов передавать в SQLite за один executemany
+ORDER_BOOK_CHUNK_SIZE = 10000
+
+# Сколько ненайденных и нерассчитанных продуктов перечислять в сводке
+MAX_REPORTED_MISSING = 1000
+
+# Потребность в сырье по книге заказов: один проход по продуктам с
+# коэффициентами типов, сгруппированный по основному материалу.
+# Строки, которые сюда не попали, перечисляет ORDER_BOOK_UNRESOLVED_SQL.
+ORDER_BOOK_REQUIREMENTS_SQL = """
+    SELECT
+        m.id AS material_id,
+        m.material_name,
+        m.loss_percentage,
+        COUNT(*) AS products,
+        SUM(o.quantity) AS quantity,
+        SUM(p.param1 * p.param2 * pt.production_coefficient * o.quantity) AS material_net
+    FROM temp.order_book o
+    JOIN products p ON p.id = o.product_id
+    JOIN product_types pt ON pt.id = p.product_type_id
+    JOIN materials m ON m.id = p.main_material_id
+    GROUP BY m.id
+    ORDER BY m.id
+"""
+
+# Строки книги заказов, для которых потребность не рассчитана: продукта
+# нет, либо его тип продукции или основной материал не найден
+ORDER_BOOK_UNRESOLVED_SQL = """
+    SELECT
+        o.product_id,
+        o.quantity,
+        p.id IS NOT NULL AS product_found,
+        p.product_type_id,
+        p.main_material_id,
+        pt.id IS NOT NULL AS type_found,
+        m.id IS NOT NULL AS material_found
+    FROM temp.order_book o
+    LEFT JOIN products p ON p.id = o.product_id
+    LEFT JOIN product_types pt ON pt.id = p.product_type_id
+    LEFT JOIN materials m ON m.id = p.main_material_id
+    WHERE p.id IS NULL OR pt.id IS NULL OR m.id IS NULL
+    ORDER BY o.product_id
+"""
 
 class MaterialCalculator:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, check_interval: float = COEFFICIENTS_CHECK_INTERVAL,
+                 database=None):
         if db_path is None:
-            db_path = Path(__file__).parent.parent / "database" / "furniture.db"
+            db_path = database.db_path if database is not None else DEFAULT_DB_PATH
         self.db_path = db_path
+        self.check_interval = check_interval
+        
+        # Общий Database backend: запросы по книге заказов идут через его
+        # пул соединений (с его PRAGMA), а не через отдельное подключение
+        self.database = database
+        
+        # Кэш коэффициентов: перечитывается, только если изменилась БД.
+        # С Database - по поколению его ChangeWatcher (записи этого процесса
+        # видны сразу), без него - по PRAGMA data_version на отдельном
+        # соединении калькулятора
+        self._lock = threading.Lock()
+        self._watch_conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._coefficients: Optional[dict] = None
+        self._arrays: Optional[tuple] = None
     
     def get_connection(self):
         """Создает соединение с базой данных"""
@@ -14,6 +100,103 @@ class MaterialCalculator:
         conn.row_factory = sqlite3.Row
         return conn
     
+    @contextmanager
+    def _order_book_connection(self):
+        """
+        Соединение для расчета книги заказов.
+        
+        Временная таблица создается в открытой транзакции, которая в конце
+        откатывается: в соединении из пула Database не остается ни
+        таблицы, ни транзакции.
+        """
+        if self.database is None:
+            conn = self.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        
+        with self.database.get_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+    
+    def invalidate(self):
+        """Сбросить кэш коэффициентов (перечитать при следующем расчете)"""
+        with self._lock:
+            self._coefficients = None
+    
+    def get_coefficients(self) -> dict:
+        """
+        Коэффициенты типов продукции и проценты потерь материалов.
+        
+        Возвращает словарь:
+            "production_coefficient": {id типа: коэффициент}
+            "loss_percentage": {id материала: процент потерь}
+        """
+        if self.database is not None:
+            return self._reference_coefficients()
+        
+        coefficients = self._coefficients
+        if coefficients is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return coefficients
+        
+        with self._lock:
+            if self._watch_conn is None:
+                self._watch_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            
+            conn = self._watch_conn
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            
+            if self._coefficients is None or data_version != self._data_version:
+                types = conn.execute(
+                    "SELECT id, production_coefficient FROM product_types"
+                ).fetchall()
+                materials = conn.execute(
+                    "SELECT id, loss_percentage FROM materials"
+                ).fetchall()
+                
+                self._coefficients = {
+                    "production_coefficient": dict(types),
+                    "loss_percentage": dict(materials),
+                }
+                self._data_version = data_version
+            
+            self._checked_at = time.monotonic()
+            return self._coefficients
+    
+    def _reference_coefficients(self) -> dict:
+        """Коэффициенты из кэша справочников Database (по поколению его ChangeWatcher)"""
+        generation = self.database.watcher.generation()
+        coefficients = self._coefficients
+        if coefficients is not None and generation == self._generation:
+            return coefficients
+        
+        reference = self.database.reference
+        coefficients = {
+            "production_coefficient": {
+                row["id"]: row["production_coefficient"] for row in reference.product_types()
+            },
+            "loss_percentage": {
+                row["id"]: row["loss_percentage"] for row in reference.materials()
+            },
+        }
+        with self._lock:
+            self._coefficients = coefficients
+            self._generation = generation
+        return coefficients
+    
+    def close(self):
+        """Закрыть служебное соединение калькулятора"""
+        with self._lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+                self._watch_conn = None
+            self._coefficients = None
+    
     def calculate_raw_material_needed(self, product_type_id: int, material_type_id: int, 
                                     quantity: int, param1: float, param2: float) -> int:
         """
@@ -32,55 +215,218 @@ class MaterialCalculator:
             if quantity <= 0 or param1 <= 0 or param2 <= 0:
                 return -1
             
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Получаем коэффициент типа продукции
-                cursor.execute(
-                    "SELECT production_coefficient FROM product_types WHERE id = ?",
-                    (product_type_id,)
-                )
-                product_type = cursor.fetchone()
-                
-                if not product_type:
-                    return -1
-                
-                production_coefficient = product_type['production_coefficient']
-                
-                # Получаем процент потерь для материала
-                cursor.execute(
-                    "SELECT loss_percentage FROM materials WHERE id = ?",
-                    (material_type_id,)
-                )
-                material = cursor.fetchone()
-                
-                if not material:
-                    return -1
-                
-                loss_percentage = material['loss_percentage']
-                
-                # Расчет необходимого сырья
-                material_per_unit = param1 * param2 * production_coefficient
-                total_material_needed = material_per_unit * quantity
-                
-                # Учет потерь
-                material_with_loss = total_material_needed * (1 + loss_percentage / 100)
-                
-                # Округление вверх до целого числа
-                raw_material_needed = math.ceil(material_with_loss)
-                
-                return raw_material_needed
+            coefficients = self.get_coefficients()
+            
+            # Получаем коэффициент типа продукции
+            production_coefficient = coefficients["production_coefficient"].get(product_type_id)
+            if production_coefficient is None:
+                return -1
+            
+            # Получаем процент потерь для материала
+            loss_percentage = coefficients["loss_percentage"].get(material_type_id)
+            if loss_percentage is None:
+                return -1
+            
+            # Расчет необходимого сырья
+            material_per_unit = param1 * param2 * production_coefficient
+            total_material_needed = material_per_unit * quantity
+            
+            # Учет потерь
+            material_with_loss = total_material_needed * (1 + loss_percentage / 100)
+            
+            # Округление вверх до целого числа
+            raw_material_needed = math.ceil(material_with_loss)
+            
+            return raw_material_needed
                 
         except Exception as e:
             print(f"Ошибка расчета: {e}")
             return -1
 
+    def calculate_order_book(self, orders: Iterable[Tuple[int, int]],
+                             chunk_size: int = ORDER_BOOK_CHUNK_SIZE) -> dict:
+        """
+        Суммарная потребность в сырье по книге заказов (MRP).
+        
+        orders - итерируемый поток пар (product_id, quantity); он читается
+        порциями по chunk_size и складывается во временную таблицу, где
+        повторяющиеся продукты сразу суммируются. Затем один запрос
+        соединяет продукты с их param1/param2, коэффициентом типа и основным
+        материалом и группирует потребность по материалам.
+        
+        Потери применяются к итогу по материалу:
+        ceil(sum(param1 * param2 * production_coefficient * quantity) * (1 + loss_percentage/100))
+        
+        Строки, которые не попали в итог, не теряются молча: отсутствующие
+        продукты перечисляются в "missing_products", а продукты с
+        ненайденным типом или материалом - в "unresolved" с причиной.
+        """
+        with self._order_book_connection() as conn:
+            conn.execute("""
+                CREATE TEMP TABLE order_book (
+                    product_id INTEGER PRIMARY KEY,
+                    quantity INTEGER NOT NULL
+                )
+            """)
+            
+            lines = 0
+            chunk: List[Tuple[int, int]] = []
+            orders = iter(orders)
+            while True:
+                chunk[:] = itertools.islice(orders, chunk_size)
+                if not chunk:
+                    break
+                lines += len(chunk)
+                conn.executemany("""
+                    INSERT INTO temp.order_book (product_id, quantity) VALUES (?, ?)
+                    ON CONFLICT(product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                """, chunk)
+            
+            materials = []
+            for row in conn.execute(ORDER_BOOK_REQUIREMENTS_SQL):
+                material_net = row["material_net"]
+                materials.append({
+                    "material_id": row["material_id"],
+                    "material_name": row["material_name"],
+                    "loss_percentage": row["loss_percentage"],
+                    "products": row["products"],
+                    "quantity": row["quantity"],
+                    "material_net": round(material_net, 4),
+                    "raw_material_needed": math.ceil(
+                        material_net * (1 + row["loss_percentage"] / 100)
+                    ),
+                })
+            
+            missing = []
+            unresolved = []
+            unresolved_quantity = 0
+            for row in conn.execute(ORDER_BOOK_UNRESOLVED_SQL):
+                if not row["product_found"]:
+                    missing.append(row["product_id"])
+                    continue
+                
+                reasons = []
+                if not row["type_found"]:
+                    reasons.append(f"тип продукции {row['product_type_id']} не найден")
+                if not row["material_found"]:
+                    reasons.append(f"материал {row['main_material_id']} не найден")
+                unresolved_quantity += row["quantity"]
+                unresolved.append({
+                    "product_id": row["product_id"],
+                    "quantity": row["quantity"],
+                    "product_type_id": row["product_type_id"],
+                    "main_material_id": row["main_material_id"],
+                    "reason": "; ".join(reasons),
+                })
+            products = conn.execute("SELECT COUNT(*) FROM temp.order_book").fetchone()[0]
+        
+        return {
+            "lines": lines,
+            "products": products,
+            "materials": materials,
+            "total_raw_material": sum(item["raw_material_needed"] for item in materials),
+            "missing_count": len(missing),
+            "missing_products": missing[:MAX_REPORTED_MISSING],
+            "unresolved_count": len(unresolved),
+            "unresolved_quantity": unresolved_quantity,
+            "unresolved": unresolved[:MAX_REPORTED_MISSING],
+        }
+
+    def load_coefficient_arrays(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Коэффициенты типов продукции и проценты потерь материалов в массивах,
+        где индекс элемента равен ID записи (NaN - записи нет).
+        
+        Массивы строятся при первом пакетном расчете после изменения
+        коэффициентов и хранятся вместе с ними.
+        """
+        coefficients = self.get_coefficients()
+        arrays = self._arrays
+        if arrays is None or arrays[0] is not coefficients:
+            arrays = (
+                coefficients,
+                _to_lookup_array(coefficients["production_coefficient"].items()),
+                _to_lookup_array(coefficients["loss_percentage"].items()),
+            )
+            self._arrays = arrays
+        return arrays[1], arrays[2]
+    
+    def calculate_raw_material_batch(
+            self, rows: Iterable[Sequence[float]]) -> List[int]:
+        """
+        Пакетный расчет сырья для множества позиций за один проход NumPy.
+        
+        Каждая строка: (product_type_id, material_type_id, quantity, param1, param2).
+        Для каждой строки возвращается то же значение, что и у
+        calculate_raw_material_needed: округленное вверх количество сырья
+        или -1, если параметры неверны или тип/материал не найден.
+        """
+        import numpy as np
+        
+        data = np.asarray(list(rows), dtype=np.float64).reshape(-1, 5)
+        if data.shape[0] == 0:
+            return []
+        
+        coefficients, losses = self.load_coefficient_arrays()
+        type_ids, material_ids, quantity, param1, param2 = data.T
+        
+        valid = (quantity > 0) & (param1 > 0) & (param2 > 0)
+        production_coefficient = _lookup(coefficients, type_ids)
+        loss_percentage = _lookup(losses, material_ids)
+        valid &= ~np.isnan(production_coefficient) & ~np.isnan(loss_percentage)
+        
+        # Тот же порядок операций, что и в calculate_raw_material_needed,
+        # чтобы результаты совпадали бит в бит
+        with np.errstate(invalid="ignore", over="ignore"):
+            material_per_unit = param1 * param2 * production_coefficient
+            total_material_needed = material_per_unit * quantity
+            material_with_loss = total_material_needed * (1 + loss_percentage / 100)
+            raw_material_needed = np.ceil(material_with_loss)
+        
+        valid &= np.isfinite(raw_material_needed)
+        result = np.where(valid, raw_material_needed, -1).astype(np.int64)
+        return result.tolist()
+
+
+def _to_lookup_array(rows) -> "np.ndarray":
+    """Преобразовать пары (id, значение) в массив с доступом по id"""
+    import numpy as np
+    
+    rows = list(rows)
+    size = max((row[0] for row in rows), default=0) + 1
+    array = np.full(size, np.nan)
+    for row_id, value in rows:
+        array[row_id] = value
+    return array
+
+
+def _lookup(array: "np.ndarray", ids: "np.ndarray") -> "np.ndarray":
+    """Выбрать значения по id; для несуществующих id возвращается NaN"""
+    import numpy as np
+    
+    known = (ids >= 0) & (ids < len(array)) & (ids == np.floor(ids))
+    index = np.where(known, ids, 0).astype(np.int64)
+    return np.where(known, array[index], np.nan)
+
+
+_default_calculator: Optional[MaterialCalculator] = None
+_default_calculator_lock = threading.Lock()
+
+def get_default_calculator() -> MaterialCalculator:
+    """Общий долгоживущий экземпляр калькулятора (с кэшем коэффициентов)"""
+    global _default_calculator
+    if _default_calculator is None:
+        with _default_calculator_lock:
+            if _default_calculator is None:
+                _default_calculator = MaterialCalculator()
+    return _default_calculator
+
 def calculate_raw_material_needed(product_type_id: int, material_type_id: int, 
                                 quantity: int, param1: float, param2: float) -> int:
     """
     Функция для использования из других модулей
     """
-    calculator = MaterialCalculator()
+    calculator = get_default_calculator()
     return calculator.calculate_raw_material_needed(
         product_type_id, material_type_id, quantity, param1, param2
     )
@@ -4,35 +4,46 @@
 Объединяет backend, frontend и базу данных.
 """
 
+import argparse
+import importlib.util
+import os
+import subprocess
 import sys
 import webbrowser
-import threading
 import time
+import urllib.error
+import urllib.request
 from pathlib import Path
 
+# Сколько секунд ждать готовности сервера (/health/ready) после запуска
+STARTUP_BUDGET = 10.0
+
+# Как часто опрашивать /health/ready во время запуска
+READY_POLL_INTERVAL = 0.05
+
+# Сколько секунд воркеры дорабатывают начатые запросы при остановке
+GRACEFUL_SHUTDOWN_TIMEOUT = 30
+
 def check_dependencies():
-    """Проверка установленных зависимостей"""
-    required_modules = ['fastapi', 'uvicorn', 'sqlite3', 'pandas']
-    missing_modules = []
-    
-    for module in required_modules:
-        try:
-            __import__(module)
-        except ImportError:
-            missing_modules.append(module)
+    """Проверка установленных зависимостей (без импорта самих модулей)"""
+    required_modules = ['fastapi', 'uvicorn', 'sqlite3']
+    missing_modules = [
+        module for module in required_modules
+        if importlib.util.find_spec(module) is None
+    ]
     
     if missing_modules:
         print("❌ Отсутствуют необходимые модули:")
         for module in missing_modules:
             print(f"   - {module}")
         print("\nУстановите зависимости командой:")
-        print("pip install fastapi uvicorn pandas openpyxl")
+        print("pip install -r backend/requirements.txt")
         return False
     
     return True
 
 def setup_database():
-    """Настройка базы данных - ИСПРАВЛЕННЫЙ ИМПОРТ"""
+    """Настройка базы данных: применение миграций схемы"""
     # Импортируем из правильного места
     sys.path.insert(0, str(Path(__file__).parent / "backend"))
     
@@ -46,126 +57,133 @@ def setup_database():
     db = Database()
     
     # Проверяем, существует ли база данных
-    db_file = Path(__file__).parent / "database" / "furniture.db"
+    db_file = Path(db.db_path)
     
     if not db_file.exists():
         print("🔧 Создание базы данных...")
-        
-        # Создаем папку database если её нет
-        db_file.parent.mkdir(exist_ok=True)
-        
-        # Создаем простой init.sql если его нет
-        init_file = db_file.parent / "init.sql"
-        if not init_file.exists():
-            init_sql = """
-            CREATE TABLE IF NOT EXISTS product_types (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type_name VARCHAR(50) NOT NULL UNIQUE,
-                production_coefficient REAL NOT NULL CHECK(production_coefficient > 0)
-            );
-
-            CREATE TABLE IF NOT EXISTS materials (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                material_name VARCHAR(100) NOT NULL UNIQUE,
-                loss_percentage REAL NOT NULL CHECK(loss_percentage >= 0 AND loss_percentage <= 100)
-            );
-
-            CREATE TABLE IF NOT EXISTS workshops (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                workshop_name VARCHAR(100) NOT NULL UNIQUE,
-                worker_count INTEGER NOT NULL CHECK(worker_count > 0),
-                processing_time INTEGER NOT NULL CHECK(processing_time > 0)
-            );
-
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article VARCHAR(50) NOT NULL,
-                product_type_id INTEGER NOT NULL,
-                product_name VARCHAR(200) NOT NULL,
-                min_partner_price DECIMAL(10,2) NOT NULL CHECK(min_partner_price >= 0),
-                main_material_id INTEGER NOT NULL,
-                param1 REAL NOT NULL CHECK(param1 > 0),
-                param2 REAL NOT NULL CHECK(param2 > 0),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-
-            -- Вставка тестовых данных
-            INSERT OR IGNORE INTO product_types (type_name, production_coefficient) VALUES
-            ('Современный стул', 1.2),
-            ('Классический стол', 1.5),
-            ('Современный шкаф', 1.8),
-            ('Классическое кресло', 1.3);
-
-            INSERT OR IGNORE INTO materials (material_name, loss_percentage) VALUES
-            ('Дуб', 5.0),
-            ('Бук', 4.5),
-            ('Сосна', 6.0),
-            ('МДФ', 3.0),
-            ('Массив ясеня', 4.0);
-
-            INSERT OR IGNORE INTO workshops (workshop_name, worker_count, processing_time) VALUES
-            ('Цех распиловки', 8, 2),
-            ('Цех шлифовки', 6, 3),
-            ('Цех сборки', 10, 5),
-            ('Цех покраски', 7, 4),
-            ('Цех упаковки', 4, 1);
-            """
-            with open(init_file, 'w', encoding='utf-8') as f:
-                f.write(init_sql)
-        
-        db.init_database()
-        
-        print("✅ База данных создана и заполнена тестовыми данными")
     else:
         print("✅ База данных уже существует")
     
-    return True
-
-def start_backend():
-    """Запуск backend сервера"""
-    import subprocess
-    import os
+    # Схема создается и обновляется миграциями (backend/migrations.py) здесь,
+    # один раз, а не в каждом воркере: воркеры при запуске только сверяют
+    # PRAGMA user_version
+    initialized = db.init_database()
     
-    # Меняем рабочую директорию на backend
-    original_dir = os.getcwd()
+    db.close()
+    return initialized
+
+def start_backend(host="0.0.0.0", port=8000, reload=False, workers=1,
+                  graceful_timeout=GRACEFUL_SHUTDOWN_TIMEOUT):
+    """
+    Запуск backend сервера.
+    
+    В режиме разработки (reload) - один процесс с перезапуском при
+    изменении кода. Иначе - workers процессов uvicorn на одном порту;
+    при остановке каждый дорабатывает начатые запросы не дольше
+    graceful_timeout секунд.
+    
+    Если процессов несколько, кэш справочников проверяет PRAGMA
+    data_version при каждом обращении (FURNITURE_CACHE_CHECK_INTERVAL=0),
+    иначе после записи в одном процессе другие отдавали бы старые
+    справочники до следующего опроса.
+    """
     backend_dir = Path(__file__).parent / "backend"
-    
-    if backend_dir.exists():
-        os.chdir(backend_dir)
-    else:
+    if not backend_dir.exists():
         print(f"❌ Папка backend не найдена: {backend_dir}")
         return None
     
     try:
-        # Запускаем uvicorn
         print("🚀 Запуск backend сервера...")
-        print("   Сервер будет доступен по адресу: http://localhost:8000")
+        if reload:
+            print("   Режим разработки: один процесс, перезапуск при изменении кода")
+        else:
+            print(f"   Рабочих процессов: {workers}")
+        print(f"   Сервер будет доступен по адресу: http://localhost:{port}")
         print("   Нажмите Ctrl+C для остановки сервера\n")
         
-        process = subprocess.Popen([
-            sys.executable, "-m", "uvicorn", "app:app", 
-            "--host", "0.0.0.0", "--port", "8000", "--reload"
-        ])
+        command = [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--host", host, "--port", str(port)
+        ]
+        if reload:
+            command.append("--reload")
+        else:
+            command += [
+                "--workers", str(workers),
+                "--timeout-graceful-shutdown", str(int(graceful_timeout))
+            ]
         
-        # Даем серверу время на запуск
-        time.sleep(3)
+        env = os.environ.copy()
+        if workers > 1 and not reload:
+            env.setdefault("FURNITURE_CACHE_CHECK_INTERVAL", "0")
         
-        return process
+        return subprocess.Popen(command, cwd=backend_dir, env=env)
         
     except Exception as e:
         print(f"❌ Ошибка запуска сервера: {e}")
         return None
-    finally:
-        os.chdir(original_dir)
 
-def open_browser():
-    """Открытие браузера с интерфейсом"""
-    time.sleep(5)  # Даем серверу время на запуск
-    webbrowser.open("http://localhost:8000")
+def wait_until_ready(process, port, budget=STARTUP_BUDGET):
+    """
+    Опрашивать /health/ready, пока сервер не ответит 200.
+    
+    Возвращает время до готовности в секундах или None, если процесс
+    завершился или не успел подготовиться за budget секунд.
+    """
+    url = f"http://127.0.0.1:{port}/health/ready"
+    started = time.perf_counter()
+    
+    while time.perf_counter() - started < budget:
+        if process.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, OSError):
+            # Еще не слушает порт или отвечает 503 - ждем дальше
+            pass
+        time.sleep(READY_POLL_INTERVAL)
+    
+    return None
+
+def stop_backend(process, graceful_timeout=GRACEFUL_SHUTDOWN_TIMEOUT):
+    """
+    Остановить сервер: SIGTERM, ожидание завершения начатых запросов,
+    и только по истечении graceful_timeout (с запасом) - kill
+    """
+    if process.poll() is None:
+        process.terminate()
+    try:
+        process.wait(timeout=graceful_timeout + 5)
+    except subprocess.TimeoutExpired:
+        print("⚠️ Сервер не остановился вовремя, завершаем принудительно")
+        process.kill()
+        process.wait()
+
+def parse_args():
+    """Параметры запуска"""
+    parser = argparse.ArgumentParser(description="Система управления продукцией мебельной компании")
+    parser.add_argument("--host", default="0.0.0.0", help="Адрес сервера")
+    parser.add_argument("--port", type=int, default=8000, help="Порт сервера")
+    parser.add_argument("--reload", action="store_true",
+                        help="Перезапуск при изменении кода (режим разработки, один процесс)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Число рабочих процессов (по умолчанию - число ядер)")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_SHUTDOWN_TIMEOUT,
+                        help="Сколько секунд дорабатывать начатые запросы при остановке")
+    parser.add_argument("--no-browser", action="store_true", help="Не открывать браузер")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET,
+                        help="Сколько секунд ждать готовности сервера")
+    return parser.parse_args()
 
 def main():
     """Главная функция запуска системы"""
+    args = parse_args()
+    if args.workers < 1:
+        print("❌ Число рабочих процессов должно быть не меньше 1")
+        sys.exit(1)
+    
     print("=" * 60)
     print("🎯 Система управления продукцией мебельной компании")
     print("=" * 60)
@@ -179,26 +197,33 @@ def main():
     if not setup_database():
         sys.exit(1)
     
-    # Запускаем backend в отдельном потоке
-    backend_process = start_backend()
+    started = time.perf_counter()
+    backend_process = start_backend(args.host, args.port, args.reload,
+                                    args.workers, args.graceful_timeout)
     
     if backend_process is None:
         print("❌ Не удалось запустить сервер")
         sys.exit(1)
     
-    # Открываем браузер
-    print("🌐 Открытие интерфейса в браузере...")
-    browser_thread = threading.Thread(target=open_browser)
-    browser_thread.daemon = True
-    browser_thread.start()
+    # Ждем готовности сервера вместо фиксированной паузы
+    ready_after = wait_until_ready(backend_process, args.port, args.startup_budget)
+    if ready_after is None:
+        print(f"❌ Сервер не готов за {args.startup_budget:g} с")
+        stop_backend(backend_process, args.graceful_timeout)
+        sys.exit(1)
+    print(f"⏱️ Холодный старт: {time.perf_counter() - started:.2f} с "
+          f"(бюджет {args.startup_budget:g} с)")
+    
+    if not args.no_browser:
+        print("🌐 Открытие интерфейса в браузере...")
+        webbrowser.open(f"http://localhost:{args.port}")
     
     try:
         # Ждем завершения backend процесса
         backend_process.wait()
     except KeyboardInterrupt:
         print("\n\n👋 Завершение работы системы...")
-        backend_process.terminate()
-        backend_process.wait()
+        stop_backend(backend_process, args.graceful_timeout)
         print("✅ Система остановлена")
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+"""Общие фикстуры тестов: сгенерированная база каталога и клиент API"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "backend"))
+
+# database.py создает глобальный db при импорте, поэтому путь к базе API
+# задается до импорта модулей backend (и никогда не указывает на database/furniture.db)
+API_DB_DIR = Path(tempfile.mkdtemp(prefix="furniture_tests_"))
+os.environ["FURNITURE_DB_PATH"] = str(API_DB_DIR / "api.db")
+# Изменения видны кэшу справочников сразу, без интервала проверки
+os.environ["FURNITURE_CACHE_CHECK_INTERVAL"] = "0"
+
+# Размер сгенерированного каталога: достаточно для проверки планов запросов
+CATALOG_SIZE = 2000
+
+BASELINE_DB = ROOT / "database" / "furniture.db"
+
+
+@pytest.fixture(scope="session")
+def catalog_db(tmp_path_factory) -> Path:
+    """База, собранная генератором (схема - миграциями backend/migrations.py)"""
+    from generate_products import build_database
+
+    path = tmp_path_factory.mktemp("catalog") / "catalog.db"
+    build_database(path, CATALOG_SIZE, seed=42, workers=1)
+    return path
+
+
+@pytest.fixture
+def baseline_db(tmp_path) -> Path:
+    """Копия поставляемой базы со схемой до миграций (user_version = 0)"""
+    path = tmp_path / "baseline.db"
+    shutil.copyfile(BASELINE_DB, path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def api_client(catalog_db):
+    """Клиент API поверх копии сгенерированной базы (startup применяет миграции)"""
+    from fastapi.testclient import TestClient
+
+    shutil.copyfile(catalog_db, os.environ["FURNITURE_DB_PATH"])
+    import app
+
+    with TestClient(app.app) as client:
+        yield client
+    shutil.rmtree(API_DB_DIR, ignore_errors=True)
@@ -0,0 +1,53 @@
+"""Резервные копии: GET /backup и плановое копирование (backend/backup.py)"""
+import gzip
+import sqlite3
+import threading
+
+import app
+from backup import BACKUP_LOCK, BackupScheduler
+
+
+def test_backup_download_is_consistent_copy(api_client, tmp_path):
+    response = api_client.get("/backup", params={"compress": True})
+
+    assert response.status_code == 200, response.text
+    path = tmp_path / "copy.db"
+    path.write_bytes(gzip.decompress(response.content))
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+        assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] > 0
+    finally:
+        conn.close()
+
+
+def test_backup_runs_on_its_own_thread(api_client, monkeypatch):
+    threads = []
+    create_backup_file = app.create_backup_file
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return create_backup_file(*args, **kwargs)
+
+    monkeypatch.setattr(app, "create_backup_file", record_thread)
+
+    assert api_client.get("/backup").status_code == 200
+    assert len(threads) == 1 and threads[0].startswith("backup")
+
+
+def test_second_backup_is_rejected_while_one_runs(api_client):
+    with BACKUP_LOCK:
+        response = api_client.get("/backup")
+    assert response.status_code == 409
+
+    assert api_client.get("/backup").status_code == 200
+
+
+def test_scheduled_backup_keeps_last_copies(catalog_db, tmp_path):
+    scheduler = BackupScheduler(catalog_db, tmp_path / "backups", interval=0, keep=2,
+                                compress=False)
+
+    paths = [scheduler.run_once() for _ in range(3)]
+
+    assert sorted(path.name for path in (tmp_path / "backups").glob("*.db")) == \
+        sorted(path.name for path in paths[1:])
@@ -0,0 +1,166 @@
+"""Пакетные операции с продукцией: POST /products/bulk и DELETE /products/batch"""
+import itertools
+import os
+import sqlite3
+
+import importers
+
+_articles = itertools.count(1)
+
+
+def new_product(client, **overrides) -> dict:
+    """Поля нового продукта с уникальным артикулом и первыми записями справочников"""
+    product = {
+        "article": f"BULK-{next(_articles):05d}",
+        "product_name": "Тестовый продукт",
+        "product_type_id": client.get("/product-types").json()["data"][0]["id"],
+        "main_material_id": client.get("/materials").json()["data"][0]["id"],
+        "min_partner_price": 7500.0,
+        "param1": 1.5,
+        "param2": 2.0,
+    }
+    product.update(overrides)
+    return product
+
+
+def workshop_ids(client, count: int) -> list:
+    response = client.get("/workshops")
+    assert response.status_code == 200
+    return [workshop["id"] for workshop in response.json()["data"][:count]]
+
+
+def create_products(client, count: int) -> list:
+    """Создать count продуктов с маршрутом из двух цехов и вернуть их ID"""
+    route = workshop_ids(client, 2)
+    ids = []
+    for _ in range(count):
+        response = client.post("/products", json=new_product(client))
+        assert response.status_code == 200, response.text
+        product_id = response.json()["id"]
+        response = client.put(f"/products/{product_id}/workshops", json={"workshop_ids": route})
+        assert response.status_code == 200, response.text
+        ids.append(product_id)
+    return ids
+
+
+def schedule_count(product_ids) -> int:
+    """Число строк маршрута у продуктов (прямо из файла БД API)"""
+    conn = sqlite3.connect(os.environ["FURNITURE_DB_PATH"])
+    try:
+        placeholders = ",".join("?" for _ in product_ids)
+        return conn.execute(
+            f"SELECT COUNT(*) FROM production_schedule WHERE product_id IN ({placeholders})",
+            list(product_ids)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_price(client, product_id: int) -> float:
+    response = client.get(f"/products/{product_id}")
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["min_partner_price"]
+
+
+# POST /products/bulk
+
+def test_bulk_applies_all_operations(api_client):
+    updated_id, deleted_id = create_products(api_client, 2)
+    missing_id = 10**9
+    route = workshop_ids(api_client, 3)
+    assert schedule_count([deleted_id]) == 2
+
+    response = api_client.post("/products/bulk", json={"operations": [
+        {"op": "create", "data": new_product(api_client, workshops=route)},
+        {"op": "update", "id": updated_id, "data": {"min_partner_price": 9100,
+                                                    "workshops": route[:1]}},
+        {"op": "delete", "id": deleted_id},
+        {"op": "delete", "id": missing_id},
+    ]})
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["created"], result["updated"], result["deleted"], result["not_found"]) == (1, 1, 1, 1)
+    assert [item["status"] for item in result["results"]] == \
+        ["created", "updated", "deleted", "not_found"]
+    assert result["results"][3]["id"] == missing_id
+
+    assert get_price(api_client, updated_id) == 9100
+    assert schedule_count([updated_id]) == 1
+    assert api_client.get(f"/products/{deleted_id}").status_code == 404
+    # Маршрут удаленного продукта удален вместе с ним
+    assert schedule_count([deleted_id]) == 0
+    assert schedule_count([result["results"][0]["id"]]) == 3
+
+
+def test_bulk_rejects_duplicate_ids(api_client):
+    (product_id,) = create_products(api_client, 1)
+
+    response = api_client.post("/products/bulk", json={"operations": [
+        {"op": "update", "id": product_id, "data": {"min_partner_price": 1}},
+        {"op": "delete", "id": product_id},
+    ]})
+
+    assert response.status_code == 400
+    assert [error["index"] for error in response.json()["detail"]["errors"]] == [1]
+    # Пакет не применен даже частично
+    assert get_price(api_client, product_id) == 7500
+    assert schedule_count([product_id]) == 2
+
+
+def test_bulk_rejects_invalid_operation_without_changes(api_client):
+    (product_id,) = create_products(api_client, 1)
+
+    response = api_client.post("/products/bulk", json={"operations": [
+        {"op": "delete", "id": product_id},
+        {"op": "create", "data": new_product(api_client, product_type_id=10**6)},
+    ]})
+
+    assert response.status_code == 400
+    assert [error["index"] for error in response.json()["detail"]["errors"]] == [1]
+    assert api_client.get(f"/products/{product_id}").status_code == 200
+    assert schedule_count([product_id]) == 2
+
+
+def test_bulk_limit(api_client, monkeypatch):
+    monkeypatch.setattr(importers, "MAX_BULK_OPERATIONS", 3)
+    operations = [{"op": "delete", "id": 10**9 + index} for index in range(4)]
+
+    response = api_client.post("/products/bulk", json={"operations": operations})
+
+    assert response.status_code == 400
+    assert "3" in response.json()["detail"]
+    response = api_client.post("/products/bulk", json={"operations": operations[:3]})
+    assert response.status_code == 200, response.text
+    assert response.json()["not_found"] == 3
+
+
+# DELETE /products/batch
+
+def test_batch_delete_is_not_shadowed_by_product_route(api_client):
+    ids = create_products(api_client, 3)
+    assert schedule_count(ids) == 6
+
+    # Без объявления до /products/{product_id} "batch" разбирался бы как ID (422)
+    response = api_client.request("DELETE", "/products/batch", json=ids + [ids[0], 10**9])
+
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted_count"] == 3
+    assert all(api_client.get(f"/products/{product_id}").status_code == 404 for product_id in ids)
+    assert schedule_count(ids) == 0
+
+
+def test_batch_delete_more_ids_than_one_in_chunk(api_client):
+    ids = create_products(api_client, 2)
+    # Больше ID, чем помещается в одну порцию IN (...)
+    missing = list(range(10**9, 10**9 + 1200))
+
+    response = api_client.request("DELETE", "/products/batch", json=missing + ids)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted_count"] == 2
+    assert schedule_count(ids) == 0
+
+
+def test_batch_delete_requires_ids(api_client):
+    assert api_client.request("DELETE", "/products/batch", json=[]).status_code == 400
@@ -0,0 +1,50 @@
+"""Калькулятор сырья (materials_calculator/calculator.py)"""
+import math
+import os
+from pathlib import Path
+
+import pytest
+
+from database import Database
+from materials_calculator.calculator import MaterialCalculator, get_default_calculator
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "calculator.db"))
+    assert database.init_database()
+    yield database
+    database.close()
+
+
+def test_coefficients_follow_database_writes(database):
+    calculator = MaterialCalculator(database=database)
+    assert calculator.db_path == database.db_path
+    type_id = database.get_product_types()[0]["id"]
+    material = database.get_materials()[0]
+
+    def expected(coefficient):
+        return math.ceil(2.0 * 3.0 * coefficient * 10 * (1 + material["loss_percentage"] / 100))
+
+    before = calculator.calculate_raw_material_needed(type_id, material["id"], 10, 2.0, 3.0)
+    with database.get_connection() as conn:
+        conn.execute("UPDATE product_types SET production_coefficient = 2.5 WHERE id = ?",
+                     (type_id,))
+
+    # Изменение видно сразу, без интервала проверки
+    after = calculator.calculate_raw_material_needed(type_id, material["id"], 10, 2.0, 3.0)
+    assert before != after == expected(2.5)
+    assert calculator.calculate_raw_material_batch([(type_id, material["id"], 10, 2.0, 3.0)]) == \
+        [after]
+
+
+def test_unknown_type_or_material(database):
+    calculator = MaterialCalculator(database=database)
+    material_id = database.get_materials()[0]["id"]
+
+    assert calculator.calculate_raw_material_needed(10**6, material_id, 1, 1.0, 1.0) == -1
+    assert calculator.calculate_raw_material_batch([(10**6, material_id, 1, 1.0, 1.0)]) == [-1]
+
+
+def test_default_calculator_uses_configured_database():
+    assert Path(get_default_calculator().db_path) == Path(os.environ["FURNITURE_DB_PATH"])
@@ -0,0 +1,87 @@
+"""Условные запросы (ETag/304) и сжатие ответов API (backend/http_cache.py)"""
+import itertools
+
+from starlette.testclient import TestClient
+
+from http_cache import CompressionMiddleware
+
+_articles = itertools.count(1)
+
+
+def create_product(client) -> int:
+    """Создать продукт через POST /products и вернуть его ID"""
+    product = {
+        "article": f"CACHE-{next(_articles):05d}",
+        "product_name": "Тестовый продукт",
+        "product_type_id": client.get("/product-types").json()["data"][0]["id"],
+        "main_material_id": client.get("/materials").json()["data"][0]["id"],
+        "min_partner_price": 7500.0,
+        "param1": 1.5,
+        "param2": 2.0,
+    }
+    response = client.post("/products", json=product)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_etag_not_modified_until_data_changes(api_client):
+    first = api_client.get("/products", params={"limit": 5})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = api_client.get("/products", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    create_product(api_client)
+    changed = api_client.get("/products", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_large_responses_are_compressed(api_client):
+    response = api_client.get("/products", params={"limit": 200}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["count"] == 200
+
+    plain = api_client.get("/products", params={"limit": 200}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == response.json()
+
+
+def test_small_responses_are_not_compressed(api_client):
+    response = api_client.get("/products", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_every_response_varies_on_accept_encoding(api_client):
+    requests = [
+        ("/products", {"limit": 200}, "gzip"),      # сжатый
+        ("/products", {"limit": 200}, "identity"),  # клиент не принимает сжатие
+        ("/products", {"limit": 1}, "gzip"),        # меньше порога сжатия
+        ("/export/products", {"format": "csv"}, "gzip"),  # потоковый
+    ]
+    for path, params, accept_encoding in requests:
+        response = api_client.get(path, params=params, headers={"Accept-Encoding": accept_encoding})
+        assert response.status_code == 200, (path, response.text)
+        # CORS добавляет Vary: Origin - он должен сохраниться рядом с Accept-Encoding
+        tokens = [token.strip() for token in response.headers["vary"].split(",")]
+        assert tokens.count("Accept-Encoding") == 1, (path, accept_encoding, tokens)
+
+
+def test_vary_is_merged_with_existing_values():
+    def app_with_vary(vary: str):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/plain"), (b"vary", vary.encode())]})
+            await send({"type": "http.response.body", "body": b"x" * 4096})
+        return CompressionMiddleware(app)
+
+    for vary, expected in [("Origin", "Origin, Accept-Encoding"),
+                           ("origin, accept-encoding", "origin, accept-encoding"),
+                           ("*", "*")]:
+        for accept_encoding in ("gzip", "identity"):
+            response = TestClient(app_with_vary(vary)).get("/", headers={"Accept-Encoding": accept_encoding})
+            assert response.headers.get_list("vary") == [expected], (vary, accept_encoding)
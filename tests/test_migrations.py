@@ -0,0 +1,69 @@
+"""Миграции схемы и планы горячих запросов (backend/migrations.py, backend/query_plans.py)"""
+import sqlite3
+
+from conftest import ROOT
+from migrations import (
+    LATEST_VERSION, MIGRATIONS, migrate, missing_indexes, schema_script, schema_version
+)
+from query_plans import check_query_plans
+from test_statistics import assert_statistics_match
+
+
+def test_generated_catalog_uses_indexes(catalog_db):
+    """База из генератора: все горячие запросы идут по индексам"""
+    assert check_query_plans(str(catalog_db)) == []
+
+
+def test_generated_catalog_statistics(catalog_db):
+    """Агрегаты, заполненные после загрузки генератором, совпадают с данными"""
+    conn = sqlite3.connect(catalog_db)
+    try:
+        assert schema_version(conn) == LATEST_VERSION
+        assert_statistics_match(conn)
+    finally:
+        conn.close()
+
+
+def test_migrate_baseline_database(baseline_db):
+    """Поставляемая база (user_version = 0) поднимается до последней версии"""
+    conn = sqlite3.connect(baseline_db, isolation_level=None)
+    try:
+        assert schema_version(conn) == 0
+        products_before = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+        assert migrate(conn) == [version for version, _, _, _ in MIGRATIONS]
+        assert schema_version(conn) == LATEST_VERSION
+        assert missing_indexes(conn) == []
+        assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == products_before
+        assert_statistics_match(conn)
+
+        # Полнотекстовый индекс заполнен существующими строками
+        article, product_id = conn.execute("SELECT article, id FROM products LIMIT 1").fetchone()
+        found = [row[0] for row in conn.execute(
+            "SELECT rowid FROM products_fts WHERE products_fts MATCH ?", (f'"{article}"',)
+        )]
+        assert product_id in found
+
+        # Повторный запуск ничего не применяет
+        assert migrate(conn) == []
+    finally:
+        conn.close()
+
+    assert check_query_plans(str(baseline_db)) == []
+
+
+def test_migrate_step_by_step(tmp_path):
+    """Миграции применяются по одной и не пропускают версий"""
+    conn = sqlite3.connect(tmp_path / "steps.db", isolation_level=None)
+    try:
+        for version, _, _, _ in MIGRATIONS:
+            assert migrate(conn, target=version) == [version]
+            assert schema_version(conn) == version
+    finally:
+        conn.close()
+
+
+def test_init_sql_matches_migrations():
+    """database/init.sql сгенерирован из текущего списка миграций"""
+    init_sql = (ROOT / "database" / "init.sql").read_text(encoding="utf-8")
+    assert init_sql.replace("\r\n", "\n") == schema_script()
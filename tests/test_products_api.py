@@ -0,0 +1,71 @@
+"""Создание и изменение продукта вместе с маршрутом: POST /products, PUT /products/{id}"""
+from test_bulk import new_product, schedule_count, workshop_ids
+
+
+def get_route(client, product_id: int) -> list:
+    response = client.get(f"/products/{product_id}/workshops")
+    assert response.status_code == 200, response.text
+    return [workshop["id"] for workshop in response.json()["data"]]
+
+
+def test_create_saves_route(api_client):
+    route = workshop_ids(api_client, 3)[::-1]
+
+    response = api_client.post("/products", json=new_product(api_client, workshops=route))
+
+    assert response.status_code == 200, response.text
+    product_id = response.json()["id"]
+    assert get_route(api_client, product_id) == route
+
+
+def test_create_with_unknown_workshop_saves_nothing(api_client):
+    product = new_product(api_client, workshops=[10**6])
+
+    response = api_client.post("/products", json=product)
+
+    assert response.status_code == 400
+    found = api_client.get("/products", params={"search": product["article"]})
+    assert found.status_code == 200
+    assert found.json()["data"] == []
+
+
+def test_update_replaces_route_with_fields(api_client):
+    route = workshop_ids(api_client, 3)
+    response = api_client.post("/products", json=new_product(api_client, workshops=route))
+    assert response.status_code == 200, response.text
+    product_id = response.json()["id"]
+
+    response = api_client.put(f"/products/{product_id}",
+                              json={"min_partner_price": 8800, "workshops": route[1:]})
+
+    assert response.status_code == 200, response.text
+    assert api_client.get(f"/products/{product_id}").json()["data"]["min_partner_price"] == 8800
+    assert get_route(api_client, product_id) == route[1:]
+
+
+def test_update_with_only_workshops(api_client):
+    response = api_client.post("/products", json=new_product(api_client))
+    assert response.status_code == 200, response.text
+    product_id = response.json()["id"]
+    assert schedule_count([product_id]) == 0
+
+    route = workshop_ids(api_client, 2)
+    response = api_client.put(f"/products/{product_id}", json={"workshops": route})
+    assert response.status_code == 200, response.text
+    assert get_route(api_client, product_id) == route
+
+    # Пустой список очищает маршрут
+    response = api_client.put(f"/products/{product_id}", json={"workshops": []})
+    assert response.status_code == 200, response.text
+    assert schedule_count([product_id]) == 0
+
+
+def test_update_errors(api_client):
+    response = api_client.put(f"/products/{10**9}", json={"workshops": workshop_ids(api_client, 1)})
+    assert response.status_code == 404
+
+    response = api_client.post("/products", json=new_product(api_client))
+    assert response.status_code == 200, response.text
+    product_id = response.json()["id"]
+    assert api_client.put(f"/products/{product_id}", json={}).status_code == 400
+    assert api_client.put(f"/products/{product_id}", json={"workshops": [10**6]}).status_code == 400
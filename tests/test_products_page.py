@@ -0,0 +1,96 @@
+"""Фильтры и курсорная пагинация списка продукции (Database.get_products_page)"""
+import random
+
+import pytest
+
+from database import Database
+
+PRODUCT_COUNT = 300
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """База с PRODUCT_COUNT продуктами; даты, цены и названия часто совпадают"""
+    database = Database(str(tmp_path / "catalog.db"))
+    assert database.init_database()
+
+    rng = random.Random(42)
+    with database.get_connection() as conn:
+        type_ids = [row[0] for row in conn.execute("SELECT id FROM product_types")]
+        material_ids = [row[0] for row in conn.execute("SELECT id FROM materials")]
+        conn.executemany("""
+            INSERT INTO products
+            (article, product_type_id, product_name, min_partner_price,
+             main_material_id, param1, param2, created_at)
+            VALUES (?, ?, ?, ?, ?, 1, 1, ?)
+        """, [
+            (f"ART-{number:04d}", rng.choice(type_ids),
+             f"{rng.choice(['Стул', 'Стол', 'Шкаф'])} {rng.randint(1, 20)}",
+             rng.choice([4500.0, 9900.0, 15000.0, 32000.5]), rng.choice(material_ids),
+             f"2025-01-{rng.randint(1, 28):02d} 10:00:00")
+            for number in range(PRODUCT_COUNT)
+        ])
+    return database
+
+
+def all_pages(database, limit, **filters):
+    """Пройти все страницы по next_cursor и вернуть продукты по порядку"""
+    products, cursor = [], None
+    while True:
+        page = database.get_products_page(cursor=cursor, limit=limit, **filters)
+        assert len(page["items"]) <= limit
+        products.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return products
+
+
+SORT_COLUMNS = {"created_at": "created_at", "price": "min_partner_price",
+                "name": "product_name", "article": "article", "id": "id"}
+
+
+@pytest.mark.parametrize("sort", list(SORT_COLUMNS))
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_pages_cover_catalog_once_in_order(catalog, sort, order):
+    products = all_pages(catalog, 37, sort=sort, order=order)
+
+    column = SORT_COLUMNS[sort]
+    expected = sorted(catalog.execute_query("SELECT * FROM products", fetch_all=True),
+                      key=lambda row: (row[column], row["id"]), reverse=order == "desc")
+    assert [product["id"] for product in products] == [row["id"] for row in expected]
+
+
+def test_filters_apply_to_every_page(catalog):
+    type_id = catalog.get_product_types()[0]["id"]
+
+    products = all_pages(catalog, 10, product_type_id=type_id, price_min=9000,
+                         price_max=20000, sort="price", order="asc")
+
+    expected = catalog.execute_query("""
+        SELECT id FROM products
+        WHERE product_type_id = ? AND min_partner_price BETWEEN 9000 AND 20000
+    """, (type_id,), fetch_all=True)
+    assert sorted(product["id"] for product in products) == sorted(row["id"] for row in expected)
+    assert all(product["product_type_id"] == type_id for product in products)
+
+
+def test_search_matches_name_and_article(catalog):
+    products = all_pages(catalog, 50, search="ART-001")
+    assert sorted(product["article"] for product in products) == \
+        [f"ART-{number:04d}" for number in range(10, 20)]
+
+
+def test_cursor_is_bound_to_its_sort(catalog):
+    cursor = catalog.get_products_page(sort="price", order="asc", limit=5)["next_cursor"]
+
+    with pytest.raises(ValueError):
+        catalog.get_products_page(sort="name", order="asc", cursor=cursor)
+    with pytest.raises(ValueError):
+        catalog.get_products_page(sort="price", order="desc", cursor=cursor)
+    with pytest.raises(ValueError):
+        catalog.get_products_page(cursor="not-a-cursor")
+
+
+def test_unknown_sort_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.get_products_page(sort="weight")
@@ -0,0 +1,52 @@
+"""Кэш справочников (backend/reference_cache.py)"""
+import threading
+import time
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "reference.db"), pool_size=1)
+    assert database.init_database()
+    yield database
+    database.close()
+
+
+def test_cache_follows_writes(database):
+    names = [workshop["workshop_name"] for workshop in database.reference.workshops()]
+
+    with database.get_connection() as conn:
+        conn.execute("INSERT INTO workshops (workshop_name, worker_count, processing_time) "
+                     "VALUES ('Цех контроля', 2, 1)")
+
+    assert sorted(workshop["workshop_name"] for workshop in database.reference.workshops()) == \
+        sorted(names + ["Цех контроля"])
+
+
+def test_reload_does_not_wait_for_pool_under_lock(database):
+    """Поток с соединением из пула и поток, ждущий соединение, не блокируют друг друга"""
+    database.reference.invalidate()
+    holding, results = threading.Event(), {}
+
+    def holder():
+        with database.get_connection():
+            holding.set()
+            # Даем второму потоку начать перечитывание и ждать пул
+            time.sleep(0.2)
+            results["holder"] = len(database.reference.workshops())
+
+    def reader():
+        holding.wait()
+        results["reader"] = len(database.reference.workshops())
+
+    threads = [threading.Thread(target=holder), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert results["holder"] == results["reader"] == 5
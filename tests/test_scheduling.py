@@ -0,0 +1,138 @@
+"""График производства по цехам (scheduling.schedule_orders)"""
+import shutil
+
+import pytest
+
+from database import Database
+from scheduling import SCHEDULING_RULES, schedule_orders
+
+WORKSHOPS = {
+    1: {"id": 1, "workshop_name": "Распиловка", "worker_count": 1, "processing_time": 2},
+    2: {"id": 2, "workshop_name": "Сборка", "worker_count": 2, "processing_time": 5},
+    3: {"id": 3, "workshop_name": "Упаковка", "worker_count": 1, "processing_time": 1},
+}
+
+ROUTES = {
+    10: [WORKSHOPS[1], WORKSHOPS[2], WORKSHOPS[3]],
+    11: [WORKSHOPS[2], WORKSHOPS[3]],
+    12: [WORKSHOPS[1], WORKSHOPS[3]],
+    13: [],
+}
+
+ORDERS = [
+    {"product_id": 10, "quantity": 3, "due": 30},
+    {"product_id": 11, "quantity": 1, "due": 10},
+    {"product_id": 12, "quantity": 4, "due": 12},
+    {"product_id": 10, "quantity": 1, "due": 40},
+    {"product_id": 11, "quantity": 2, "due": 20},
+]
+
+
+@pytest.mark.parametrize("rule", SCHEDULING_RULES)
+def test_schedule_respects_routes_and_workers(rule):
+    result = schedule_orders(ORDERS, ROUTES, WORKSHOPS, rule)
+
+    assert result["summary"]["scheduled"] == len(ORDERS)
+    intervals = {}
+    for order in result["orders"]:
+        route = ROUTES[order["product_id"]]
+        assert [step["workshop_id"] for step in order["steps"]] == [w["id"] for w in route]
+        ready = 0.0
+        for step, workshop in zip(order["steps"], route):
+            # Стадия не начинается раньше окончания предыдущей и длится quantity * time
+            assert step["start"] >= ready
+            assert step["end"] - step["start"] == order["quantity"] * workshop["processing_time"]
+            ready = step["end"]
+            intervals.setdefault((step["workshop_id"], step["worker"]), []).append(
+                (step["start"], step["end"])
+            )
+        assert order["end"] == ready <= result["summary"]["makespan"]
+
+    # Один рабочий не ведет два заказа одновременно
+    for (workshop_id, worker), busy in intervals.items():
+        assert 1 <= worker <= WORKSHOPS[workshop_id]["worker_count"]
+        busy.sort()
+        assert all(end <= start for (_, end), (start, _) in zip(busy, busy[1:]))
+
+
+def test_best_rule_picks_smallest_makespan():
+    result = schedule_orders(ORDERS, ROUTES, WORKSHOPS, "best")
+
+    compared = result["summary"]["compared"]
+    assert set(compared) == set(SCHEDULING_RULES)
+    assert result["summary"]["makespan"] == min(compared.values())
+    assert compared[result["summary"]["rule"]] == result["summary"]["makespan"]
+
+
+def test_single_workshop_runs_orders_back_to_back():
+    orders = [{"product_id": 12, "quantity": quantity} for quantity in (3, 1, 2)]
+    result = schedule_orders(orders, ROUTES, WORKSHOPS, "spt")
+
+    # Распиловка: 2 ч на штуку, один рабочий; упаковка после последней распиловки
+    assert result["summary"]["makespan"] == 2 * 6 + 3
+    assert [order["start"] for order in result["orders"]] == [6, 0, 2]
+    assert result["workshops"][0]["utilization"] == pytest.approx(12 / 15, abs=1e-4)
+
+
+def test_edd_reports_tardiness():
+    result = schedule_orders(ORDERS, ROUTES, WORKSHOPS, "edd")
+
+    tardiness = [max(0, order["end"] - ORDERS[order["index"]]["due"])
+                 for order in result["orders"]]
+    assert [order["tardiness"] for order in result["orders"]] == tardiness
+    assert result["summary"]["late_orders"] == sum(1 for value in tardiness if value > 0)
+
+
+def test_orders_without_route_are_unscheduled():
+    orders = [{"product_id": 99, "quantity": 1}, {"product_id": 13, "quantity": 1},
+              {"product_id": 12, "quantity": 1}]
+    result = schedule_orders(orders, ROUTES, WORKSHOPS, "fifo")
+
+    assert [(item["index"], item["product_id"]) for item in result["unscheduled"]] == \
+        [(0, 99), (1, 13)]
+    assert [order["index"] for order in result["orders"]] == [2]
+    assert result["summary"]["unscheduled_count"] == 2
+
+
+def test_unknown_rule_is_rejected():
+    with pytest.raises(ValueError):
+        schedule_orders(ORDERS, ROUTES, WORKSHOPS, "random")
+
+
+def test_schedule_data_is_read_from_one_snapshot(catalog_db, tmp_path, monkeypatch):
+    db_path = tmp_path / "schedule.db"
+    shutil.copyfile(catalog_db, db_path)
+    database = Database(str(db_path))
+    try:
+        # Маршруты и цехи берутся из одной транзакции, а не из кэша справочников
+        monkeypatch.setattr(database.reference, "workshops_by_id", lambda: {})
+        with database.get_connection() as conn:
+            product_ids = [row[0] for row in conn.execute(
+                "SELECT DISTINCT product_id FROM production_schedule ORDER BY product_id LIMIT 5"
+            )]
+
+        routes, workshops = database.get_schedule_data(product_ids + [10**9])
+        assert sorted(routes) == product_ids
+        assert all(step["id"] in workshops and "processing_time" in step
+                   for route in routes.values() for step in route)
+
+        orders = [{"product_id": product_id, "quantity": 2} for product_id in product_ids]
+        result = schedule_orders(orders, routes, workshops, "johnson")
+        assert result["summary"]["scheduled"] == len(orders)
+        assert result["summary"]["makespan"] > 0
+    finally:
+        database.close()
+
+
+def test_schedule_endpoint(api_client):
+    products = api_client.get("/products", params={"limit": 3})
+    assert products.status_code == 200
+    orders = [{"product_id": product["id"], "quantity": 1} for product in products.json()["data"]]
+
+    response = api_client.post("/schedule", json={"orders": orders + [{"product_id": 10**9, "quantity": 1}],
+                                                  "include_steps": False})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["success"] is True
+    assert body["summary"]["scheduled"] + body["summary"]["unscheduled_count"] == len(orders) + 1
+    assert 10**9 in [order["product_id"] for order in body["unscheduled"]]
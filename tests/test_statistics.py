@@ -0,0 +1,122 @@
+"""Агрегаты /reports/statistics, которые поддерживаются триггерами"""
+import bisect
+import sqlite3
+
+import pytest
+
+from database import Database, PRICE_RANGE_BOUNDS, UNKNOWN_MATERIAL_NAME, UNKNOWN_TYPE_NAME
+
+
+def price_range(price):
+    """Номер ценового диапазона так же, как в price_range_sql"""
+    return bisect.bisect_right(PRICE_RANGE_BOUNDS, price)
+
+
+def assert_statistics_match(conn):
+    """Агрегаты статистики совпадают с пересчетом по таблицам"""
+    count, price_sum, price_min, price_max = conn.execute("""
+        SELECT COUNT(*), TOTAL(min_partner_price), MIN(min_partner_price), MAX(min_partner_price)
+        FROM products
+    """).fetchone()
+    stats = conn.execute("""
+        SELECT product_count, price_sum, price_min, price_max FROM product_stats WHERE id = 1
+    """).fetchone()
+    assert stats[0] == count
+    assert abs(stats[1] - price_sum) < 1e-6 * max(1.0, price_sum)
+    assert (stats[2], stats[3]) == (price_min, price_max)
+
+    def counts(sql):
+        return {key: value for key, value in conn.execute(sql) if value}
+
+    assert counts("SELECT product_type_id, product_count FROM product_type_stats") == \
+        counts("SELECT product_type_id, COUNT(*) FROM products GROUP BY product_type_id")
+    assert counts("SELECT material_id, product_count FROM material_stats") == \
+        counts("SELECT main_material_id, COUNT(*) FROM products GROUP BY main_material_id")
+    assert counts("SELECT workshop_id, route_count FROM workshop_route_stats") == \
+        counts("SELECT workshop_id, COUNT(*) FROM production_schedule GROUP BY workshop_id")
+
+    expected_ranges = {}
+    for (price,) in conn.execute("SELECT min_partner_price FROM products"):
+        expected_ranges[price_range(price)] = expected_ranges.get(price_range(price), 0) + 1
+    assert counts("SELECT range_index, product_count FROM price_range_stats") == expected_ranges
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(str(tmp_path / "statistics.db"))
+    assert database.init_database()
+    return database
+
+
+def add_route(database, product_id, workshop_ids):
+    with database.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO production_schedule (product_id, workshop_id, processing_order) "
+            "VALUES (?, ?, ?)",
+            [(product_id, workshop_id, order) for order, workshop_id in enumerate(workshop_ids, 1)]
+        )
+
+
+def test_statistics_follow_writes(database):
+    product_ids = [
+        database.add_product(f"STAT-{number}", 1 + number % 3, f"Продукт {number}",
+                             price, 1 + number % 4, 1.0, 1.0)
+        for number, price in enumerate([1200.0, 7500.0, 15000.0, 64000.0, 64000.0])
+    ]
+    add_route(database, product_ids[0], [1, 2, 3])
+    add_route(database, product_ids[1], [3, 5])
+
+    database.update_product(product_ids[2], {"min_partner_price": 99000.0,
+                                             "product_type_id": 4, "main_material_id": 5})
+    database.delete_product(product_ids[3])
+    # Маршрут удаляется каскадно вместе с продуктом
+    database.delete_product(product_ids[0])
+
+    with database.get_connection() as conn:
+        assert_statistics_match(conn)
+        routes = conn.execute("SELECT COUNT(*) FROM production_schedule").fetchone()[0]
+        processing = dict(conn.execute("SELECT id, processing_time FROM workshops"))
+
+    statistics = database.get_statistics()
+    total = statistics["total_products"]
+    assert total == len(database.execute_query("SELECT id FROM products", fetch_all=True))
+    assert sum(item["count"] for item in statistics["price_distribution"]) == total
+    assert statistics["price_distribution"][-1] == {"min": 50000, "max": None, "count": 2}
+    assert sum(item["route_count"] for item in statistics["workshop_stats"]) == routes
+    # Маршрут тестового продукта из init_database и второго продукта
+    assert statistics["total_production_time"] == \
+        processing[1] + processing[2] + processing[3] + processing[3] + processing[5]
+
+
+def test_rebuild_restores_aggregates(database):
+    with database.get_connection() as conn:
+        conn.execute("UPDATE price_range_stats SET product_count = 100")
+        conn.execute("DELETE FROM workshop_route_stats")
+
+    database.rebuild_statistics()
+
+    with database.get_connection() as conn:
+        assert_statistics_match(conn)
+
+
+def test_unknown_type_and_material_are_counted(database):
+    # Соединение без foreign_keys, как у старых баз и сторонних писателей
+    conn = sqlite3.connect(database.db_path)
+    try:
+        with conn:
+            conn.executemany("""
+                INSERT INTO products
+                (article, product_type_id, product_name, min_partner_price,
+                 main_material_id, param1, param2)
+                VALUES (?, ?, 'Без справочника', 1000, ?, 1, 1)
+            """, [("ORPHAN-1", 999, 999), ("ORPHAN-2", 998, 1)])
+    finally:
+        conn.close()
+
+    statistics = database.get_statistics()
+
+    types = {item["type"]: item["count"] for item in statistics["type_distribution"]}
+    materials = {item["material"]: item["count"] for item in statistics["material_distribution"]}
+    assert types[UNKNOWN_TYPE_NAME] == 2
+    assert materials[UNKNOWN_MATERIAL_NAME] == 1
+    assert sum(types.values()) == sum(materials.values()) == statistics["total_products"]